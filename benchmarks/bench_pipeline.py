@@ -0,0 +1,108 @@
+"""Porównanie ścieżki PIL (utils.image_utils) z potokiem NumPy/OpenCV (utils.diff_pipeline).
+
+Uruchomienie z katalogu głównego repozytorium:
+    python -m benchmarks.bench_pipeline --dpi 150 --repeat 5
+
+Każdy wariant mierzony jest w osobnym procesie, aby szczytowe zużycie pamięci (ru_maxrss)
+jednego wariantu nie wpływało na drugi. Oba warianty zaczynają od tej samej pixmapy fitz.
+"""
+import argparse
+import multiprocessing
+import statistics
+import sys
+import time
+
+import fitz
+from PIL import Image
+
+from config.settings import DEFAULT_SENSITIVITY
+from utils import diff_pipeline
+from utils.image_utils import compare_images
+from utils.page_buffer import PageBuffer
+
+try:
+    import resource
+except ImportError:  # Windows - pomiar pamięci niedostępny
+    resource = None
+
+VARIANTS = ("pil", "numpy", "numpy-gray")
+
+
+def make_page_pair(dpi: int, grayscale: bool):
+    """Tworzy dwie strony A4 różniące się fragmentem tekstu i zwraca ich pixmapy."""
+    pixmaps = []
+    for changed in (False, True):
+        doc = fitz.open()
+        page = doc.new_page(width=595, height=842)
+        for line in range(60):
+            text = f"Line {line:02d} lorem ipsum dolor sit amet consectetur"
+            if changed and line == 30:
+                text = text.replace("dolor", "color")
+            page.insert_text((50, 40 + line * 13), text, fontsize=10)
+        page.draw_rect(fitz.Rect(300, 600, 500, 780 if changed else 760), color=(0, 0, 1))
+        zoom = dpi / 72
+        pixmaps.append(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom),
+                                       colorspace=fitz.csGRAY if grayscale else fitz.csRGB,
+                                       alpha=False))
+    return pixmaps
+
+
+def run_pil(base_pix, compare_pix, sensitivity):
+    base = Image.frombytes("RGB", [base_pix.width, base_pix.height], base_pix.samples)
+    compare = Image.frombytes("RGB", [compare_pix.width, compare_pix.height], compare_pix.samples)
+    result, original = compare_images(base, compare, sensitivity)
+    # Odpowiednik pil2qimage - kopia tobytes() przy tworzeniu QImage
+    return result.tobytes()
+
+
+def run_numpy(base_pix, compare_pix, sensitivity):
+    base = PageBuffer.from_pixmap(base_pix)
+    compare = PageBuffer.from_pixmap(compare_pix)
+    result, _, _ = diff_pipeline.compare_pages(base, compare, sensitivity)
+    return result
+
+
+def _peak_rss_kb() -> int:
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(variant: str, dpi: int, repeat: int, sensitivity: int, queue):
+    """Mierzy wariant w bieżącym procesie i odsyła (czasy, przyrost szczytowej pamięci w kB)."""
+    grayscale = variant == "numpy-gray"
+    base_pix, compare_pix = make_page_pair(dpi, grayscale)
+    func = run_pil if variant == "pil" else run_numpy
+
+    baseline = _peak_rss_kb()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(base_pix, compare_pix, sensitivity)
+        timings.append(time.perf_counter() - start)
+    queue.put((timings, _peak_rss_kb() - baseline))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sensitivity", type=int, default=DEFAULT_SENSITIVITY)
+    args = parser.parse_args(argv)
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"A4 page at {args.dpi} DPI, {args.repeat} runs per variant")
+    print(f"{'variant':<12}{'median [ms]':>14}{'min [ms]':>12}{'peak +RSS [MB]':>17}")
+    for variant in VARIANTS:
+        queue = ctx.Queue()
+        process = ctx.Process(target=measure, args=(variant, args.dpi, args.repeat, args.sensitivity, queue))
+        process.start()
+        timings, peak_kb = queue.get()
+        process.join()
+        print(f"{variant:<12}{statistics.median(timings) * 1000:>14.1f}{min(timings) * 1000:>12.1f}"
+              f"{peak_kb / 1024:>17.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""Benchmark etapów porównania na syntetycznym korpusie (benchmarks.corpus) z kontrolą regresji.
+
+Uruchomienie z katalogu głównego repozytorium:
+    python -m benchmarks.bench_suite --dpi 100 150 --repeat 3 --save-baseline baseline.json
+    python -m benchmarks.bench_suite --dpi 100 150 --repeat 3 --baseline baseline.json
+
+Mierzone etapy (każda kombinacja przypadek / DPI / etap w osobnym procesie, aby szczytowa
+pamięć ru_maxrss jednego pomiaru nie wpływała na inne):
+    load        PDFService.load_pdf obu dokumentów (otwarcie, odciski treści i podgląd - strony są leniwe)
+    compare     PDFService.compare_documents na wczytanych dokumentach (z renderowaniem stron,
+                bez pamięci podręcznej rastrów)
+    qimage      obraz wynikowy każdej strony i jego konwersja array2qimage (eksport / druk)
+    controller  pełna ścieżka GUI: PDFController.open_file x2 + compare_documents do wyświetlenia strony
+                (raz na przypadek, przy DPI aplikacji - DEFAULT_DPI)
+
+Przepustowość podawana jest w stronach i megapikselach na sekundę. Wynik (mediana czasu, szczytowa
+pamięć) porównywany jest z zapisanym plikiem bazowym - przekroczenie o więcej niż --tolerance
+oznacza regresję i kod wyjścia 1. Dla stabilnych pomiarów domyślnie --workers 1 (praca w procesie
+pomiaru); etap controller używa ustawień aplikacji.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import DEFAULT_CASES, CorpusPair, generate
+from config.settings import DEFAULT_DPI, DEFAULT_SENSITIVITY
+
+try:
+    import resource
+except ImportError:  # Windows - pomiar pamięci niedostępny
+    resource = None
+
+STAGES = ("load", "compare", "qimage", "controller")
+DEFAULT_TOLERANCE = 0.25  # Dopuszczalny wzrost mediany czasu / szczytowej pamięci względem bazowego
+MIN_MEMORY_MB = 8  # Poniżej tej szczytowej pamięci różnice są szumem pomiaru i nie są oceniane
+
+
+def _peak_rss_kb() -> int:
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _load(pair: CorpusPair, dpi: int, workers: int):
+    from services.pdf_service import PDFService
+
+    documents = [PDFService.load_pdf(path, dpi=dpi, workers=workers) for path in (pair.base_path, pair.compare_path)]
+    if not all(documents):
+        raise RuntimeError(f"Failed to load {pair.case.name}")
+    return documents
+
+
+def _compare(documents, sensitivity: int, workers: int):
+    from services.pdf_service import PDFService
+
+    # Strony renderowane są przy porównaniu - każde powtórzenie zaczyna od pustej pamięci podręcznej stron.
+    for document in documents:
+        document.page_cache.clear()
+    return PDFService.compare_documents(*documents, sensitivity, workers=workers)
+
+
+def _to_qimage(results):
+    from utils.qt_utils import array2qimage
+
+    return [array2qimage(result.render_diff_image(), copy=False) for result in results]
+
+
+def _controller_round_trip(pair: CorpusPair):
+    # Aplikacja bez ekranu; okno jest potrzebne, bo kontroler aktualizuje widok.
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from controllers import pdf_controller
+    from controllers.pdf_controller import PDFController
+    from views.main_window import MainWindow
+
+    # Zrzuty trybu testowego (TESTING_MODE) nie są częścią mierzonej ścieżki.
+    pdf_controller.TESTING_MODE = False
+    app = QApplication.instance() or QApplication([])
+    controller = PDFController()
+    window = MainWindow(controller)
+    controller.set_view(window)
+    errors = []
+    window.show_error = errors.append
+
+    def wait():
+        while controller.operations:
+            app.processEvents()
+            time.sleep(0.001)
+        app.processEvents()
+
+    controller.open_file(1, pair.base_path)
+    controller.open_file(2, pair.compare_path)
+    wait()
+    controller.compare_documents()
+    wait()
+    results = controller.comparison_results
+    window.close()
+    if errors:
+        raise RuntimeError(errors[0])
+    return results
+
+
+def measure(pair: CorpusPair, stage: str, dpi: int, repeat: int, sensitivity: int, workers: int, queue):
+    """Mierzy etap w bieżącym procesie i odsyła słownik z wynikami (lub błędem)."""
+    try:
+        documents = _load(pair, dpi, workers) if stage in ("compare", "qimage") else None
+        results = _compare(documents, sensitivity, workers) if stage == "qimage" else None
+
+        baseline = _peak_rss_kb()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            if stage == "load":
+                output = _load(pair, dpi, workers)
+            elif stage == "compare":
+                output = _compare(documents, sensitivity, workers)
+            elif stage == "qimage":
+                output = _to_qimage(results)
+            else:
+                output = _controller_round_trip(pair)
+            timings.append(time.perf_counter() - start)
+
+        pages = max(pair.case.pages, 1)
+        comparison = output if stage in ("compare", "controller") else results
+        queue.put({
+            "timings": timings,
+            "peak_mb": (_peak_rss_kb() - baseline) / 1024,
+            "pages": pages * (2 if stage == "load" else 1),
+            "megapixels": pages * (2 if stage == "load" else 1) * (pair.case.size[0] * pair.case.size[1]
+                                                                     * (dpi / 72) ** 2) / 1e6,
+            "found": _found(pair, comparison, dpi) if comparison else None,
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def _found(pair: CorpusPair, results, dpi: int) -> int:
+    """Liczba wstrzykniętych różnic, które pokrywa co najmniej jeden wykryty obszar."""
+    scale = dpi / 72
+    found = 0
+    for difference in pair.differences:
+        x0, y0, x1, y1 = (value * scale for value in difference.rect)
+        result = results[difference.page_index]
+        if any(region.x <= x1 and region.x + region.width >= x0 and region.y <= y1 and region.y + region.height >= y0
+               for region in result.regions):
+            found += 1
+    return found
+
+
+def check_regressions(records: dict, baseline: dict, tolerance: float) -> list:
+    """Zwraca opisy pomiarów gorszych od bazowych o więcej niż tolerance."""
+    regressions = []
+    for key, record in records.items():
+        reference = baseline.get(key)
+        if not reference or "error" in record or "error" in reference:
+            continue
+        if record["median_s"] > reference["median_s"] * (1 + tolerance):
+            regressions.append(f"{key}: median {record['median_s'] * 1000:.1f} ms "
+                               f"(baseline {reference['median_s'] * 1000:.1f} ms)")
+        if (max(record["peak_mb"], reference["peak_mb"]) >= MIN_MEMORY_MB
+                and record["peak_mb"] > reference["peak_mb"] * (1 + tolerance)):
+            regressions.append(f"{key}: peak +RSS {record['peak_mb']:.1f} MB "
+                               f"(baseline {reference['peak_mb']:.1f} MB)")
+        if record.get("found") is not None and reference.get("found") is not None \
+                and record["found"] < reference["found"]:
+            regressions.append(f"{key}: found {record['found']} of {record['injected']} injected differences "
+                               f"(baseline {reference['found']})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dpi", type=int, nargs="+", default=[100, 150])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sensitivity", type=int, default=DEFAULT_SENSITIVITY)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--cases", nargs="+", choices=[case.name for case in DEFAULT_CASES],
+                        default=[case.name for case in DEFAULT_CASES])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "comparepdf-corpus"),
+                        help="directory for the generated PDF pairs (reused between runs)")
+    parser.add_argument("--baseline", help="JSON file with baseline results to check for regressions")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    pairs = [generate(case, args.corpus_dir) for case in DEFAULT_CASES if case.name in args.cases]
+    ctx = multiprocessing.get_context("spawn")
+    records = {}
+    print(f"{'case / stage':<30}{'median [ms]':>13}{'pages/s':>10}{'MPix/s':>9}{'peak +RSS [MB]':>16}{'found':>8}")
+    for pair in pairs:
+        for stage in args.stages:
+            # Kontroler renderuje zawsze przy DEFAULT_DPI, więc mierzony jest raz na przypadek.
+            for dpi in ([DEFAULT_DPI] if stage == "controller" else args.dpi):
+                key = f"{pair.case.name}@{dpi}/{stage}"
+                queue = ctx.Queue()
+                process = ctx.Process(target=measure, args=(pair, stage, dpi, args.repeat, args.sensitivity,
+                                                            args.workers, queue))
+                process.start()
+                outcome = queue.get()
+                process.join()
+                if "error" in outcome:
+                    records[key] = outcome
+                    print(f"{key:<30}  error: {outcome['error']}")
+                    continue
+
+                median = statistics.median(outcome["timings"])
+                records[key] = {
+                    "median_s": median,
+                    "min_s": min(outcome["timings"]),
+                    "pages_per_s": outcome["pages"] / median,
+                    "megapixels_per_s": outcome["megapixels"] / median,
+                    "peak_mb": outcome["peak_mb"],
+                    "found": outcome["found"],
+                    "injected": len(pair.differences),
+                }
+                found = "" if outcome["found"] is None else f"{outcome['found']}/{len(pair.differences)}"
+                print(f"{key:<30}{median * 1000:>13.1f}{records[key]['pages_per_s']:>10.1f}"
+                      f"{records[key]['megapixels_per_s']:>9.1f}{outcome['peak_mb']:>16.1f}{found:>8}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = check_regressions(records, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
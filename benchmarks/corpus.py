@@ -0,0 +1,224 @@
+"""Generator deterministycznego korpusu par PDF do benchmarków (fitz).
+
+Każdy przypadek to para dokumentów: bazowy i porównywany, identyczne poza kontrolowanymi,
+wstrzykniętymi różnicami, których położenie (w punktach PDF) jest znane. Ten sam przypadek
+i ziarno zawsze dają te same pliki, więc korpus można generować na żądanie zamiast trzymać
+go w repozytorium:
+    python -m benchmarks.corpus /tmp/comparepdf-corpus
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from dataclasses import dataclass, asdict, field
+from typing import List, Tuple
+
+import fitz
+import numpy as np
+
+KIND_TEXT = "text"
+KIND_VECTOR = "vector"
+KIND_SCANNED = "scanned"
+
+A4 = (595, 842)
+A0 = (2384, 3370)
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut "
+         "labore et dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris "
+         "nisi aliquip ex ea commodo consequat").split()
+
+LINE_HEIGHT = 13
+MARGIN = 50
+SCAN_DPI = 150
+SCAN_NOISE = 12  # Amplituda szumu skanu (0-255)
+
+Rect = Tuple[float, float, float, float]
+
+
+@dataclass(frozen=True)
+class CorpusCase:
+    """Konfiguracja przypadku: rodzaj treści, rozmiar i liczba stron oraz liczba wstrzykniętych różnic."""
+    name: str
+    kind: str
+    pages: int = 1
+    size: Tuple[float, float] = A4
+    differences: int = 3
+    seed: int = 0
+
+
+@dataclass
+class InjectedDifference:
+    """Wstrzyknięta różnica: strona i prostokąt (x0, y0, x1, y1) w punktach PDF."""
+    page_index: int
+    rect: Rect
+    description: str = ""
+
+
+@dataclass
+class CorpusPair:
+    case: CorpusCase
+    base_path: str
+    compare_path: str
+    differences: List[InjectedDifference] = field(default_factory=list)
+
+
+DEFAULT_CASES = (
+    CorpusCase("text", KIND_TEXT),
+    CorpusCase("vector", KIND_VECTOR),
+    CorpusCase("scanned", KIND_SCANNED),
+    CorpusCase("large-format", KIND_VECTOR, size=A0, differences=5),
+    CorpusCase("multi-page", KIND_TEXT, pages=20, differences=4),
+)
+
+
+def generate(case: CorpusCase, directory: str) -> CorpusPair:
+    """Tworzy (lub ponownie używa) parę plików przypadku w katalogu directory."""
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"{case.name}-{case.seed}")
+    pair = CorpusPair(case, f"{stem}-base.pdf", f"{stem}-compare.pdf", _plan_differences(case))
+    manifest = f"{stem}.json"
+    if os.path.exists(manifest) and os.path.exists(pair.base_path) and os.path.exists(pair.compare_path):
+        with open(manifest, encoding="utf-8") as f:
+            if json.load(f).get("case") == _case_dict(case):
+                return pair
+
+    for path, changed in ((pair.base_path, False), (pair.compare_path, True)):
+        document = fitz.open()
+        for page_index in range(case.pages):
+            injected = [d for d in pair.differences if d.page_index == page_index] if changed else []
+            page = document.new_page(width=case.size[0], height=case.size[1])
+            _BUILDERS[case.kind](page, random.Random(f"{case.seed}/{page_index}"), injected)
+        # Bez znaczników czasu i nowego identyfikatora - pliki są powtarzalne bajt w bajt.
+        document.set_metadata({})
+        document.save(path, garbage=3, deflate=True, no_new_id=True)
+        document.close()
+
+    with open(manifest, "w", encoding="utf-8") as f:
+        json.dump({"case": _case_dict(case), "differences": [asdict(d) for d in pair.differences]}, f, indent=2)
+    return pair
+
+
+def generate_all(directory: str, cases=DEFAULT_CASES) -> List[CorpusPair]:
+    return [generate(case, directory) for case in cases]
+
+
+def _case_dict(case: CorpusCase) -> dict:
+    data = asdict(case)
+    data["size"] = list(case.size)
+    return data
+
+
+def _plan_differences(case: CorpusCase) -> List[InjectedDifference]:
+    """Losuje (deterministycznie) położenie różnic: różne strony, a na stronie różne wiersze/komórki."""
+    rng = random.Random(f"{case.seed}/differences")
+    width, height = case.size
+    slots = _slots(case.kind, width, height)
+    planned = []
+    for index in range(case.differences):
+        page_index = rng.randrange(case.pages)
+        used = {d.rect for d in planned if d.page_index == page_index}
+        rect = rng.choice([slot for slot in slots if slot not in used] or slots)
+        planned.append(InjectedDifference(page_index, rect, f"{case.kind} change {index + 1}"))
+    return planned
+
+
+def _slots(kind: str, width: float, height: float) -> List[Rect]:
+    # Miejsca, w których można wstrzyknąć różnicę: wiersze tekstu lub komórki siatki kształtów.
+    if kind == KIND_VECTOR:
+        return [rect for rect, _ in _grid(width, height)]
+    return [(MARGIN, MARGIN + line * LINE_HEIGHT - 10, width - MARGIN, MARGIN + line * LINE_HEIGHT + 3)
+            for line in range(_line_count(height))]
+
+
+def _line_count(height: float) -> int:
+    return int((height - 2 * MARGIN) // LINE_HEIGHT)
+
+
+def _line_text(rng: random.Random, width: float) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) * 5 < width - 2 * MARGIN - 40:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)
+
+
+def _text_page(page: "fitz.Page", rng: random.Random, injected: List[InjectedDifference]):
+    """Strona tekstowa; różnica to zmienione słowo w wierszu."""
+    width, height = page.rect.width, page.rect.height
+    changed = {d.rect[1] for d in injected}
+    for line in range(_line_count(height)):
+        y = MARGIN + line * LINE_HEIGHT
+        text = _line_text(rng, width)
+        if y - 10 in changed:
+            words = text.split()
+            words[len(words) // 2] = "CHANGED"
+            text = " ".join(words)
+        page.insert_text((MARGIN, y), text, fontsize=10)
+
+
+def _grid(width: float, height: float, cell: float = 60) -> List[Tuple[Rect, int]]:
+    columns, rows = int((width - 2 * MARGIN) // cell), int((height - 2 * MARGIN) // cell)
+    return [((MARGIN + column * cell, MARGIN + row * cell, MARGIN + (column + 1) * cell, MARGIN + (row + 1) * cell),
+             row * columns + column)
+            for row in range(rows) for column in range(columns)]
+
+
+def _vector_page(page: "fitz.Page", rng: random.Random, injected: List[InjectedDifference]):
+    """Strona wektorowa: siatka kształtów i linii; różnica to przesunięty i przebarwiony kształt."""
+    width, height = page.rect.width, page.rect.height
+    changed = {d.rect for d in injected}
+    shape = page.new_shape()
+    for rect, index in _grid(width, height):
+        x0, y0, x1, y1 = rect
+        color = (rng.random(), rng.random(), rng.random())
+        offset = 6 if rect in changed else 0
+        inner = fitz.Rect(x0 + 8 + offset, y0 + 8 + offset, x1 - 8 + offset, y1 - 8 + offset)
+        if index % 3 == 0:
+            shape.draw_rect(inner)
+        elif index % 3 == 1:
+            shape.draw_circle(inner.tl + (inner.width / 2, inner.height / 2), inner.width / 2)
+        else:
+            shape.draw_bezier(inner.bl, inner.tl, inner.br, inner.tr)
+        shape.finish(color=(0, 0, 0), fill=(1 - color[0], color[1], color[2]) if rect in changed else color,
+                     width=0.8)
+        for step in range(4):
+            shape.draw_line((x0, y0 + step * 15), (x1, y0 + step * 15))
+        shape.finish(color=(0.7, 0.7, 0.7), width=0.3)
+    shape.commit()
+
+
+def _scanned_page(page: "fitz.Page", rng: random.Random, injected: List[InjectedDifference]):
+    """Strona skanu: obraz wyrenderowanej strony tekstowej z szumem; różnice są w pikselach obrazu."""
+    width, height = page.rect.width, page.rect.height
+    source = fitz.open()
+    _text_page(source.new_page(width=width, height=height), rng, injected)
+    pix = source[0].get_pixmap(matrix=fitz.Matrix(SCAN_DPI / 72, SCAN_DPI / 72), colorspace=fitz.csGRAY)
+    source.close()
+
+    samples = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    # Szum zależy tylko od ziarna strony - identyczny w obu dokumentach pary.
+    noise = np.random.default_rng(rng.randrange(2 ** 32)).integers(-SCAN_NOISE, SCAN_NOISE + 1, samples.shape)
+    scan = np.clip(samples.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    image = fitz.Pixmap(fitz.csGRAY, pix.width, pix.height, scan.tobytes(), False)
+    page.insert_image(page.rect, pixmap=image)
+
+
+_BUILDERS = {
+    KIND_TEXT: _text_page,
+    KIND_VECTOR: _vector_page,
+    KIND_SCANNED: _scanned_page,
+}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="output directory for the generated PDF pairs")
+    args = parser.parse_args(argv)
+    for pair in generate_all(args.directory):
+        print(f"{pair.case.name:<14}{pair.case.pages:>4} page(s){len(pair.differences):>4} difference(s)  "
+              f"{pair.base_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
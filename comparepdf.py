@@ -0,0 +1,276 @@
+"""Wiersz poleceń ComparePDF - porównanie plików PDF bez interfejsu graficznego.
+
+Przykłady:
+    python comparepdf.py old.pdf new.pdf -o diff.pdf
+    python comparepdf.py release_1/ release_2/ --report report/
+    python comparepdf.py archive/ --index archive.db
+    python comparepdf.py new.pdf --find-baseline archive.db
+
+Gdy oba argumenty są katalogami, pliki są dopasowywane po ścieżce względnej i porównywane wsadowo.
+Kody wyjścia: 0 - brak różnic, 1 - znaleziono różnice, 2 - błąd. Przy --find-baseline: 0 - znaleziono
+wzorzec, 1 - brak podobnego dokumentu, 2 - błąd.
+"""
+import argparse
+import logging
+import os
+import sys
+from config.settings import DEFAULT_DPI, DEFAULT_SENSITIVITY, MAX_WORKERS, BATCH_REPORT_DIR, BASELINE_RESULTS
+
+EXIT_IDENTICAL = 0
+EXIT_DIFFERENT = 1
+EXIT_ERROR = 2
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="comparepdf",
+        description="Compare two PDF files and write an annotated copy of the base document. "
+                    "When both arguments are directories, PDFs are matched by relative path and compared in batch."
+    )
+    parser.add_argument("base", help="base PDF file or directory")
+    parser.add_argument("compare", nargs="?",
+                        help="PDF file or directory compared against the base (not used with --index and "
+                             "--find-baseline)")
+    parser.add_argument("-o", "--output",
+                        help="annotated output (.pdf for a single file, otherwise one PNG per page); "
+                             "defaults to <base>_diff.pdf")
+    parser.add_argument("-s", "--sensitivity", type=int, default=DEFAULT_SENSITIVITY,
+                        help=f"difference threshold 0-255 (default: {DEFAULT_SENSITIVITY})")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI,
+                        help=f"render resolution (default: {DEFAULT_DPI})")
+    parser.add_argument("-j", "--workers", type=int, default=MAX_WORKERS,
+                        help=f"number of worker processes (default: {MAX_WORKERS})")
+    parser.add_argument("--report", default=BATCH_REPORT_DIR,
+                        help=f"batch mode: directory for the JSON/CSV summary and resume journal "
+                             f"(default: {BATCH_REPORT_DIR})")
+    parser.add_argument("--band-height", type=int,
+                        help="streaming mode for large pages: render and diff both pages in horizontal bands of "
+                             "this many pixels, keeping memory constant at high --dpi")
+    parser.add_argument("--coarse-dpi", type=int,
+                        help="two-stage mode: find candidate regions at this low resolution, then re-render only "
+                             "those regions at --dpi to refine them")
+    parser.add_argument("--structure", action="store_true",
+                        help="compare extracted words and vector paths instead of pixels "
+                             "(reports inserted, deleted and moved items)")
+    parser.add_argument("--grayscale", action="store_true",
+                        help="render pages in grayscale (faster, ignores color-only changes)")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the on-disk page raster cache")
+    parser.add_argument("-q", "--quiet", action="store_true", help="print nothing, only set the exit code")
+    parser.add_argument("-v", "--verbose", action="store_true", help="enable debug logging")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="record per-stage timing and memory spans of a single-pair comparison and write them "
+                             "to FILE as JSON lines")
+    parser.add_argument("--index", metavar="DB",
+                        help="add base (a PDF file or a directory searched recursively) to the baseline index DB; "
+                             "unchanged files are skipped")
+    parser.add_argument("--find-baseline", metavar="DB",
+                        help="list the documents in the baseline index DB most similar to base")
+    parser.add_argument("--top", type=int, default=BASELINE_RESULTS,
+                        help=f"--find-baseline: number of documents to list (default: {BASELINE_RESULTS})")
+    return parser
+
+
+def write_output(results, output_path: str):
+    """Zapisuje obrazy z zaznaczonymi różnicami: jeden plik PDF lub PNG dla każdej strony."""
+    images = [result.get_diff_image() for result in results]
+    if output_path.lower().endswith(".pdf"):
+        images[0].save(output_path, "PDF", save_all=True, append_images=images[1:])
+        return
+
+    # Numeracja wg kolejności wyników - po dopasowaniu stron indeksy stron wstawionych powtarzają się.
+    root, ext = os.path.splitext(output_path)
+    for number, image in enumerate(images, 1):
+        image.save(f"{root}_page_{number}{ext or '.png'}", "PNG")
+
+
+def run_batch(args) -> int:
+    """Porównuje wsadowo dwa drzewa katalogów."""
+    from services.batch_service import BatchService
+    from models.batch_result import STATUS_IDENTICAL, STATUS_DIFFERENT, STATUS_MISSING, STATUS_ERROR
+
+    def report(item):
+        if not args.quiet and item.status != STATUS_IDENTICAL:
+            print(f"{item.relative_path}: {item.status} {item.error}".rstrip())
+
+    try:
+        results = BatchService.run(args.base, args.compare, args.report,
+                                   args.sensitivity, args.dpi, args.workers,
+                                   use_cache=not args.no_cache, grayscale=args.grayscale, progress=report)
+    except Exception as e:
+        if not args.quiet:
+            print(f"comparepdf: error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    statuses = [item.status for item in results]
+    if not args.quiet:
+        print(f"{statuses.count(STATUS_DIFFERENT)} of {len(results)} file(s) differ, "
+              f"report written to {args.report}")
+    if STATUS_ERROR in statuses:
+        return EXIT_ERROR
+    # Plik obecny tylko w jednym katalogu również jest różnicą.
+    if STATUS_DIFFERENT in statuses or STATUS_MISSING in statuses:
+        return EXIT_DIFFERENT
+    return EXIT_IDENTICAL
+
+
+def run_index(args) -> int:
+    """Dodaje pliki do indeksu wzorców (przyrostowo)."""
+    from services.baseline_index import BaselineIndex
+
+    def report(path, error):
+        if not args.quiet and error:
+            print(f"{path}: error {error}")
+
+    try:
+        with BaselineIndex(args.index) as index:
+            indexed, unchanged, failed = index.add([args.base], args.workers, progress=report)
+            removed = index.remove_missing()
+            total = index.document_count
+    except Exception as e:
+        if not args.quiet:
+            print(f"comparepdf: error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    if not args.quiet:
+        print(f"{indexed} file(s) indexed, {unchanged} unchanged, {failed} failed, {removed} removed; "
+              f"{total} document(s) in {args.index}")
+    return EXIT_ERROR if failed else EXIT_IDENTICAL
+
+
+def run_find_baseline(args) -> int:
+    """Wypisuje dokumenty z indeksu najbardziej podobne do pliku base."""
+    from services.baseline_index import BaselineIndex
+
+    try:
+        if not os.path.exists(args.find_baseline):
+            raise FileNotFoundError(f"Baseline index {args.find_baseline} does not exist")
+        with BaselineIndex(args.find_baseline) as index:
+            matches = index.find(args.base, args.top)
+    except Exception as e:
+        if not args.quiet:
+            print(f"comparepdf: error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    if not args.quiet:
+        for match in matches:
+            print(f"{match.score:.3f}  {match.matched_pages}/{match.page_count} page(s)  {match.path}")
+        if not matches:
+            print("no similar document found")
+    # Odwrotnie niż przy porównaniu: 0 oznacza sukces wyszukiwania.
+    return EXIT_IDENTICAL if matches else EXIT_DIFFERENT
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    if args.index:
+        return run_index(args)
+    if args.find_baseline:
+        return run_find_baseline(args)
+    if args.compare is None:
+        parser.error("the compare argument is required unless --index or --find-baseline is given")
+
+    if os.path.isdir(args.base) and os.path.isdir(args.compare):
+        return run_batch(args)
+
+    if args.profile:
+        from utils import profiling
+        profiling.enable()
+
+    try:
+        # Import odroczony (wewnątrz funkcji porównujących) - samo --help nie ładuje fitz ani OpenCV.
+        if args.structure:
+            results = compare_structure(args)
+        elif args.band_height:
+            results = compare_banded(args)
+        elif args.coarse_dpi:
+            results = compare_pyramid(args)
+        else:
+            results = compare_rendered(args)
+        write_output(results, args.output or f"{os.path.splitext(args.base)[0]}_diff.pdf")
+    except Exception as e:
+        if not args.quiet:
+            print(f"comparepdf: error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        if args.profile:
+            profiling.write_jsonl(args.profile)
+
+    return report_results(args, results)
+
+
+def compare_rendered(args):
+    """Porównanie całych stron wyrenderowanych w pamięci."""
+    from services.pdf_service import PDFService
+    from services.raster_cache import RasterCache
+
+    raster_cache = None if args.no_cache else RasterCache()
+    base_doc = PDFService.load_pdf(args.base, dpi=args.dpi, raster_cache=raster_cache, grayscale=args.grayscale,
+                                   workers=args.workers)
+    compare_doc = PDFService.load_pdf(args.compare, dpi=args.dpi, raster_cache=raster_cache, grayscale=args.grayscale,
+                                      workers=args.workers)
+    if not base_doc or not compare_doc:
+        raise RuntimeError(f"Failed to load {args.base if not base_doc else args.compare}")
+
+    results = PDFService.compare_documents(base_doc, compare_doc, args.sensitivity, workers=args.workers)
+    if not results:
+        raise RuntimeError("Comparison failed")
+    return results
+
+
+def compare_banded(args):
+    """Porównanie strumieniowe (pasami) - stała pamięć niezależnie od rozmiaru strony."""
+    from services.band_service import BandService
+
+    results = BandService.compare_documents(args.base, args.compare, args.sensitivity, args.dpi,
+                                            args.band_height, args.workers, args.grayscale)
+    if not results:
+        raise RuntimeError("Comparison failed")
+    return results
+
+
+def compare_pyramid(args):
+    """Porównanie dwuetapowe - pełne DPI tylko w obszarach znalezionych przy niskim DPI."""
+    from services.pyramid_service import PyramidService
+
+    results = PyramidService.compare_documents(args.base, args.compare, args.sensitivity, args.dpi,
+                                               args.coarse_dpi, args.workers, args.grayscale)
+    if not results:
+        raise RuntimeError("Comparison failed")
+    return results
+
+
+def compare_structure(args):
+    """Porównanie strukturalne (tekst i wektory) - bez rasteryzacji stron do porównania."""
+    from services.structure_service import StructureService
+
+    results = StructureService.compare_documents(args.base, args.compare, args.dpi)
+    if not results:
+        raise RuntimeError("Comparison failed")
+    return results
+
+
+def report_results(args, results) -> int:
+    """Wypisuje podsumowanie porównania i zwraca kod wyjścia."""
+    from models.pdf_document import PAGE_MATCHED
+
+    differing_pages = [result for result in results if result.differences_count]
+    if not args.quiet:
+        for result in differing_pages:
+            if result.alignment != PAGE_MATCHED:
+                note = result.regions[0].label if result.regions else result.alignment
+                print(f"page {result.page_label()}" + (f": {note}" if note != result.alignment else ""))
+            else:
+                print(f"page {result.page_label()}: {result.differences_count} difference(s)")
+        print(f"{len(differing_pages)} of {len(results)} page(s) differ")
+        skipped = sum(1 for result in results if result.identical)
+        if skipped:
+            print(f"{skipped} identical page(s) skipped by fingerprint")
+
+    return EXIT_DIFFERENT if differing_pages else EXIT_IDENTICAL
+
+
+if __name__ == "__main__":
+    sys.exit(main())
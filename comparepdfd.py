@@ -0,0 +1,49 @@
+"""Usługa porównań ComparePDF działająca w tle (HTTP na localhost lub gnieździe uniksowym).
+
+Przykłady:
+    python comparepdfd.py --port 8765 -j 8
+    python comparepdfd.py --socket /tmp/comparepdf.sock
+
+API opisuje services/comparison_daemon.py.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from config.settings import MAX_WORKERS, DAEMON_HOST, DAEMON_PORT, DAEMON_CONCURRENT_JOBS
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="comparepdfd",
+        description="Run a local comparison service that keeps workers, rasters and results warm between jobs."
+    )
+    parser.add_argument("--host", default=DAEMON_HOST, help=f"address to listen on (default: {DAEMON_HOST})")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT, help=f"port to listen on (default: {DAEMON_PORT})")
+    parser.add_argument("--socket", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("-j", "--workers", type=int, default=MAX_WORKERS,
+                        help=f"number of worker processes (default: {MAX_WORKERS})")
+    parser.add_argument("--jobs", type=int, default=DAEMON_CONCURRENT_JOBS,
+                        help=f"number of jobs run at the same time (default: {DAEMON_CONCURRENT_JOBS})")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the on-disk page raster cache")
+    parser.add_argument("-v", "--verbose", action="store_true", help="enable debug logging")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+    # Import odroczony - samo --help nie ładuje fitz ani OpenCV.
+    from services.comparison_daemon import ComparisonDaemon, serve
+
+    daemon = ComparisonDaemon(args.workers, args.jobs, use_cache=not args.no_cache)
+    try:
+        asyncio.run(serve(daemon, args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
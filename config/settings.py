@@ -1,10 +1,14 @@
-from PyQt5.QtGui import QPalette, QColor
-from PyQt5.QtCore import Qt
+import os
 
 # Image settings
 MAX_IMAGE_SIZE = 50 * 1024 * 1024  # 50 MB
 DEFAULT_DPI = 72
 DEFAULT_SENSITIVITY = 15
+BAND_HEIGHT = 1024  # Wysokość pasa (px) w trybie strumieniowym dla stron wielkoformatowych
+RENDER_GRAYSCALE = False  # Renderowanie w skali szarości (fitz.csGRAY), gdy zmiany koloru nie mają znaczenia
+PYRAMID_COARSE_DPI = 72  # DPI etapu zgrubnego w porównaniu piramidowym
+PYRAMID_MARGIN = 2  # Margines (px przy DPI zgrubnym) wokół obszarów kandydujących
+PAGE_ASPECT_TOLERANCE = 0.01  # Strona o proporcjach różnych o mniej niż 1% wypełnia całą stronę bazową
 
 # UI settings
 WINDOW_TITLE = 'PDF Comparator v3.0'
@@ -20,14 +24,81 @@ MSG_SELECT_BASE = "Please select the base file using the radio buttons."
 MSG_ERROR_LOAD = "Error loading file: {}"
 MSG_ERROR_COMPARE = "Error comparing documents: {}"
 MSG_ERROR_GENERAL = "Wystąpił nieoczekiwany błąd: {}"
+MSG_PAGE = "Page {} / {}"
+MSG_PAGE_DETAIL = "{} (page {})"  # Np. "Page 4 / 6 (page 3 -> 4)" lub "(page 5 inserted)"
+MSG_NO_PAGES = "Page - / -"
+MSG_DIFFERENCE = "Difference {} / {}"
+MSG_NO_DIFFERENCE = "Difference - / {}"
+MSG_LOADING = "Loading PDF file {}..."
+MSG_STAGE_FINGERPRINT = "Fingerprinting pages"
+MSG_STAGE_RENDER = "Rendering pages"
+MSG_STAGE_ALIGN = "Matching pages"
+MSG_STAGE_COMPARE = "Comparing pages"
 
 # Timeouts
 PDF_LOAD_TIMEOUT = 15
 COMPARISON_TIMEOUT = 30
+BATCH_FILE_TIMEOUT = 600  # Limit czasu porównania jednej pary plików w trybie wsadowym
+OPERATION_POLL_INTERVAL = 0.1  # Co ile sekund oczekiwanie na pulę procesów sprawdza anulowanie
+WORKER_MAX_RSS = 4 * 1024 * 1024 * 1024  # Limit pamięci procesu roboczego (4 GB); None wyłącza kontrolę
+
+# Parallel processing
+MAX_WORKERS = os.cpu_count() or 1  # Liczba procesów renderujących/porównujących strony
+
+# Raster cache
+RASTER_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "comparepdf", "rasters")
+RASTER_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB
+
+# Page alignment (utils.page_alignment) - dopasowanie stron wstawionych, usuniętych i przestawionych
+PAGE_MATCH_THRESHOLD = 0.5  # Minimalne podobieństwo sygnatur (0-1), przy którym strony są parą
+PAGE_ALIGN_BAND = 32  # Dopuszczalne przesunięcie (w stronach) ponad różnicę długości fragmentów
+PAGE_SIGNATURE_THUMBNAIL = 64  # Dłuższy bok miniatury (px), z której liczony jest perceptual hash
+PAGE_SHINGLE_SIZE = 3  # Liczba słów w szinglu tekstu
+PAGE_SHINGLE_SAMPLE = 64  # Liczba najmniejszych skrótów szingli zapamiętywanych w sygnaturze
+PAGE_SIGNATURE_BATCH = 32  # Liczba stron, których sygnatury liczy jedno zadanie procesu roboczego
+
+# Baseline index (services.baseline_index) - wyszukiwanie wzorca w archiwum
+BASELINE_RESULTS = 5  # Liczba zwracanych najbliższych dokumentów
+BASELINE_MIN_SHARED_SHINGLES = 8  # Minimalna liczba wspólnych skrótów szingli strony-kandydata
+BASELINE_CANDIDATE_LIMIT = 2000  # Limit stron-kandydatów na stronę zapytania (np. puste strony)
+BASELINE_INDEX_TIMEOUT = 600  # Limit czasu indeksowania jednego pliku
+
+# Page cache (strony leniwie wczytywanego dokumentu w pamięci)
+PAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256 MB na dokument
+
+# Result store (utils.result_store) - mapy różnic w pliku mapowanym w pamięć
+RESULT_STORE_DIR = None  # Katalog pliku tymczasowego (None - katalog tymczasowy systemu)
+RESULT_STORE_MIN_BYTES = 256 * 1024  # Mniejsze tablice pozostają w pamięci
+RESULT_STORE_FILE_MAX_BYTES = 1024 * 1024 * 1024  # Po przekroczeniu (1 GB) zapis trafia do nowego pliku
+
+# Comparison daemon (comparepdfd.py, services.comparison_daemon)
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+DAEMON_CONCURRENT_JOBS = 2  # Liczba zleceń wykonywanych jednocześnie (strony i tak dzieli pula procesów)
+DAEMON_DOCUMENT_CACHE = 64  # Liczba otwartych dokumentów zachowywanych między zleceniami
+DAEMON_RESULT_CACHE = 1024  # Liczba zapamiętanych wyników (para plików i czułość)
+DAEMON_MAX_JOBS = 10000  # Liczba zleceń zakończonych, których stan można jeszcze odczytać
+DAEMON_MAX_REQUEST_BYTES = 1024 * 1024  # Limit rozmiaru treści żądania HTTP
+
+# Batch mode
+BATCH_REPORT_DIR = "comparepdf_report"
+BATCH_JOURNAL_FILE = "journal.jsonl"  # Dziennik zakończonych par - umożliwia wznowienie
+BATCH_SUMMARY_JSON = "summary.json"
+BATCH_SUMMARY_CSV = "summary.csv"
 
 # Colors
 DIFFERENCE_COLOR = (255, 0, 0)  # Red
 DIFFERENCE_OUTLINE_WIDTH = 3
+REGION_MERGE_GAP = 10  # Obszary różnic oddalone o mniej pikseli są łączone w jeden (0 wyłącza łączenie)
+SELECTED_REGION_COLOR = (255, 170, 0)  # Obrys obszaru wybranego przy nawigacji po różnicach
+REGION_COLORS = {  # Kolory obszarów porównania strukturalnego (tekst/wektory)
+    "inserted": (0, 170, 0),  # Green
+    "deleted": (255, 0, 0),  # Red
+    "moved": (0, 120, 255),  # Blue
+}
+
+# Structural (text/vector) comparison
+STRUCTURE_MOVE_TOLERANCE = 1.0  # Przesunięcie (pt) poniżej którego element uznajemy za niezmieniony
 
 # Layout
 SLIDER_MIN = 1
@@ -35,68 +106,22 @@ SLIDER_MAX = 100
 ZOOM_FACTOR_IN = 1.25
 ZOOM_FACTOR_OUT = 0.8
 
-# Testing Mode
-TESTING_MODE = True  # Ustaw na True, aby włączyć tryb testowy
-
-def get_dark_palette():
-    palette = QPalette()
-    palette.setColor(QPalette.Window, QColor(53, 53, 53))
-    palette.setColor(QPalette.WindowText, Qt.white)
-    palette.setColor(QPalette.Base, QColor(35, 35, 35))
-    palette.setColor(QPalette.AlternateBase, QColor(53, 53, 53))
-    palette.setColor(QPalette.ToolTipBase, Qt.white)
-    palette.setColor(QPalette.ToolTipText, Qt.white)
-    palette.setColor(QPalette.Text, Qt.white)
-    palette.setColor(QPalette.Button, QColor(53, 53, 53))
-    palette.setColor(QPalette.ButtonText, Qt.white)
-    palette.setColor(QPalette.BrightText, Qt.red)
-    palette.setColor(QPalette.Highlight, QColor(142, 45, 197).lighter())
-    palette.setColor(QPalette.HighlightedText, Qt.black)
-    return palette
-
-QSS = """
-    QWidget {
-        font-size: 14px;
-        color: #ffffff;
-        background-color: #353535;
-    }
-    QPushButton {
-        background-color: #555555;
-        border: none;
-        border-radius: 5px;
-        padding: 5px 10px;
-    }
-    QPushButton:hover {
-        background-color: #666666;
-    }
-    QPushButton:pressed {
-        background-color: #444444;
-    }
-    QSlider::groove:horizontal {
-        border: 1px solid #444444;
-        height: 8px;
-        background: #555555;
-        border-radius: 4px;
-    }
-    QSlider::handle:horizontal {
-        background: #aaaaaa;
-        border: 1px solid #777777;
-        width: 14px;
-        margin: -4px 0;
-        border-radius: 7px;
-    }
-    QRadioButton::indicator {
-        width: 14px;
-        height: 14px;
-        border-radius: 7px;
-        border: 1px solid #cccccc;
-        background: #555555;
-    }
-    QRadioButton::indicator:checked {
-        background-color: #00bfff;
-        border: 1px solid #00bfff;
-    }
-    QLabel {
-        font-size: 14px;
-    }
-"""
+# Result viewer tiles
+TILE_SIZE = 512  # Bok kafelka (px)
+TILE_MAX_LEVEL = 16  # Maksymalne powiększenie kafelków względem obrazu bazowego
+TILE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+TILE_UPDATE_DELAY_MS = 50  # Opóźnienie odświeżenia kafelków po przewinięciu lub zmianie powiększenia
+
+# Profiling (utils.profiling)
+PROFILING_ENABLED = False  # Pomiary etapów od startu aplikacji (można je też włączyć w panelu statystyk - F12)
+PROFILING_MEMORY = True  # Mierzenie szczytowej alokacji (tracemalloc) - spowalnia alokacje, gdy pomiary są włączone
+PROFILING_MAX_RECORDS = 100_000  # Najstarsze rekordy są usuwane po przekroczeniu limitu
+
+# Testing Mode (utils.debug_sink)
+TESTING_MODE = False  # Ustaw na True, aby zapisywać pośrednie wyniki porównania (w tle, do DEBUG_ARTIFACT_DIR)
+DEBUG_ARTIFACT_DIR = "debug_artifacts"  # Każde uruchomienie zapisuje do własnego podkatalogu
+DEBUG_SAMPLE_EVERY = 1  # Zapisywany jest co n-ty artefakt danego rodzaju
+DEBUG_MAX_BYTES = 512 * 1024 * 1024  # Limit zapisanych plików na uruchomienie (512 MB)
+DEBUG_QUEUE_MAX_BYTES = 256 * 1024 * 1024  # Limit danych czekających na zapis; nadmiarowe artefakty są pomijane
+DEBUG_PNG_COMPRESSION = 1  # Poziom kompresji PNG (0-9) - niski, bo liczy się czas zapisu
+DEBUG_FLUSH_TIMEOUT = 10  # Czas (s) na zapis pozostałych artefaktów przy zamykaniu aplikacji
@@ -0,0 +1,65 @@
+from PyQt5.QtGui import QPalette, QColor
+from PyQt5.QtCore import Qt
+
+def get_dark_palette():
+    palette = QPalette()
+    palette.setColor(QPalette.Window, QColor(53, 53, 53))
+    palette.setColor(QPalette.WindowText, Qt.white)
+    palette.setColor(QPalette.Base, QColor(35, 35, 35))
+    palette.setColor(QPalette.AlternateBase, QColor(53, 53, 53))
+    palette.setColor(QPalette.ToolTipBase, Qt.white)
+    palette.setColor(QPalette.ToolTipText, Qt.white)
+    palette.setColor(QPalette.Text, Qt.white)
+    palette.setColor(QPalette.Button, QColor(53, 53, 53))
+    palette.setColor(QPalette.ButtonText, Qt.white)
+    palette.setColor(QPalette.BrightText, Qt.red)
+    palette.setColor(QPalette.Highlight, QColor(142, 45, 197).lighter())
+    palette.setColor(QPalette.HighlightedText, Qt.black)
+    return palette
+
+QSS = """
+    QWidget {
+        font-size: 14px;
+        color: #ffffff;
+        background-color: #353535;
+    }
+    QPushButton {
+        background-color: #555555;
+        border: none;
+        border-radius: 5px;
+        padding: 5px 10px;
+    }
+    QPushButton:hover {
+        background-color: #666666;
+    }
+    QPushButton:pressed {
+        background-color: #444444;
+    }
+    QSlider::groove:horizontal {
+        border: 1px solid #444444;
+        height: 8px;
+        background: #555555;
+        border-radius: 4px;
+    }
+    QSlider::handle:horizontal {
+        background: #aaaaaa;
+        border: 1px solid #777777;
+        width: 14px;
+        margin: -4px 0;
+        border-radius: 7px;
+    }
+    QRadioButton::indicator {
+        width: 14px;
+        height: 14px;
+        border-radius: 7px;
+        border: 1px solid #cccccc;
+        background: #555555;
+    }
+    QRadioButton::indicator:checked {
+        background-color: #00bfff;
+        border: 1px solid #00bfff;
+    }
+    QLabel {
+        font-size: 14px;
+    }
+"""
@@ -0,0 +1,41 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+import logging
+from typing import Callable
+from services.operation import Operation, OperationCancelled
+
+
+class OperationWorker(QThread):
+    """Wykonuje zadanie (ładowanie lub porównanie) poza wątkiem GUI.
+
+    Zadanie otrzymuje obiekt Operation, przez który raportuje postęp (sygnał progress)
+    i sprawdza żądanie anulowania. Wynik lub błąd przekazywany jest sygnałami do wątku GUI.
+    """
+
+    progress = pyqtSignal(str, int, int)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, name: str, task: Callable[[Operation], object], parent=None):
+        super().__init__(parent)
+        self.name = name
+        self._task = task
+        self.operation = Operation(progress=self.progress.emit)
+
+    def run(self):
+        try:
+            result = self._task(self.operation)
+        except OperationCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            logging.error(f"Operation {self.name} failed: {e}")
+            self.failed.emit(str(e))
+        else:
+            # Anulowanie zgłoszone już po ostatnim kroku - wynik jest nieaktualny.
+            if self.operation.cancelled:
+                self.cancelled.emit()
+            else:
+                self.succeeded.emit(result)
+
+    def cancel(self):
+        self.operation.cancel()
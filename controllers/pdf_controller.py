@@ -2,15 +2,24 @@ from PyQt5.QtCore import QObject, pyqtSlot
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtWidgets import QFileDialog
 import logging
+from typing import Callable, Dict, Optional, Tuple
+from controllers.operation_worker import OperationWorker
 from models.pdf_document import PDFDocument, ComparisonResult
+from models.region_index import RegionIndex
 from services.pdf_service import PDFService
-from utils.image_utils import pil2qimage
-from config.settings import DEFAULT_SENSITIVITY, MSG_SELECT_FILES, TESTING_MODE
+from services.diff_cache import DiffCache
+from services.raster_cache import RasterCache
+from services.tile_service import TileSource
+from utils import diff_pipeline, result_store
+from utils.qt_utils import array2qimage
+from config.settings import DEFAULT_SENSITIVITY, MSG_SELECT_FILES, MSG_LOADING, MSG_STAGE_RENDER, TESTING_MODE
 
 MSG_ERROR_LOAD = "Błąd podczas ładowania pliku: {}"
 MSG_ERROR_COMPARE = "Błąd podczas porównywania dokumentów: {}"
 MSG_COMPARING = "Porównywanie dokumentów..."
 
+OPERATION_COMPARE = "compare"
+
 class PDFController(QObject):
     def __init__(self):
         super().__init__()
@@ -21,6 +30,8 @@ class PDFController(QObject):
 
     def _init_services(self):
         self.pdf_service = PDFService()
+        self.diff_cache = DiffCache()
+        self.raster_cache = RasterCache()
 
     def _init_variables(self):
         # self.view = None
@@ -29,7 +40,12 @@ class PDFController(QObject):
         self.base_doc_num = 1
         self.sensitivity = DEFAULT_SENSITIVITY
         self.comparison_result = None
-        self.current_operation = None
+        self.comparison_results = []
+        self.current_page = 0
+        self.current_region: Optional[int] = None  # Wybrany obszar różnicy bieżącej strony
+        # Operacje w toku (ładowanie, porównanie) wg nazwy; nowa operacja o tej samej nazwie zastępuje starszą.
+        self.operations: Dict[str, OperationWorker] = {}
+        self._operation_handlers: Dict[str, Tuple[Callable, str]] = {}
 
     def set_view(self, view):
         self.view = view
@@ -60,37 +76,46 @@ class PDFController(QObject):
 
             if not file_path:
                 return
+            self.open_file(doc_num, file_path)
 
+        except Exception as e:
+            logging.error(f"Error loading file: {e}")
             if self.view:
-                self.view.show_progress(f"Loading PDF file {doc_num}...")
+                self.view.show_error(MSG_ERROR_LOAD.format(str(e)))
 
-            document = self.pdf_service.load_pdf(file_path, TESTING_MODE)
-            if not document:
-                raise Exception(f"Failed to load PDF file {doc_num}")
+    def open_file(self, doc_num: int, file_path: str):
+        # Ładowanie w tle; porównanie w toku dotyczy poprzedniego dokumentu, więc jest anulowane.
+        self._cancel(OPERATION_COMPARE)
+        self._start_operation(
+            f"load_{doc_num}",
+            lambda operation: self.pdf_service.load_pdf(file_path, TESTING_MODE, raster_cache=self.raster_cache,
+                                                        operation=operation),
+            MSG_LOADING.format(doc_num),
+            lambda document: self._on_document_loaded(doc_num, document),
+            MSG_ERROR_LOAD
+        )
 
-            if doc_num == 1:
-                self.doc1 = document
-            else:
-                self.doc2 = document
+    def _on_document_loaded(self, doc_num: int, document: PDFDocument):
+        if not document:
+            raise Exception(f"Failed to load PDF file {doc_num}")
 
-            self._update_preview(doc_num, document)
+        if doc_num == 1:
+            self.doc1 = document
+        else:
+            self.doc2 = document
+        self.diff_cache.clear()
+        result_store.get_store().reset()
 
-            if self.view:
-                self.view.hide_progress()
+        self._update_preview(doc_num, document)
 
-            # Po wczytaniu obu plików nie ma automatycznej analizy.
-            # Analiza dopiero po wciśnięciu "Compare" lub zmianie parametrów po pierwszej analizie.
-
-        except Exception as e:
-            logging.error(f"Error loading file: {e}")
-            if self.view:
-                self.view.hide_progress()
-                self.view.show_error(MSG_ERROR_LOAD.format(str(e)))
+        # Po wczytaniu obu plików nie ma automatycznej analizy.
+        # Analiza dopiero po wciśnięciu "Compare" lub zmianie parametrów po pierwszej analizie.
 
     def _update_preview(self, doc_num: int, document: PDFDocument):
         try:
-            if document and document.preview_image and self.view:
-                qimage = pil2qimage(document.preview_image)
+            if document and document.preview_image is not None and self.view:
+                # Etykieta podglądu wymaga QPixmap; QImage tylko wskazuje na tablicę podglądu (bez kopii).
+                qimage = array2qimage(document.preview_image, copy=False)
                 if qimage:
                     pixmap = QPixmap.fromImage(qimage)
                     self.view.preview_panel.update_preview(doc_num, pixmap)
@@ -99,16 +124,19 @@ class PDFController(QObject):
 
     @pyqtSlot(int)
     def set_sensitivity(self, value: int):
-        # Tylko zmieniamy wartość czułości, nie wywołujemy analizy od razu.
+        # Podczas przeciągania suwaka progujemy ponownie zapamiętaną mapę różnic bieżącej strony,
+        # co jest na tyle tanie, że wynik aktualizuje się na żywo.
         self.sensitivity = value
+        try:
+            if self.comparison_result:
+                self._show_page(self.current_page)
+        except Exception as e:
+            logging.error(f"Error applying sensitivity: {e}")
 
     @pyqtSlot(int)
     def update_diff_after_sensitivity_release(self, value: int):
-        # Po zwolnieniu suwaka, jeśli mamy już wynik (compare został kliknięty wcześniej)
-        # i oba dokumenty są załadowane, to wykonujemy ponowną analizę.
-        self.sensitivity = value
-        if self.comparison_result and self.doc1 and self.doc2:
-            self._run_difference_analysis()
+        # Po zwolnieniu suwaka upewniamy się, że bieżąca strona odpowiada końcowej czułości.
+        self.set_sensitivity(value)
 
     @pyqtSlot()
     def compare_documents(self):
@@ -118,61 +146,272 @@ class PDFController(QObject):
                     self.view.show_error(MSG_SELECT_FILES)
                 return
 
-            if self.view:
-                self.view.show_progress(MSG_COMPARING)
-
             self._run_difference_analysis()
 
-            if self.view:
-                self.view.hide_progress()
-
         except Exception as e:
             logging.error(f"Error comparing documents: {e}")
             if self.view:
-                self.view.hide_progress()
                 self.view.show_error(MSG_ERROR_COMPARE.format(str(e)))
 
     def _run_difference_analysis(self):
-        # Metoda pomocnicza do uruchamiania analizy różnic.
+        # Metoda pomocnicza do uruchamiania analizy różnic w tle.
+        # Porównanie jeszcze w toku (np. po zmianie dokumentu bazowego) jest anulowane i zastępowane nowym.
         base_doc = self.doc1 if self.base_doc_num == 1 else self.doc2
         compare_doc = self.doc2 if self.base_doc_num == 1 else self.doc1
+        sensitivity = self.sensitivity
+        current_page = self.current_page
+
+        def compare(operation):
+            results = self.pdf_service.compare_documents(
+                base_doc,
+                compare_doc,
+                sensitivity,
+                TESTING_MODE,
+                diff_cache=self.diff_cache,
+                operation=operation
+            )
+            # Stronę, która zostanie wyświetlona, wczytujemy jeszcze w tle - nie w wątku interfejsu.
+            if results:
+                operation.report(MSG_STAGE_RENDER, 0, 1)
+                results[min(current_page, len(results) - 1)].base_page()
+                operation.report(MSG_STAGE_RENDER, 1, 1)
+            return results
 
-        self.comparison_result = self.pdf_service.compare_documents(
-            base_doc,
-            compare_doc,
-            self.sensitivity,
-            TESTING_MODE
+        self._start_operation(
+            OPERATION_COMPARE,
+            compare,
+            MSG_COMPARING,
+            self._on_comparison_finished,
+            MSG_ERROR_COMPARE
         )
 
-        if self.comparison_result and self.comparison_result.is_valid():
-            result_qimage = pil2qimage(self.comparison_result.diff_image)
-            if result_qimage and self.view:
-                self.view.graphics_view.setPhoto(QPixmap.fromImage(result_qimage))
-        else:
+    def _on_comparison_finished(self, results):
+        self.comparison_results = results
+        if not self.comparison_results or not all(r.is_valid() for r in self.comparison_results):
+            self.comparison_result = None
             raise Exception("Comparison failed")
 
+        # Po ponownej analizie zostajemy na tej samej stronie (o ile nadal istnieje).
+        self._show_page(min(self.current_page, len(self.comparison_results) - 1))
+
+    def _show_page(self, page_index: int):
+        # Wyświetla wynik porównania wybranej strony.
+        self.current_page = page_index
+        self.comparison_result = self.comparison_results[page_index]
+        self.current_region = None
+        self._page_regions(page_index)
+
+        if self.view:
+            graphics_view = self.view.graphics_view
+            # Ta sama strona (np. po zmianie czułości) - zmienia się tylko warstwa obrysów, a widok
+            # zachowuje powiększenie i pozycję.
+            # Strona bazowa pochodzi z pamięci podręcznej dokumentu (renderowana przy pierwszym wyświetleniu).
+            base_page = self.comparison_result.base_page()
+            if graphics_view.image() is not base_page:
+                graphics_view.setImage(base_page, self._tile_source(self.comparison_result))
+            graphics_view.setRegions(self.comparison_result.regions)
+            graphics_view.highlightRegion(None)
+        self._update_page_info()
+
+    def _page_regions(self, page_index: int) -> RegionIndex:
+        # Pozostałe strony progujemy dopiero przy ich wyświetleniu lub przejściu do ich różnic.
+        result = self.comparison_results[page_index]
+        if result.sensitivity != self.sensitivity:
+            self.pdf_service.apply_sensitivity(result, self.sensitivity, TESTING_MODE)
+        return result.region_index()
+
+    def _tile_source(self, result: ComparisonResult) -> TileSource:
+        # Źródło kafelków widoku: strona bazowa renderowana z wektorów.
+        return TileSource(result.page_document.file_path, result.page_index)
+
+    def _update_page_info(self):
+        if self.view:
+            # Strona przesunięta, wstawiona lub usunięta jest opisana numerami stron dokumentów.
+            label = self.comparison_result.page_label() if self.comparison_result else ""
+            self.view.control_panel.set_page_info(self.current_page, len(self.comparison_results),
+                                                  label if label != str(self.current_page + 1) else "")
+            self._update_difference_info()
+
+    def _update_difference_info(self):
+        count = len(self.comparison_result.regions) if self.comparison_result else 0
+        position = None
+        if self.current_region is not None:
+            position = self.comparison_result.region_index().position(self.current_region)
+        enabled = any(result.differences_count or result.sensitivity != self.sensitivity
+                      for result in self.comparison_results if not result.identical)
+        self.view.control_panel.set_difference_info(position, count, enabled)
+
+    def _select_region(self, region: Optional[int]):
+        # Wyróżnia obszar bieżącej strony i przewija do niego widok.
+        self.current_region = region
+        if self.view:
+            rect = self.comparison_result.regions[region].rect if region is not None else None
+            if rect is not None:
+                self.view.graphics_view.setRegionsVisible(True)
+            self.view.graphics_view.highlightRegion(rect)
+            self._update_difference_info()
+
+    @pyqtSlot()
+    def next_difference(self):
+        # Następny obszar w kolejności czytania (bez wyboru - pierwszy); za ostatnim - pierwszy obszar kolejnej strony z różnicami.
+        try:
+            if not self.comparison_result:
+                return
+            region = self._page_regions(self.current_page).next(self.current_region)
+            if region is not None:
+                self._select_region(region)
+                return
+            for page_index in range(self.current_page + 1, len(self.comparison_results)):
+                if not self.comparison_results[page_index].identical and len(self._page_regions(page_index)):
+                    self._show_page(page_index)
+                    self._select_region(self.comparison_result.region_index().first())
+                    return
+        except Exception as e:
+            logging.error(f"Error switching difference: {e}")
+
+    @pyqtSlot()
+    def previous_difference(self):
+        # Poprzedni obszar; przed pierwszym - ostatni obszar poprzedniej strony z różnicami.
+        try:
+            if not self.comparison_result:
+                return
+            region = self._page_regions(self.current_page).previous(self.current_region)
+            if region is not None:
+                self._select_region(region)
+                return
+            for page_index in range(self.current_page - 1, -1, -1):
+                if not self.comparison_results[page_index].identical and len(self._page_regions(page_index)):
+                    self._show_page(page_index)
+                    self._select_region(self.comparison_result.region_index().last())
+                    return
+        except Exception as e:
+            logging.error(f"Error switching difference: {e}")
+
+    @pyqtSlot(float, float)
+    def select_region_at(self, x: float, y: float):
+        # Kliknięcie w widoku wybiera obszar pod kursorem (z marginesem obrysu) lub usuwa wybór.
+        try:
+            if self.comparison_result and not self.comparison_result.identical:
+                index = self._page_regions(self.current_page)
+                self._select_region(index.at(x, y, diff_pipeline.OUTLINE_MARGIN))
+        except Exception as e:
+            logging.error(f"Error selecting difference: {e}")
+
+    @pyqtSlot()
+    def next_page(self):
+        try:
+            if self.current_page < len(self.comparison_results) - 1:
+                self._show_page(self.current_page + 1)
+        except Exception as e:
+            logging.error(f"Error switching page: {e}")
+
+    @pyqtSlot()
+    def previous_page(self):
+        try:
+            if self.comparison_results and self.current_page > 0:
+                self._show_page(self.current_page - 1)
+        except Exception as e:
+            logging.error(f"Error switching page: {e}")
+
+    def _start_operation(self, name: str, task: Callable, message: str, on_success: Callable, error_message: str):
+        # Uruchamia zadanie w wątku roboczym; wynik trafia do on_success w wątku GUI.
+        self._cancel(name)
+        worker = OperationWorker(name, task, self)
+        worker.progress.connect(self._on_operation_progress)
+        worker.succeeded.connect(self._on_operation_succeeded)
+        worker.failed.connect(self._on_operation_failed)
+        worker.cancelled.connect(self._on_operation_cancelled)
+        worker.finished.connect(worker.deleteLater)
+        self.operations[name] = worker
+        self._operation_handlers[name] = (on_success, error_message)
+        if self.view:
+            self.view.show_progress(message)
+        worker.start()
+
+    def _cancel(self, name: str):
+        worker = self.operations.pop(name, None)
+        if worker:
+            logging.debug(f"Cancelling operation {name}")
+            worker.cancel()
+        if not self.operations and self.view:
+            self.view.hide_progress()
+
+    def _finish_operation(self, worker: OperationWorker) -> bool:
+        # Zwraca False dla operacji zastąpionej nowszą lub anulowanej - jej wynik jest pomijany.
+        if self.operations.get(worker.name) is not worker:
+            return False
+        del self.operations[worker.name]
+        if not self.operations and self.view:
+            self.view.hide_progress()
+        return True
+
+    @pyqtSlot(str, int, int)
+    def _on_operation_progress(self, stage: str, done: int, total: int):
+        worker = self.sender()
+        if self.view and self.operations.get(worker.name) is worker:
+            self.view.update_progress(stage, done, total)
+
+    @pyqtSlot(object)
+    def _on_operation_succeeded(self, result):
+        worker = self.sender()
+        if not self._finish_operation(worker):
+            return
+        on_success, error_message = self._operation_handlers.pop(worker.name)
+        try:
+            on_success(result)
+        except Exception as e:
+            logging.error(f"Error in operation {worker.name}: {e}")
+            if self.view:
+                self.view.show_error(error_message.format(str(e)))
+
+    @pyqtSlot(str)
+    def _on_operation_failed(self, message: str):
+        worker = self.sender()
+        if not self._finish_operation(worker):
+            return
+        _, error_message = self._operation_handlers.pop(worker.name)
+        if self.view:
+            self.view.show_error(error_message.format(message))
+
+    @pyqtSlot()
+    def _on_operation_cancelled(self):
+        self._finish_operation(self.sender())
+
     @pyqtSlot()
     def reset(self):
         try:
+            self.cancel_operation()
             self._init_variables()
+            self.diff_cache.clear()
+            result_store.get_store().reset()
             if self.view:
                 self.view.preview_panel.clear_preview(1)
                 self.view.preview_panel.clear_preview(2)
-                self.view.graphics_view.setPhoto(None)
+                self.view.graphics_view.setImage(None)
+                self._update_page_info()
         except Exception as e:
             logging.error(f"Error resetting application: {e}")
 
     @pyqtSlot()
     def clear(self):
         try:
-            if self.comparison_result and self.comparison_result.original_image and self.view:
-                original_qimage = pil2qimage(self.comparison_result.original_image)
-                if original_qimage:
-                    self.view.graphics_view.setPhoto(QPixmap.fromImage(original_qimage))
+            # Ukrywa tylko warstwę obrysów - obraz strony pozostaje bez zmian.
+            if self.comparison_result and self.view:
+                self.current_region = None
+                self.view.graphics_view.highlightRegion(None)
+                self.view.graphics_view.setRegionsVisible(False)
+                self._update_difference_info()
         except Exception as e:
             logging.error(f"Error clearing comparison: {e}")
 
+    @pyqtSlot()
     def cancel_operation(self):
-        if self.current_operation:
-            self.current_operation.cancel()
-            self.current_operation = None
+        for name in list(self.operations):
+            self._cancel(name)
+
+    def shutdown(self, timeout_ms: int = 5000):
+        # Przy zamykaniu aplikacji anulujemy operacje i czekamy na zakończenie wątków.
+        workers = list(self.operations.values())
+        self.cancel_operation()
+        for worker in workers:
+            worker.wait(timeout_ms)
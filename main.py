@@ -4,17 +4,17 @@ from PyQt5.QtGui import QPalette
 from PyQt5.QtCore import Qt
 from controllers.pdf_controller import PDFController
 from views.main_window import MainWindow
-from config.settings import get_dark_palette, QSS  # importujemy z pliku settings
+from config.style import get_dark_palette, QSS  # importujemy z pliku style
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
 
-    # Ustawienie palety z settings.py
+    # Ustawienie palety z style.py
     palette = get_dark_palette()
     app.setPalette(palette)
 
-    # Ustawienie QSS z pliku settings.py
+    # Ustawienie QSS z pliku style.py
     app.setStyleSheet(QSS)
 
     controller = PDFController()
@@ -0,0 +1,14 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class BaselineMatch:
+    """Dokument archiwum podobny do szukanego pliku (wynik zapytania do indeksu wzorców).
+
+    score (0-1) to suma najlepszych podobieństw stron szukanego pliku do stron dokumentu,
+    podzielona przez liczbę stron dłuższego z nich - identyczna rewizja ma wynik 1.
+    """
+    path: str
+    score: float
+    matched_pages: int
+    page_count: int
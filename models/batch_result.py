@@ -0,0 +1,35 @@
+from dataclasses import dataclass, asdict, fields
+from typing import List
+
+STATUS_IDENTICAL = "identical"
+STATUS_DIFFERENT = "different"
+STATUS_MISSING = "missing"
+STATUS_ERROR = "error"
+
+
+@dataclass
+class BatchItemResult:
+    """Wynik porównania jednej pary plików w trybie wsadowym."""
+    relative_path: str
+    status: str
+    pages: int = 0
+    differing_pages: int = 0
+    regions: int = 0
+    skipped_pages: int = 0
+    seconds: float = 0.0
+    error: str = ""
+
+    def to_dict(self) -> dict:
+        """Zwraca wynik jako słownik gotowy do zapisu w JSON/CSV."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BatchItemResult":
+        """Odtwarza wynik z zapisanego słownika, ignorując nieznane pola."""
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+    @staticmethod
+    def field_names() -> List[str]:
+        """Nazwy kolumn raportu CSV."""
+        return [f.name for f in fields(BatchItemResult)]
@@ -0,0 +1,70 @@
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+from models.pdf_document import ComparisonResult
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_FINISHED = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+_job_ids = itertools.count(1)
+
+
+@dataclass
+class ComparisonJob:
+    """Zlecenie porównania pary plików w usłudze (services.comparison_daemon).
+
+    Mniejsza wartość priority oznacza wcześniejsze wykonanie; zlecenia o równym priorytecie
+    wykonywane są w kolejności przyjęcia. stage, done i total opisują postęp bieżącego etapu,
+    a pages - po zakończeniu - wyniki stron w postaci gotowej do zapisu w JSON.
+    """
+    base: str
+    compare: str
+    sensitivity: int
+    dpi: int
+    grayscale: bool = False
+    priority: int = 0
+    id: str = field(default_factory=lambda: str(next(_job_ids)))
+    status: str = JOB_QUEUED
+    stage: str = ""
+    done: int = 0
+    total: int = 0
+    cached: bool = False  # Wynik pochodzi z pamięci podręcznej usługi
+    error: str = ""
+    pages: Optional[List[dict]] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in JOB_FINISHED
+
+    def to_dict(self, pages: bool = True) -> dict:
+        """Zwraca stan zlecenia jako słownik JSON (pages=False - bez wyników stron)."""
+        data = {name: getattr(self, name) for name in (
+            "id", "status", "base", "compare", "sensitivity", "dpi", "grayscale", "priority", "stage", "done",
+            "total", "cached", "error", "submitted_at", "started_at", "finished_at")}
+        if self.pages is not None:
+            data["differing_pages"] = sum(1 for page in self.pages if page["regions"])
+            if pages:
+                data["pages"] = self.pages
+        return data
+
+    @staticmethod
+    def page_to_dict(result: ComparisonResult) -> dict:
+        """Opis wyniku strony: numeracja, dopasowanie i obszary różnic (x, y, szerokość, wysokość w pikselach)."""
+        return {
+            "page": result.page_index + 1,
+            "compare_page": None if result.compare_page_index is None else result.compare_page_index + 1,
+            "label": result.page_label(),
+            "alignment": result.alignment,
+            "identical": result.identical,
+            "regions": [{"x": region.x, "y": region.y, "width": region.width, "height": region.height,
+                         "kind": region.kind, "label": region.label, "pixels": region.pixels}
+                        for region in result.regions],
+        }
@@ -1,40 +1,201 @@
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+import numpy as np
 from PIL import Image
+from utils import diff_pipeline
+from utils.page_cache import PageCache
+from config.settings import DIFFERENCE_COLOR, REGION_COLORS
+
+if TYPE_CHECKING:
+    from utils.page_fingerprint import PageSignature
+
+REGION_CHANGED = "changed"
+REGION_INSERTED = "inserted"
+REGION_DELETED = "deleted"
+REGION_MOVED = "moved"
+
+# Dopasowanie stron (utils.page_alignment)
+PAGE_MATCHED = "matched"
+PAGE_INSERTED = "inserted"  # Strona tylko w dokumencie porównywanym
+PAGE_DELETED = "deleted"  # Strona tylko w dokumencie bazowym
 
 @dataclass
 class PDFDocument:
-    """Reprezentuje pojedynczy dokument PDF."""
+    """Reprezentuje pojedynczy dokument PDF.
+
+    Strony są tablicami uint8: H x W x 3 (RGB) lub H x W (skala szarości), zwykle widokami na bufor
+    pixmapy (utils.page_buffer). Dokument wczytany przez PDFService.load_pdf jest leniwy: zna tylko
+    rozmiary stron (page_sizes, szerokość x wysokość w pikselach), a strony renderuje przy pierwszym
+    użyciu przez page_loader i trzyma w ograniczonej pamięci podręcznej LRU - zajętość pamięci zależy
+    od liczby oglądanych stron, nie od długości dokumentu. Dokument utworzony z listą pages
+    przechowuje wszystkie strony. Podgląd renderowany jest bezpośrednio w rozmiarze miniatury.
+    content_digests to odciski treści stron (utils.page_fingerprint) używane do pomijania
+    porównania stron identycznych; page_signatures to sygnatury stron do ich dopasowania,
+    obliczane tylko dla stron, których nie dopasowano po odciskach.
+    """
     file_path: str
-    page_image: Optional[Image.Image] = None
-    preview_image: Optional[Image.Image] = None
+    pages: List[np.ndarray] = field(default_factory=list)
+    preview_image: Optional[np.ndarray] = None
+    content_digests: List[str] = field(default_factory=list)
+    page_sizes: List[Tuple[int, int]] = field(default_factory=list)
+    page_loader: Optional[Callable[[int], np.ndarray]] = field(default=None, repr=False, compare=False)
+    page_cache: PageCache = field(default_factory=PageCache, repr=False, compare=False)
+    page_signatures: Dict[int, "PageSignature"] = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def page_count(self) -> int:
+        """Zwraca liczbę stron dokumentu."""
+        return len(self.page_sizes) if self.page_loader is not None else len(self.pages)
+
+    def get_page(self, page_index: int) -> Optional[np.ndarray]:
+        """Zwraca tablicę strony o podanym indeksie (renderując ją w razie potrzeby) lub None, jeśli strona nie istnieje."""
+        if not 0 <= page_index < self.page_count:
+            return None
+        if self.page_loader is None:
+            return self.pages[page_index]
+        page = self.page_cache.get(page_index)
+        if page is None:
+            page = self.page_loader(page_index)
+            self.page_cache.put(page_index, page)
+        return page
+
+    def page_size(self, page_index: int) -> Optional[Tuple[int, int]]:
+        """Zwraca rozmiar strony w pikselach (szerokość, wysokość) bez jej renderowania."""
+        if not 0 <= page_index < self.page_count:
+            return None
+        if self.page_loader is not None:
+            return self.page_sizes[page_index]
+        height, width = self.pages[page_index].shape[:2]
+        return width, height
+
+    def get_page_image(self, page_index: int) -> Optional[Image.Image]:
+        """Zwraca stronę jako obraz PIL (np. do zapisu lub podglądu)."""
+        page = self.get_page(page_index)
+        return Image.fromarray(page) if page is not None else None
 
     def is_loaded(self) -> bool:
         """Sprawdza czy dokument został poprawnie załadowany."""
-        return self.page_image is not None
+        return self.page_count > 0
 
     def clear(self):
         """Czyści załadowane obrazy."""
-        self.page_image = None
+        self.pages = []
         self.preview_image = None
+        self.content_digests = []
+        self.page_sizes = []
+        self.page_loader = None
+        self.page_cache.clear()
+        self.page_signatures = {}
+
+
+@dataclass
+class DifferenceRegion:
+    """Obszar różnicy na stronie (w pikselach obrazu wynikowego).
+
+    pixels to liczba pikseli różniących się powyżej progu czułości (0, gdy nieznana,
+    np. w porównaniu strukturalnym).
+    """
+    x: int
+    y: int
+    width: int
+    height: int
+    kind: str = REGION_CHANGED
+    label: str = ""
+    pixels: int = 0
+
+    @property
+    def rect(self) -> Tuple[int, int, int, int]:
+        return self.x, self.y, self.width, self.height
+
+    @property
+    def area(self) -> int:
+        """Pole prostokąta otaczającego."""
+        return self.width * self.height
+
+    def contains(self, x: float, y: float, margin: float = 0) -> bool:
+        """Sprawdza czy punkt leży w obszarze (powiększonym o margines)."""
+        return (self.x - margin <= x <= self.x + self.width + margin
+                and self.y - margin <= y <= self.y + self.height + margin)
 
 
 @dataclass
 class ComparisonResult:
-    """Przechowuje wyniki porównania dwóch dokumentów PDF."""
-    diff_image: Optional[Image.Image] = None
-    original_image: Optional[Image.Image] = None
+    """Przechowuje wyniki porównania jednej strony dwóch dokumentów PDF.
+
+    Obrazy są tablicami uint8: original_image (strona bazowa) i difference_map (H x W, niezależna
+    od czułości). Dla wyników porównania leniwych dokumentów original_image jest puste, a stronę
+    bazową dostarcza base_page() z pamięci podręcznej dokumentu bazowego. Po dopasowaniu stron
+    page_index to strona bazowa, a compare_page_index - odpowiadająca jej strona porównywana;
+    strona wstawiona (alignment PAGE_INSERTED) ma page_index w dokumencie porównywanym, a strona
+    wstawiona lub usunięta ma jeden obszar obejmujący całą stronę. Różnice to lista
+    obszarów - widok rysuje je jako osobną warstwę nad stroną, a obraz z naniesionymi obrysami
+    powstaje tylko na żądanie (render_diff_image, np. do eksportu). Duże tablice wyników są zwykle
+    widokami tylko do odczytu na plik mapowany w pamięć (utils.result_store) - nie wolno ich modyfikować.
+    """
+    original_image: Optional[np.ndarray] = None
+    difference_map: Optional[np.ndarray] = None
     base_document: Optional[PDFDocument] = None
     compare_document: Optional[PDFDocument] = None
     sensitivity: int = 0
     differences_count: int = 0
+    page_index: int = 0
+    regions: List[DifferenceRegion] = field(default_factory=list)
+    identical: bool = False  # Strony identyczne wg odcisków - porównanie pikseli zostało pominięte
+    compare_page_index: Optional[int] = None  # Strona dokumentu porównywanego (None - ta sama co page_index)
+    alignment: str = PAGE_MATCHED
+    _region_index: Optional["RegionIndex"] = field(default=None, repr=False, compare=False)
+
+    def region_index(self) -> "RegionIndex":
+        """Indeks przestrzenny obszarów (budowany przy pierwszym użyciu i po zmianie listy obszarów)."""
+        from models.region_index import RegionIndex
+
+        if self._region_index is None or self._region_index.regions is not self.regions:
+            self._region_index = RegionIndex(self.regions)
+        return self._region_index
+
+    @property
+    def page_document(self) -> Optional[PDFDocument]:
+        """Dokument, z którego pochodzi wyświetlana strona (porównywany dla strony wstawionej)."""
+        return self.compare_document if self.alignment == PAGE_INSERTED else self.base_document
 
     def is_valid(self) -> bool:
         """Sprawdza czy porównanie zostało wykonane poprawnie."""
-        return all([self.diff_image, self.original_image])
+        return self.original_image is not None or (self.page_document is not None and self.page_document.is_loaded())
+
+    def base_page(self) -> Optional[np.ndarray]:
+        """Zwraca wyświetlaną stronę: original_image lub stronę leniwego dokumentu (page_document)."""
+        if self.original_image is not None or self.page_document is None:
+            return self.original_image
+        return self.page_document.get_page(self.page_index)
+
+    def page_label(self) -> str:
+        """Opis strony (numeracja od 1): "3", "3 -> 4" dla pary przesuniętych stron, "4 inserted", "3 deleted"."""
+        if self.alignment != PAGE_MATCHED:
+            return f"{self.page_index + 1} {self.alignment}"
+        if self.compare_page_index is not None and self.compare_page_index != self.page_index:
+            return f"{self.page_index + 1} -> {self.compare_page_index + 1}"
+        return str(self.page_index + 1)
+
+    def render_diff_image(self) -> Optional[np.ndarray]:
+        """Rysuje obrysy obszarów na kopii strony bazowej (kolor zależny od rodzaju zmiany)."""
+        base_page = self.base_page()
+        if base_page is None:
+            return None
+        return diff_pipeline.draw_regions(
+            base_page,
+            [region.rect for region in self.regions],
+            colors=[REGION_COLORS.get(region.kind, DIFFERENCE_COLOR) for region in self.regions]
+        )
+
+    def get_diff_image(self) -> Optional[Image.Image]:
+        """Zwraca obraz z zaznaczonymi różnicami jako obraz PIL (np. do eksportu)."""
+        diff_image = self.render_diff_image()
+        return Image.fromarray(diff_image) if diff_image is not None else None
 
     def clear(self):
         """Czyści wyniki porównania."""
-        self.diff_image = None
         self.original_image = None
+        self.difference_map = None
         self.differences_count = 0
+        self.regions = []
+        self._region_index = None
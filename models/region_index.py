@@ -0,0 +1,96 @@
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+from models.pdf_document import DifferenceRegion
+
+MAX_GRID_SIZE = 64  # Najwięcej komórek siatki w każdej osi
+LARGE_REGION_CELLS = 16  # Obszary zajmujące więcej komórek są sprawdzane zawsze, poza siatką
+
+
+class RegionIndex:
+    """Indeks przestrzenny obszarów różnic strony.
+
+    Obszary uporządkowane są w kolejności czytania (góra-dół, lewo-prawo), co wyznacza nawigację
+    następny/poprzedni. Wyszukiwanie punktu (hit-test) i prostokąta korzysta z jednorodnej siatki
+    (około sqrt(n) x sqrt(n) komórek na obszarze zajmowanym przez różnice): obszar zapisany jest
+    w każdej komórce, którą przecina w obu osiach, więc zapytanie sprawdza tylko obszary z komórek
+    pod punktem lub prostokątem. Nieliczne obszary zajmujące wiele komórek (np. cała strona wstawiona
+    lub usunięta) trzymane są osobno - nie wydłużają list komórek, a sprawdzane są przy każdym zapytaniu.
+    """
+
+    def __init__(self, regions: Sequence[DifferenceRegion]):
+        self.regions = regions
+        self._order = sorted(range(len(regions)), key=lambda i: (regions[i].y, regions[i].x))
+        self._position = {index: position for position, index in enumerate(self._order)}
+        size = self._size = min(MAX_GRID_SIZE, max(1, math.isqrt(len(regions))))
+        self._cell_width = max(1.0, max((region.x + region.width for region in regions), default=0) / size)
+        self._cell_height = max(1.0, max((region.y + region.height for region in regions), default=0) / size)
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._large: List[int] = []
+        for index, region in enumerate(regions):
+            columns, rows = self._cell_range(region.x, region.y, region.x + region.width, region.y + region.height)
+            if len(columns) * len(rows) > LARGE_REGION_CELLS:
+                self._large.append(index)
+                continue
+            for column in columns:
+                for row in rows:
+                    self._cells[(column, row)].append(index)
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    def at(self, x: float, y: float, margin: float = 0) -> Optional[int]:
+        """Indeks najmniejszego obszaru zawierającego punkt (z marginesem) lub None."""
+        best = None
+        for index in self._candidates(x - margin, y - margin, x + margin, y + margin):
+            region = self.regions[index]
+            if region.contains(x, y, margin) and (best is None or region.area < self.regions[best].area):
+                best = index
+        return best
+
+    def in_rect(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        """Indeksy obszarów przecinających prostokąt [x0, x1] x [y0, y1], w kolejności czytania."""
+        return [index for index in self._candidates(x0, y0, x1, y1)
+                if self.regions[index].x <= x1 and self.regions[index].x + self.regions[index].width >= x0
+                and self.regions[index].y <= y1 and self.regions[index].y + self.regions[index].height >= y0]
+
+    def position(self, index: int) -> int:
+        """Pozycja obszaru w kolejności czytania (od 0)."""
+        return self._position[index]
+
+    def first(self) -> Optional[int]:
+        return self._order[0] if self._order else None
+
+    def last(self) -> Optional[int]:
+        return self._order[-1] if self._order else None
+
+    def next(self, index: Optional[int]) -> Optional[int]:
+        """Następny obszar w kolejności czytania (pierwszy, jeśli index is None) lub None na końcu."""
+        if index is None or index not in self._position:
+            return self.first()
+        position = self._position[index] + 1
+        return self._order[position] if position < len(self._order) else None
+
+    def previous(self, index: Optional[int]) -> Optional[int]:
+        """Poprzedni obszar w kolejności czytania (ostatni, jeśli index is None) lub None na początku."""
+        if index is None or index not in self._position:
+            return self.last()
+        position = self._position[index] - 1
+        return self._order[position] if position >= 0 else None
+
+    def _cell_range(self, x0: float, y0: float, x1: float, y1: float) -> Tuple[range, range]:
+        # Krawędzie obszarów są włączne (contains), więc komórki liczone są od floor do floor włącznie;
+        # prawa i dolna krawędź najdalszego obszaru trafia do komórki o indeksie size.
+        first_column, last_column = math.floor(x0 / self._cell_width), math.floor(x1 / self._cell_width)
+        first_row, last_row = math.floor(y0 / self._cell_height), math.floor(y1 / self._cell_height)
+        return (range(max(0, first_column), min(self._size, last_column) + 1),
+                range(max(0, first_row), min(self._size, last_row) + 1))
+
+    def _candidates(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        # Obszary z komórek przecinanych przez [x0, x1] x [y0, y1] i duże obszary, w kolejności czytania.
+        found = set(self._large)
+        columns, rows = self._cell_range(x0, y0, x1, y1)
+        for column in columns:
+            for row in rows:
+                found.update(self._cells.get((column, row), ()))
+        return sorted(found, key=self._position.__getitem__)
@@ -0,0 +1,164 @@
+import logging
+from typing import Dict, List, Tuple
+import cv2
+import fitz
+import numpy as np
+from models.pdf_document import ComparisonResult
+from services.pdf_service import PDFService
+from utils import diff_pipeline
+from config.settings import (DEFAULT_DPI, BAND_HEIGHT, MAX_WORKERS, COMPARISON_TIMEOUT,
+                             RENDER_GRAYSCALE)
+
+Rect = Tuple[int, int, int, int]
+
+
+class BandService:
+    """Porównanie stron wielkoformatowych w poziomych pasach o stałej wysokości.
+
+    Obie strony renderowane są pasami (fitz clip), a każdy pas jest porównywany niezależnie
+    w puli procesów. Szczytowe zużycie pamięci zależy od szerokości strony, wysokości pasa
+    i liczby procesów, a nie od wysokości strony. Obszary przecinające granicę pasów są
+    sklejane na podstawie etykiet pierwszego i ostatniego wiersza sąsiednich pasów, a bliskie
+    obszary łączone (REGION_MERGE_GAP) jak w porównaniu całych stron.
+    Strony porównywane są we wspólnym układzie współrzędnych (lewy górny róg).
+    """
+
+    @staticmethod
+    def compare_page(base_path: str,
+                     compare_path: str,
+                     page_index: int,
+                     sensitivity: int,
+                     dpi: int,
+                     band_height: int = BAND_HEIGHT,
+                     workers: int = MAX_WORKERS,
+                     grayscale: bool = RENDER_GRAYSCALE) -> List[Rect]:
+        """Zwraca prostokąty (x, y, w, h) różnic strony w pikselach przy zadanym DPI."""
+        with fitz.open(base_path) as pdf:
+            page_rect = pdf.load_page(page_index).rect
+        zoom = dpi / 72
+        page_width, page_height = PDFService.pixel_size(page_rect, zoom)
+
+        bands = [(y0, min(y0 + band_height, page_height)) for y0 in range(0, page_height, band_height)]
+        band_results = PDFService._run_parallel(
+            BandService._diff_band,
+            [(base_path, compare_path, page_index, zoom, page_width, y0, y1, sensitivity, grayscale)
+             for y0, y1 in bands],
+            workers,
+            COMPARISON_TIMEOUT
+        )
+        regions = diff_pipeline.merge_regions(BandService._stitch(band_results))
+        logging.debug(f"Page {page_index + 1}: {len(bands)} bands, {len(regions)} regions")
+        return regions
+
+    @staticmethod
+    def compare_documents(base_path: str,
+                          compare_path: str,
+                          sensitivity: int,
+                          dpi: int,
+                          band_height: int = BAND_HEIGHT,
+                          workers: int = MAX_WORKERS,
+                          grayscale: bool = RENDER_GRAYSCALE,
+                          display_dpi: int = DEFAULT_DPI) -> List[ComparisonResult]:
+        """Porównuje dokumenty pasami przy wysokim DPI.
+
+        Obraz wynikowy każdej strony renderowany jest przy display_dpi (np. do podglądu lub eksportu),
+        a znalezione obszary są na niego przeskalowywane.
+        """
+        with fitz.open(base_path) as base_pdf, fitz.open(compare_path) as compare_pdf:
+            base_count, compare_count = base_pdf.page_count, compare_pdf.page_count
+        if base_count != compare_count:
+            logging.warning(f"Page count differs ({base_count} vs {compare_count}), "
+                            f"pages past {min(base_count, compare_count)} are reported as inserted or deleted")
+
+        results = []
+        for page_index in range(min(base_count, compare_count)):
+            regions = BandService.compare_page(base_path, compare_path, page_index, sensitivity,
+                                               dpi, band_height, workers, grayscale)
+            results.append(PDFService.region_result(base_path, compare_path, page_index, regions,
+                                                    sensitivity, dpi, display_dpi, grayscale))
+        results.extend(PDFService.extra_page_results(base_path, compare_path, base_count, compare_count,
+                                                     sensitivity, display_dpi, grayscale))
+        return results
+
+    @staticmethod
+    def _diff_band(base_path: str,
+                   compare_path: str,
+                   page_index: int,
+                   zoom: float,
+                   width: int,
+                   y0: int,
+                   y1: int,
+                   sensitivity: int,
+                   grayscale: bool) -> dict:
+        """Porównuje jeden pas (wywoływane w procesie roboczym).
+
+        Zwraca statystyki składowych spójnych (we współrzędnych strony) oraz etykiety
+        pierwszego i ostatniego wiersza, potrzebne do sklejenia obszarów z sąsiednimi pasami.
+        """
+        with fitz.open(base_path) as base_pdf, fitz.open(compare_path) as compare_pdf:
+            base_page = base_pdf.load_page(page_index)
+            base_band = PDFService.render_region(base_page, zoom, 0, y0, width, y1, grayscale)
+            compare_page = compare_pdf.load_page(page_index)
+            # Strona porównywana renderowana jest na siatce pikseli strony bazowej (także przy innym rozmiarze).
+            zoom_x, zoom_y = PDFService.grid_zoom(compare_page.rect, base_page.rect.width * zoom,
+                                                  base_page.rect.height * zoom, zoom)
+            compare_band = PDFService.render_region(compare_page, zoom_x, 0, y0, width, y1, grayscale,
+                                                    zoom_y=zoom_y)
+
+        mask = diff_pipeline.threshold_mask(diff_pipeline.difference_map(base_band, compare_band), sensitivity)
+        _, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        boxes = stats[:, :4].astype(np.int64)
+        boxes[:, 1] += y0
+        return {
+            "y0": y0,
+            "boxes": boxes,  # wiersz 0 to tło
+            "top": labels[0].copy(),
+            "bottom": labels[-1].copy(),
+        }
+
+    @staticmethod
+    def _stitch(band_results: List[dict]) -> List[Rect]:
+        """Łączy składowe przecinające granice pasów (8-sąsiedztwo) i zwraca prostokąty obszarów."""
+        parent: Dict[Tuple[int, int], Tuple[int, int]] = {}
+
+        def find(node):
+            root = node
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while node != root:
+                parent[node], node = root, parent.get(node, node)
+            return root
+
+        for band_index in range(len(band_results) - 1):
+            bottom = band_results[band_index]["bottom"]
+            top = band_results[band_index + 1]["top"]
+            for shift in (-1, 0, 1):
+                if shift < 0:
+                    upper, lower = bottom[-shift:], top[:shift]
+                elif shift > 0:
+                    upper, lower = bottom[:-shift], top[shift:]
+                else:
+                    upper, lower = bottom, top
+                touching = (upper > 0) & (lower > 0)
+                if not touching.any():
+                    continue
+                pairs = np.unique(np.stack([upper[touching], lower[touching]], axis=1), axis=0)
+                for upper_label, lower_label in pairs:
+                    a = find((band_index, int(upper_label)))
+                    b = find((band_index + 1, int(lower_label)))
+                    if a != b:
+                        parent[b] = a
+
+        merged: Dict[Tuple[int, int], List[int]] = {}
+        for band_index, band in enumerate(band_results):
+            for label in range(1, len(band["boxes"])):
+                x, y, w, h = (int(v) for v in band["boxes"][label])
+                root = find((band_index, label))
+                box = merged.get(root)
+                if box is None:
+                    merged[root] = [x, y, x + w, y + h]
+                else:
+                    box[0], box[1] = min(box[0], x), min(box[1], y)
+                    box[2], box[3] = max(box[2], x + w), max(box[3], y + h)
+
+        return sorted((x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in merged.values())
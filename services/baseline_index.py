@@ -0,0 +1,255 @@
+import logging
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from models.baseline_match import BaselineMatch
+from services.pdf_service import PDFService
+from services.worker_pool import get_worker_pool
+from utils import page_fingerprint, profiling
+from utils.page_fingerprint import PageSignature
+from config.settings import (MAX_WORKERS, PAGE_MATCH_THRESHOLD, BASELINE_RESULTS, BASELINE_MIN_SHARED_SHINGLES,
+                             BASELINE_CANDIDATE_LIMIT, BASELINE_INDEX_TIMEOUT)
+
+SCHEMA_VERSION = 1
+BANDS = 4  # perceptual hash dzielony na 4 pasma po 16 bitów
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    page_count INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    page_index INTEGER NOT NULL,
+    content_digest TEXT NOT NULL,
+    phash INTEGER NOT NULL,
+    band0 INTEGER NOT NULL,
+    band1 INTEGER NOT NULL,
+    band2 INTEGER NOT NULL,
+    band3 INTEGER NOT NULL,
+    shingles BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shingles (
+    hash INTEGER NOT NULL,
+    page_id INTEGER NOT NULL REFERENCES pages(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS pages_document ON pages(document_id);
+CREATE INDEX IF NOT EXISTS pages_digest ON pages(content_digest);
+CREATE INDEX IF NOT EXISTS pages_band0 ON pages(band0);
+CREATE INDEX IF NOT EXISTS pages_band1 ON pages(band1);
+CREATE INDEX IF NOT EXISTS pages_band2 ON pages(band2);
+CREATE INDEX IF NOT EXISTS pages_band3 ON pages(band3);
+CREATE INDEX IF NOT EXISTS shingles_hash ON shingles(hash);
+CREATE INDEX IF NOT EXISTS shingles_page ON shingles(page_id);
+"""
+
+
+class BaselineIndex:
+    """Lokalny indeks archiwum dokumentów PDF (SQLite) do wyszukiwania wzorca, z którego powstał nowy plik.
+
+    Dla każdej strony zapisywany jest odcisk treści, 64-bitowy perceptual hash i próbka szingli
+    tekstu (utils.page_fingerprint). Zapytanie wybiera strony-kandydatów przez indeksy: równy odcisk
+    treści, równe jedno z czterech 16-bitowych pasm hasha (każdy hash w odległości Hamminga do 3 ma
+    co najmniej jedno pasmo wspólne) lub co najmniej BASELINE_MIN_SHARED_SHINGLES wspólnych szingli
+    (tabela odwrotna). Dopiero kandydaci są oceniani podobieństwem sygnatur, więc czas zapytania
+    zależy od liczby podobnych stron, a nie od wielkości archiwum.
+
+    Dodawanie jest przyrostowe: plik o niezmienionym rozmiarze i czasie modyfikacji jest pomijany,
+    a każdy zaindeksowany dokument zapisywany jest w osobnej transakcji (przerwane indeksowanie
+    można wznowić).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise RuntimeError(f"Unsupported baseline index version {version} in {path}")
+        self._connection.executescript(_SCHEMA)
+        self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @property
+    def document_count(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    @staticmethod
+    def list_pdfs(paths: Iterable[str]) -> List[str]:
+        """Rozwija katalogi (rekurencyjnie) do listy bezwzględnych ścieżek plików PDF."""
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for dir_path, _, file_names in os.walk(path):
+                    files.extend(os.path.abspath(os.path.join(dir_path, name))
+                                 for name in file_names if name.lower().endswith(".pdf"))
+            else:
+                files.append(os.path.abspath(path))
+        return sorted(set(files))
+
+    def add(self,
+            paths: Iterable[str],
+            workers: int = MAX_WORKERS,
+            progress: Optional[Callable[[str, Optional[str]], None]] = None) -> Tuple[int, int, int]:
+        """Indeksuje nowe i zmienione pliki (katalogi przeszukiwane są rekurencyjnie).
+
+        Sygnatury liczone są w procesach roboczych, a zapis odbywa się w bieżącym wątku.
+        progress(ścieżka, błąd) wywoływane jest po każdym pliku. Zwraca liczby plików:
+        zaindeksowanych, niezmienionych i zakończonych błędem.
+        """
+        pending = []
+        unchanged = 0
+        for path in self.list_pdfs(paths):
+            stat = os.stat(path)
+            row = self._connection.execute("SELECT size, mtime FROM documents WHERE path = ?", (path,)).fetchone()
+            if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime:
+                unchanged += 1
+            else:
+                pending.append((path, stat.st_size, stat.st_mtime))
+        logging.info(f"Baseline index: {len(pending)} file(s) to index, {unchanged} unchanged")
+
+        failed = 0
+
+        def store(index: int, outcome):
+            nonlocal failed
+            path, size, mtime = pending[index]
+            try:
+                digests, signatures = outcome() if callable(outcome) else outcome.result()
+                self._store(path, size, mtime, digests, signatures)
+                error = None
+            except Exception as e:
+                logging.error(f"Failed to index {path}: {e}")
+                failed += 1
+                error = str(e) or type(e).__name__
+            if progress:
+                progress(path, error)
+
+        if workers <= 1:
+            for index, (path, _, _) in enumerate(pending):
+                store(index, lambda path=path: PDFService.document_signatures(path))
+        elif pending:
+            get_worker_pool().map(PDFService.document_signatures, [(path,) for path, _, _ in pending],
+                                  limit=workers, timeout=BASELINE_INDEX_TIMEOUT, fail_fast=False, on_done=store)
+        return len(pending) - failed, unchanged, failed
+
+    def _store(self, path: str, size: int, mtime: float, digests: List[str], signatures: List[PageSignature]):
+        with self._connection:
+            self._connection.execute("DELETE FROM documents WHERE path = ?", (path,))
+            document_id = self._connection.execute(
+                "INSERT INTO documents (path, size, mtime, page_count, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                (path, size, mtime, len(signatures), time.time())).lastrowid
+            for page_index, (digest, signature) in enumerate(zip(digests, signatures)):
+                page_id = self._connection.execute(
+                    "INSERT INTO pages (document_id, page_index, content_digest, phash, band0, band1, band2, band3, "
+                    "shingles) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (document_id, page_index, digest, _to_signed(signature.phash), *_bands(signature.phash),
+                     np.array(signature.shingles, dtype=np.uint32).tobytes())).lastrowid
+                self._connection.executemany("INSERT INTO shingles (hash, page_id) VALUES (?, ?)",
+                                             [(value, page_id) for value in signature.shingles])
+
+    def remove_missing(self) -> int:
+        """Usuwa z indeksu dokumenty, których plików już nie ma; zwraca ich liczbę."""
+        missing = [(path,) for (path,) in self._connection.execute("SELECT path FROM documents")
+                   if not os.path.exists(path)]
+        with self._connection:
+            self._connection.executemany("DELETE FROM documents WHERE path = ?", missing)
+        return len(missing)
+
+    def find(self, file_path: str, limit: int = BASELINE_RESULTS) -> List[BaselineMatch]:
+        """Zwraca dokumenty archiwum najbardziej podobne do pliku (sam plik, jeśli jest w indeksie, jest pomijany)."""
+        digests, signatures = PDFService.document_signatures(file_path)
+        return self.find_signatures(digests, signatures, limit, exclude_path=os.path.abspath(file_path))
+
+    def find_signatures(self,
+                        digests: List[str],
+                        signatures: List[PageSignature],
+                        limit: int = BASELINE_RESULTS,
+                        exclude_path: Optional[str] = None) -> List[BaselineMatch]:
+        """Wyszukiwanie dla gotowych odcisków i sygnatur stron (bez otwierania pliku)."""
+        best: Dict[int, Dict[int, float]] = defaultdict(dict)
+        with profiling.span("baseline_search", pages=len(signatures)):
+            for query_index, (digest, signature) in enumerate(zip(digests, signatures)):
+                for document_id, page_digest, phash, shingles in self._candidates(digest, signature):
+                    if page_digest == digest:
+                        similarity = 1.0
+                    else:
+                        similarity = page_fingerprint.signature_similarity(
+                            signature, PageSignature(phash & (2 ** 64 - 1),
+                                                     tuple(np.frombuffer(shingles, dtype=np.uint32).tolist())))
+                    if similarity >= PAGE_MATCH_THRESHOLD and similarity > best[document_id].get(query_index, 0):
+                        best[document_id][query_index] = similarity
+
+            documents = {}
+            if best:
+                placeholders = ",".join("?" * len(best))
+                documents = {row[0]: row[1:] for row in self._connection.execute(
+                    f"SELECT id, path, page_count FROM documents WHERE id IN ({placeholders})", list(best))}
+
+        matches = []
+        for document_id, pages in best.items():
+            path, page_count = documents[document_id]
+            if path == exclude_path:
+                continue
+            matches.append(BaselineMatch(path=path,
+                                         score=sum(pages.values()) / max(len(signatures), page_count, 1),
+                                         matched_pages=len(pages),
+                                         page_count=page_count))
+        matches.sort(key=lambda match: (-match.score, abs(match.page_count - len(signatures)), match.path))
+        return matches[:limit]
+
+    def _candidates(self, digest: str, signature: PageSignature) -> list:
+        """Strony podobne wg indeksów: (document_id, content_digest, phash, shingles)."""
+        # Strony o równym odcisku treści nie podlegają limitowi - wiele pustych lub szablonowych
+        # stron o wspólnym paśmie hasha nie może wyprzeć dokładnego dopasowania.
+        rows = self._connection.execute(
+            "SELECT id, document_id, content_digest, phash, shingles FROM pages WHERE content_digest = ?",
+            (digest,)).fetchall()
+        seen = {row[0] for row in rows}
+        rows += [row for row in self._connection.execute(
+            "SELECT id, document_id, content_digest, phash, shingles FROM pages "
+            "WHERE band0 = ? OR band1 = ? OR band2 = ? OR band3 = ? LIMIT ?",
+            (*_bands(signature.phash), BASELINE_CANDIDATE_LIMIT)) if row[0] not in seen]
+        if signature.shingles:
+            seen = {row[0] for row in rows}
+            placeholders = ",".join("?" * len(signature.shingles))
+            shared = [page_id for (page_id,) in self._connection.execute(
+                f"SELECT page_id FROM shingles WHERE hash IN ({placeholders}) GROUP BY page_id "
+                f"HAVING COUNT(*) >= ? LIMIT ?",
+                (*signature.shingles, min(BASELINE_MIN_SHARED_SHINGLES, len(signature.shingles)),
+                 BASELINE_CANDIDATE_LIMIT))
+                      if page_id not in seen]
+            if shared:
+                placeholders = ",".join("?" * len(shared))
+                rows += self._connection.execute(
+                    f"SELECT id, document_id, content_digest, phash, shingles FROM pages WHERE id IN ({placeholders})",
+                    shared).fetchall()
+        return [row[1:] for row in rows]
+
+
+def _to_signed(value: int) -> int:
+    """SQLite przechowuje liczby całkowite ze znakiem - 64-bitowy hash zapisywany jest w kodzie U2."""
+    return value - 2 ** 64 if value >= 2 ** 63 else value
+
+
+def _bands(phash: int) -> Tuple[int, ...]:
+    return tuple((phash >> (16 * band)) & 0xFFFF for band in range(BANDS))
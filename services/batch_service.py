@@ -0,0 +1,169 @@
+import csv
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from models.batch_result import (BatchItemResult, STATUS_IDENTICAL, STATUS_DIFFERENT,
+                                 STATUS_MISSING, STATUS_ERROR)
+from services.pdf_service import PDFService
+from services.raster_cache import RasterCache
+from services.worker_pool import WorkerPool
+from config.settings import (DEFAULT_DPI, DEFAULT_SENSITIVITY, MAX_WORKERS, RENDER_GRAYSCALE, BATCH_FILE_TIMEOUT,
+                             BATCH_JOURNAL_FILE, BATCH_SUMMARY_JSON, BATCH_SUMMARY_CSV)
+
+
+class BatchService:
+    """Wsadowe porównywanie par plików PDF z dwóch drzew katalogów."""
+
+    @staticmethod
+    def find_pairs(base_dir: str, compare_dir: str) -> Tuple[List[str], List[str]]:
+        """Dopasowuje pliki PDF po ścieżce względnej.
+
+        Zwraca listę ścieżek obecnych w obu katalogach oraz listę ścieżek obecnych tylko w jednym z nich.
+        """
+        base_files = BatchService._list_pdfs(base_dir)
+        compare_files = BatchService._list_pdfs(compare_dir)
+        return sorted(base_files & compare_files), sorted(base_files ^ compare_files)
+
+    @staticmethod
+    def _list_pdfs(root: str) -> set:
+        found = set()
+        for dir_path, _, file_names in os.walk(root):
+            for file_name in file_names:
+                if file_name.lower().endswith(".pdf"):
+                    relative = os.path.relpath(os.path.join(dir_path, file_name), root)
+                    found.add(relative.replace(os.sep, "/"))
+        return found
+
+    @staticmethod
+    def run(base_dir: str,
+            compare_dir: str,
+            report_dir: str,
+            sensitivity: int = DEFAULT_SENSITIVITY,
+            dpi: int = DEFAULT_DPI,
+            workers: int = MAX_WORKERS,
+            use_cache: bool = True,
+            grayscale: bool = RENDER_GRAYSCALE,
+            progress: Optional[Callable[[BatchItemResult], None]] = None) -> List[BatchItemResult]:
+        """Porównuje wszystkie pary plików w ograniczonej puli procesów i zapisuje raport.
+
+        Każdy zakończony wynik jest natychmiast dopisywany do dziennika w report_dir, dlatego
+        przerwane zadanie można wznowić - pary porównane w dzienniku nie są porównywane ponownie,
+        a pary zakończone błędem (także przekroczeniem czasu) są ponawiane.
+        Para, której porównanie przekroczy BATCH_FILE_TIMEOUT lub limit pamięci procesu (albo
+        zakończy proces błędem), jest raportowana jako błąd, a proces roboczy zastępowany nowym.
+        """
+        os.makedirs(report_dir, exist_ok=True)
+        journal_path = os.path.join(report_dir, BATCH_JOURNAL_FILE)
+        done = BatchService._read_journal(journal_path)
+
+        pairs, unmatched = BatchService.find_pairs(base_dir, compare_dir)
+        pending = [path for path in pairs if path not in done or done[path].status == STATUS_ERROR]
+        logging.info(f"Batch: {len(pairs)} pairs, {len(pairs) - len(pending)} already done, {len(pending)} pending")
+
+        with open(journal_path, "a", encoding="utf-8") as journal:
+            def record(item: BatchItemResult):
+                done[item.relative_path] = item
+                journal.write(json.dumps(item.to_dict()) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+                if progress:
+                    progress(item)
+
+            for relative_path in unmatched:
+                if relative_path not in done:
+                    record(BatchItemResult(relative_path, STATUS_MISSING,
+                                           error="file exists in only one directory"))
+
+            def record_future(index: int, future):
+                try:
+                    item = future.result()
+                except Exception as e:
+                    item = BatchItemResult(pending[index], STATUS_ERROR, error=str(e) or type(e).__name__)
+                record(item)
+
+            if pending:
+                pool = WorkerPool(workers)
+                try:
+                    pool.map(BatchService.compare_pair,
+                             [(os.path.join(base_dir, path), os.path.join(compare_dir, path),
+                               path, sensitivity, dpi, use_cache, grayscale) for path in pending],
+                             timeout=BATCH_FILE_TIMEOUT,
+                             fail_fast=False,
+                             on_done=record_future)
+                finally:
+                    pool.shutdown()
+
+        results = [done[path] for path in sorted(done)]
+        BatchService.write_summary(results, report_dir)
+        return results
+
+    @staticmethod
+    def compare_pair(base_path: str,
+                     compare_path: str,
+                     relative_path: str,
+                     sensitivity: int,
+                     dpi: int,
+                     use_cache: bool = True,
+                     grayscale: bool = RENDER_GRAYSCALE) -> BatchItemResult:
+        """Porównuje jedną parę plików (wywoływane w procesie roboczym).
+
+        Strony są przetwarzane sekwencyjnie - równoległość zapewnia pula procesów na poziomie par.
+        Pamięć podręczna rastrów jest współdzielona przez procesy za pośrednictwem katalogu na dysku.
+        """
+        start = time.perf_counter()
+        try:
+            raster_cache = RasterCache() if use_cache else None
+            base_doc = PDFService.load_pdf(base_path, dpi=dpi, raster_cache=raster_cache, grayscale=grayscale,
+                                           workers=1)
+            compare_doc = PDFService.load_pdf(compare_path, dpi=dpi, raster_cache=raster_cache, grayscale=grayscale,
+                                              workers=1)
+            if not base_doc or not compare_doc:
+                raise RuntimeError(f"Failed to load {base_path if not base_doc else compare_path}")
+
+            results = PDFService.compare_documents(base_doc, compare_doc, sensitivity, workers=1)
+            if not results:
+                raise RuntimeError("Comparison failed")
+        except Exception as e:
+            return BatchItemResult(relative_path, STATUS_ERROR,
+                                   seconds=round(time.perf_counter() - start, 3), error=str(e))
+
+        differing_pages = sum(1 for result in results if result.differences_count)
+        return BatchItemResult(
+            relative_path,
+            STATUS_DIFFERENT if differing_pages else STATUS_IDENTICAL,
+            pages=len(results),
+            differing_pages=differing_pages,
+            regions=sum(result.differences_count for result in results),
+            skipped_pages=sum(1 for result in results if result.identical),
+            seconds=round(time.perf_counter() - start, 3)
+        )
+
+    @staticmethod
+    def _read_journal(journal_path: str) -> Dict[str, BatchItemResult]:
+        """Wczytuje zakończone pary z dziennika; uszkodzona ostatnia linia (przerwany zapis) jest pomijana."""
+        done = {}
+        if not os.path.exists(journal_path):
+            return done
+        with open(journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    item = BatchItemResult.from_dict(json.loads(line))
+                except (ValueError, TypeError):
+                    logging.warning(f"Skipping malformed journal line in {journal_path}")
+                    continue
+                done[item.relative_path] = item
+        return done
+
+    @staticmethod
+    def write_summary(results: List[BatchItemResult], report_dir: str):
+        """Zapisuje raport zbiorczy w formatach JSON i CSV."""
+        with open(os.path.join(report_dir, BATCH_SUMMARY_JSON), "w", encoding="utf-8") as f:
+            json.dump([item.to_dict() for item in results], f, indent=2)
+
+        with open(os.path.join(report_dir, BATCH_SUMMARY_CSV), "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=BatchItemResult.field_names())
+            writer.writeheader()
+            for item in results:
+                writer.writerow(item.to_dict())
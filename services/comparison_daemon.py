@@ -0,0 +1,427 @@
+"""Długotrwała usługa porównań: kolejka zleceń z priorytetami i pamięć podręczna między zleceniami.
+
+Usługa (comparepdfd.py) unika kosztu uruchamiania interpretera, importu fitz/OpenCV i zimnych
+pamięci podręcznych przy każdym porównaniu. Między zleceniami zachowywane są: pula procesów
+roboczych, pamięć podręczna rastrów (RasterCache), otwarte dokumenty (rozmiary stron i odciski
+treści, DAEMON_DOCUMENT_CACHE) oraz wyniki porównań par plików (DAEMON_RESULT_CACHE). Dokument
+i wynik są rozpoznawane po ścieżce, rozmiarze i czasie modyfikacji pliku - zmieniony plik jest
+wczytywany ponownie.
+
+API HTTP/1.1 (JSON, połączenia keep-alive; na localhost lub gnieździe uniksowym):
+    POST   /jobs               zlecenie {"base", "compare", "sensitivity", "dpi", "grayscale", "priority"}
+                               lub lista zleceń; odpowiedź 202 ze stanem zleceń
+    GET    /jobs               stan wszystkich zleceń (bez wyników stron)
+    GET    /jobs/<id>          stan zlecenia, po zakończeniu z wynikami stron
+    GET    /jobs/<id>/events   strumień stanów (JSON lines, chunked) do zakończenia zlecenia
+    DELETE /jobs/<id>          anulowanie zlecenia
+    GET    /status             liczniki usługi i pamięci podręcznych
+Mniejsza wartość priority oznacza wcześniejsze wykonanie (domyślnie 0).
+"""
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from models.comparison_job import ComparisonJob, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED
+from models.pdf_document import PDFDocument
+from services.operation import Operation, OperationCancelled
+from services.pdf_service import PDFService
+from services.raster_cache import RasterCache
+from utils.result_store import ResultStore
+from config.settings import (DEFAULT_DPI, DEFAULT_SENSITIVITY, MAX_WORKERS, RENDER_GRAYSCALE, DAEMON_CONCURRENT_JOBS,
+                             DAEMON_DOCUMENT_CACHE, DAEMON_RESULT_CACHE, DAEMON_MAX_JOBS, DAEMON_MAX_REQUEST_BYTES)
+
+# Klucz pliku: ścieżka bezwzględna, rozmiar, czas modyfikacji (ns), DPI i skala szarości
+FileKey = Tuple[str, int, int, int, bool]
+
+HTTP_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    """Błąd żądania zwracany klientowi z podanym kodem HTTP."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ComparisonDaemon:
+    """Kolejka zleceń porównania wykonywanych w wątkach, z pamięcią podręczną dokumentów i wyników.
+
+    Metody publiczne wywoływane są z pętli asyncio; samo porównanie (PDFService) działa w puli
+    wątków, a strony dzieli między procesy robocze współdzielona pula procesów.
+    """
+
+    def __init__(self,
+                 workers: int = MAX_WORKERS,
+                 concurrency: int = DAEMON_CONCURRENT_JOBS,
+                 use_cache: bool = True):
+        self.workers = workers
+        self.concurrency = max(1, concurrency)
+        self.raster_cache = RasterCache() if use_cache else None
+        self.result_hits = 0
+        self._documents: "OrderedDict[FileKey, PDFDocument]" = OrderedDict()
+        self._results: "OrderedDict[Tuple[FileKey, FileKey, int], List[dict]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._jobs: "OrderedDict[str, ComparisonJob]" = OrderedDict()
+        self._operations: Dict[str, Operation] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._sequence = itertools.count()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._runners: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.concurrency, thread_name_prefix="ComparisonJob")
+
+    async def start(self):
+        """Uruchamia wykonawców zleceń w bieżącej pętli asyncio."""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        self._runners = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        """Anuluje zlecenia w toku i kończy wykonawców."""
+        for operation in list(self._operations.values()):
+            operation.cancel()
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+    def submit(self, request: dict) -> ComparisonJob:
+        """Przyjmuje zlecenie do kolejki; błędne parametry zgłaszają HttpError 400."""
+        return self.submit_all([request])[0]
+
+    def submit_all(self, requests: List[dict]) -> List[ComparisonJob]:
+        """Przyjmuje listę zleceń w całości albo wcale - przy błędnym zleceniu żadne nie trafia do kolejki."""
+        jobs = [self._parse(request) for request in requests]
+        for job in jobs:
+            self._jobs[job.id] = job
+            self._queue.put_nowait((job.priority, next(self._sequence), job))
+            logging.info(f"Job {job.id} queued: {job.base} vs {job.compare}")
+        self._forget_finished_jobs()
+        return jobs
+
+    @staticmethod
+    def _parse(request: dict) -> ComparisonJob:
+        """Sprawdza parametry zlecenia i tworzy je (bez dodawania do kolejki)."""
+        if not isinstance(request, dict):
+            raise HttpError(400, "Job must be a JSON object")
+        try:
+            job = ComparisonJob(base=os.path.abspath(request["base"]),
+                                compare=os.path.abspath(request["compare"]),
+                                sensitivity=int(request.get("sensitivity", DEFAULT_SENSITIVITY)),
+                                dpi=int(request.get("dpi", DEFAULT_DPI)),
+                                grayscale=bool(request.get("grayscale", RENDER_GRAYSCALE)),
+                                priority=int(request.get("priority", 0)))
+        except KeyError as e:
+            raise HttpError(400, f"Missing job field {e}")
+        except (TypeError, ValueError) as e:
+            raise HttpError(400, f"Invalid job field: {e}")
+        for path in (job.base, job.compare):
+            if not os.path.isfile(path):
+                raise HttpError(400, f"File {path} does not exist")
+        return job
+
+    def get(self, job_id: str) -> ComparisonJob:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise HttpError(404, f"Job {job_id} not found")
+        return job
+
+    def jobs(self) -> List[ComparisonJob]:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> ComparisonJob:
+        """Anuluje zlecenie oczekujące (od razu) lub wykonywane (przy najbliższym raporcie postępu)."""
+        job = self.get(job_id)
+        if job.status == JOB_QUEUED:
+            self._finish(job, JOB_CANCELLED)
+        elif job.id in self._operations:
+            self._operations[job.id].cancel()
+        return job
+
+    async def events(self, job_id: str) -> AsyncIterator[dict]:
+        """Kolejne stany zlecenia (bieżący od razu); ostatni, z wynikami stron, po zakończeniu."""
+        job = self.get(job_id)
+        updates: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(updates)
+        try:
+            while not job.finished:
+                yield job.to_dict(pages=False)
+                await updates.get()
+                # Przy szybkim postępie wysyłany jest tylko najnowszy stan.
+                while not updates.empty():
+                    updates.get_nowait()
+            yield job.to_dict()
+        finally:
+            self._subscribers[job_id].remove(updates)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    def status(self) -> dict:
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            "pid": os.getpid(),
+            "workers": self.workers,
+            "concurrency": self.concurrency,
+            "jobs": {status: statuses.count(status)
+                     for status in (JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED)},
+            "documents_cached": len(self._documents),
+            "results_cached": len(self._results),
+            "result_hits": self.result_hits,
+            "raster_hits": self.raster_cache.hits if self.raster_cache else 0,
+            "raster_misses": self.raster_cache.misses if self.raster_cache else 0,
+        }
+
+    async def _run(self):
+        while True:
+            _, _, job = await self._queue.get()
+            if job.status != JOB_QUEUED:
+                continue  # Anulowane w kolejce
+            operation = Operation(progress=lambda stage, done, total, job=job:
+                                  self._loop.call_soon_threadsafe(self._progress, job, stage, done, total))
+            self._operations[job.id] = operation
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            self._publish(job)
+            try:
+                job.pages, job.cached = await self._loop.run_in_executor(self._executor, self._compare, job,
+                                                                         operation)
+                self._finish(job, JOB_DONE)
+            except OperationCancelled:
+                self._finish(job, JOB_CANCELLED)
+            except Exception as e:
+                logging.error(f"Job {job.id} failed: {e}")
+                job.error = str(e) or type(e).__name__
+                self._finish(job, JOB_FAILED)
+            finally:
+                del self._operations[job.id]
+
+    def _progress(self, job: ComparisonJob, stage: str, done: int, total: int):
+        if job.status == JOB_RUNNING:
+            job.stage, job.done, job.total = stage, done, total
+            self._publish(job)
+
+    def _finish(self, job: ComparisonJob, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        logging.info(f"Job {job.id} {status}")
+        self._publish(job)
+
+    def _publish(self, job: ComparisonJob):
+        for updates in self._subscribers.get(job.id, []):
+            updates.put_nowait(job.status)
+
+    def _forget_finished_jobs(self):
+        """Usuwa najstarsze zakończone zlecenia ponad limit DAEMON_MAX_JOBS."""
+        excess = len(self._jobs) - DAEMON_MAX_JOBS
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    def _compare(self, job: ComparisonJob, operation: Operation) -> Tuple[List[dict], bool]:
+        """Wykonuje zlecenie (w wątku puli); zwraca wyniki stron i informację, czy pochodzą z pamięci podręcznej."""
+        base_key = self._file_key(job.base, job)
+        compare_key = self._file_key(job.compare, job)
+        result_key = (base_key, compare_key, job.sensitivity)
+        with self._cache_lock:
+            pages = self._results.get(result_key)
+            if pages is not None:
+                self._results.move_to_end(result_key)
+                self.result_hits += 1
+                return pages, True
+
+        # Dokumenty są współdzielone przez zlecenia - ich stron nie wolno czyścić (rozmiar ogranicza
+        # PageCache i DAEMON_DOCUMENT_CACHE). Mapy różnic zlecenia trafiają do jego własnego pliku,
+        # usuwanego razem z wynikami stron po zakończeniu zlecenia.
+        base_doc = self._document(job.base, base_key, operation)
+        compare_doc = self._document(job.compare, compare_key, operation)
+        store = ResultStore()
+        try:
+            results = PDFService.compare_documents(base_doc, compare_doc, job.sensitivity, workers=self.workers,
+                                                   operation=operation, store=store)
+            if not results:
+                raise RuntimeError("Comparison failed")
+            pages = [ComparisonJob.page_to_dict(result) for result in results]
+        finally:
+            store.close()
+
+        with self._cache_lock:
+            self._results[result_key] = pages
+            while len(self._results) > DAEMON_RESULT_CACHE:
+                self._results.popitem(last=False)
+        return pages, False
+
+    def _document(self, file_path: str, key: FileKey, operation: Operation) -> PDFDocument:
+        with self._cache_lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+                return document
+        document = PDFService.load_pdf(file_path, dpi=key[3], raster_cache=self.raster_cache, grayscale=key[4],
+                                       operation=operation, workers=self.workers)
+        if not document:
+            raise RuntimeError(f"Failed to load {file_path}")
+        with self._cache_lock:
+            self._documents[key] = document
+            while len(self._documents) > DAEMON_DOCUMENT_CACHE:
+                self._documents.popitem(last=False)
+        return document
+
+    @staticmethod
+    def _file_key(file_path: str, job: ComparisonJob) -> FileKey:
+        stat = os.stat(file_path)
+        return file_path, stat.st_size, stat.st_mtime_ns, job.dpi, job.grayscale
+
+
+async def serve(daemon: ComparisonDaemon,
+                host: Optional[str] = None,
+                port: Optional[int] = None,
+                socket_path: Optional[str] = None):
+    """Uruchamia usługę i serwer HTTP na host:port lub gnieździe uniksowym socket_path (do SIGINT/SIGTERM)."""
+    await daemon.start()
+    stopped = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal_number, stopped.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows - przerwanie przez KeyboardInterrupt
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await _handle_connection(daemon, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    if socket_path:
+        server = await asyncio.start_unix_server(handle, path=socket_path)
+        logging.info(f"Comparison daemon listening on {socket_path}")
+    else:
+        server = await asyncio.start_server(handle, host, port)
+        logging.info(f"Comparison daemon listening on {host}:{port}")
+    try:
+        async with server:
+            await stopped.wait()
+        logging.info("Comparison daemon stopped")
+    finally:
+        await daemon.stop()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+async def _handle_connection(daemon: ComparisonDaemon, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Obsługuje kolejne żądania jednego połączenia (keep-alive)."""
+    while True:
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            await _respond(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+            return
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = (headers.get("connection", "").lower() != "close"
+                      and (version != "HTTP/1.0" or headers.get("connection", "").lower() == "keep-alive"))
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            await _respond(writer, 400, {"error": "Invalid Content-Length header"}, keep_alive=False)
+            return
+        if length > DAEMON_MAX_REQUEST_BYTES:
+            await _respond(writer, 413, {"error": "Request body too large"}, keep_alive=False)
+            return
+        body = await reader.readexactly(length) if length else b""
+
+        path = urlsplit(target).path.rstrip("/")
+        parts = path.strip("/").split("/")
+        try:
+            if parts[0] == "jobs" and len(parts) == 3 and parts[2] == "events" and method == "GET":
+                await _stream_events(daemon, parts[1], writer)
+                continue
+            status, payload = _route(daemon, method, parts, body)
+        except HttpError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception as e:
+            logging.error(f"Daemon request {method} {path} failed: {e}")
+            status, payload = 500, {"error": str(e)}
+        await _respond(writer, status, payload, keep_alive)
+        if not keep_alive:
+            return
+
+
+def _route(daemon: ComparisonDaemon, method: str, parts: List[str], body: bytes) -> Tuple[int, object]:
+    if parts == ["status"]:
+        if method != "GET":
+            raise HttpError(405, "Use GET")
+        return 200, daemon.status()
+    if parts == ["jobs"]:
+        if method == "GET":
+            return 200, [job.to_dict(pages=False) for job in daemon.jobs()]
+        if method != "POST":
+            raise HttpError(405, "Use GET or POST")
+        try:
+            request = json.loads(body or b"null")
+        except ValueError as e:
+            raise HttpError(400, f"Invalid JSON: {e}")
+        if isinstance(request, list):
+            return 202, [job.to_dict() for job in daemon.submit_all(request)]
+        return 202, daemon.submit(request).to_dict()
+    if parts[0] == "jobs" and len(parts) == 2:
+        if method == "GET":
+            return 200, daemon.get(parts[1]).to_dict()
+        if method == "DELETE":
+            return 200, daemon.cancel(parts[1]).to_dict()
+        raise HttpError(405, "Use GET or DELETE")
+    raise HttpError(404, "Not found")
+
+
+async def _stream_events(daemon: ComparisonDaemon, job_id: str, writer: asyncio.StreamWriter):
+    """Wysyła stany zlecenia jako JSON lines w kodowaniu chunked."""
+    events = daemon.events(job_id)
+    try:
+        first = await events.__anext__()
+    except HttpError as e:
+        await _respond(writer, e.status, {"error": str(e)}, keep_alive=True)
+        return
+    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+
+    async def send(event: dict):
+        data = json.dumps(event).encode() + b"\n"
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+
+    try:
+        await send(first)
+        async for event in events:
+            await send(event)
+    finally:
+        await events.aclose()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, payload: object, keep_alive: bool):
+    data = json.dumps(payload).encode()
+    writer.write(f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                 f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+    await writer.drain()
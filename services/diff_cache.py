@@ -0,0 +1,43 @@
+from typing import Dict, Optional, Tuple
+import numpy as np
+from models.pdf_document import PDFDocument
+
+
+class DiffCache:
+    """Pamięć podręczna map różnic dla par stron.
+
+    Mapa różnic nie zależy od czułości, więc po jej jednorazowym obliczeniu zmiana suwaka
+    wymaga jedynie ponownego progowania. Dla stron o równych rozmiarach mapa jest symetryczna,
+    dlatego zamiana dokumentu bazowego również korzysta z tego samego wpisu.
+    """
+
+    def __init__(self):
+        self._maps: Dict[Tuple[int, int, int, int], np.ndarray] = {}
+
+    @staticmethod
+    def _key(base_doc: PDFDocument, compare_doc: PDFDocument, page_index: int,
+             compare_index: Optional[int] = None) -> Tuple[int, int, int, int]:
+        compare_index = page_index if compare_index is None else compare_index
+        first, second = (id(base_doc), page_index), (id(compare_doc), compare_index)
+        base_size = base_doc.page_size(page_index)
+        # Przy różnych rozmiarach strona porównywana renderowana jest na siatce pikseli strony bazowej,
+        # więc mapa różnic zależy od tego, która strona jest bazowa - kolejność ma znaczenie.
+        # Rozmiary znane są bez renderowania stron leniwych dokumentów.
+        symmetric = base_size is not None and base_size == compare_doc.page_size(compare_index)
+        if symmetric and second < first:
+            first, second = second, first
+        return first + second
+
+    def get(self, base_doc: PDFDocument, compare_doc: PDFDocument, page_index: int,
+            compare_index: Optional[int] = None) -> Optional[np.ndarray]:
+        """Zwraca zapamiętaną mapę różnic pary stron (compare_index - strona porównywana, domyślnie ta sama) lub None."""
+        return self._maps.get(self._key(base_doc, compare_doc, page_index, compare_index))
+
+    def put(self, base_doc: PDFDocument, compare_doc: PDFDocument, page_index: int, difference_map: np.ndarray,
+            compare_index: Optional[int] = None):
+        """Zapamiętuje mapę różnic dla pary stron."""
+        self._maps[self._key(base_doc, compare_doc, page_index, compare_index)] = difference_map
+
+    def clear(self):
+        """Usuwa wszystkie zapamiętane mapy (np. po wczytaniu nowego dokumentu)."""
+        self._maps.clear()
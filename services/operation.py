@@ -0,0 +1,40 @@
+import threading
+from typing import Callable, Optional
+
+# Funkcja raportująca postęp: (etap, wykonane, wszystkie)
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class OperationCancelled(Exception):
+    """Operacja została anulowana przed zakończeniem."""
+
+
+class Operation:
+    """Uchwyt długotrwałej operacji (ładowanie, porównanie) współdzielony z wątkiem, który ją wykonuje.
+
+    Serwisy wywołują report() między kolejnymi krokami; po cancel() następne wywołanie
+    report() lub check() zgłasza OperationCancelled, a pula procesów przerywa zadania w toku.
+    """
+
+    def __init__(self, progress: Optional[ProgressCallback] = None):
+        self._cancelled = threading.Event()
+        self._progress = progress
+
+    def cancel(self):
+        """Zgłasza żądanie anulowania (bezpieczne z dowolnego wątku)."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Zgłasza OperationCancelled, jeśli zażądano anulowania."""
+        if self._cancelled.is_set():
+            raise OperationCancelled()
+
+    def report(self, stage: str, done: int, total: int):
+        """Raportuje postęp etapu; jednocześnie jest punktem, w którym operacja może zostać przerwana."""
+        self.check()
+        if self._progress:
+            self._progress(stage, done, total)
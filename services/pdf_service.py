@@ -1,113 +1,699 @@
 import fitz
+import functools
 import logging
-from PIL import Image
-from typing import Optional
+import math
+import os
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 import concurrent.futures
-from models.pdf_document import PDFDocument, ComparisonResult
-from utils.image_utils import compare_images, resize_image_to_fit
-from config.settings import DEFAULT_DPI, PDF_LOAD_TIMEOUT, COMPARISON_TIMEOUT
+from models.pdf_document import (PDFDocument, ComparisonResult, DifferenceRegion, PAGE_MATCHED, PAGE_INSERTED,
+                                 PAGE_DELETED, REGION_INSERTED, REGION_DELETED, REGION_MOVED)
+from services.diff_cache import DiffCache
+from services.operation import Operation, OperationCancelled
+from services.raster_cache import Counted, RasterCache
+from services.worker_pool import get_worker_pool, in_worker_process
+from utils import debug_sink, diff_pipeline, page_alignment, page_fingerprint, profiling, result_store
+from utils.page_buffer import PageBuffer
+from utils.result_store import ResultStore
+from config.settings import (DEFAULT_DPI, PDF_LOAD_TIMEOUT, COMPARISON_TIMEOUT, MAX_WORKERS, PREVIEW_MIN_SIZE,
+                             RENDER_GRAYSCALE, PAGE_ASPECT_TOLERANCE, PAGE_SIGNATURE_BATCH, MSG_STAGE_FINGERPRINT,
+                             MSG_STAGE_RENDER, MSG_STAGE_ALIGN, MSG_STAGE_COMPARE)
 
 class PDFService:
     """Serwis do operacji na dokumentach PDF."""
 
     @staticmethod
-    def load_pdf(file_path: str, testing_mode: bool = False, dpi: int = DEFAULT_DPI) -> Optional[PDFDocument]:
-        """Ładuje dokument PDF i konwertuje pierwszą stronę na obraz."""
+    def load_pdf(file_path: str,
+                 testing_mode: bool = False,
+                 dpi: int = DEFAULT_DPI,
+                 raster_cache: Optional[RasterCache] = None,
+                 grayscale: bool = RENDER_GRAYSCALE,
+                 operation: Optional[Operation] = None,
+                 workers: int = MAX_WORKERS) -> Optional[PDFDocument]:
+        """Otwiera dokument PDF bez renderowania stron (dokument leniwy).
+
+        Zbierane są jedynie rozmiary stron, odciski treści i podgląd pierwszej strony (renderowany
+        bezpośrednio w rozmiarze miniatury). Strony renderowane są przy pierwszym użyciu - jeśli
+        podano raster_cache, strony wyrenderowane wcześniej (dla pliku o tej samej zawartości)
+        są wczytywane z dysku. Tryb grayscale renderuje strony w skali szarości (fitz.csGRAY) - trzy
+        razy mniej danych, gdy zmiany koloru nie mają znaczenia. Przez operation raportowany jest
+        postęp; anulowanie zgłasza OperationCancelled.
+
+        Przy workers > 1 plik otwierany jest, a strony renderowane, w procesach roboczych z limitem
+        czasu PDF_LOAD_TIMEOUT na zadanie - także strony pobierane później w procesie głównym
+        (np. do wyświetlenia), więc uszkodzona lub bardzo duża strona nie blokuje aplikacji.
+        """
         try:
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(PDFService._load_pdf_page, file_path, dpi, testing_mode)
-                document = future.result(timeout=PDF_LOAD_TIMEOUT)
-                return document
-        except concurrent.futures.TimeoutError:
-            logging.error(f"PDF loading timed out for {file_path}")
-            raise TimeoutError(f"Loading PDF file timed out after {PDF_LOAD_TIMEOUT} seconds")
+            with profiling.span("load_pdf", file=os.path.basename(file_path)):
+                return PDFService._open_document(file_path, dpi, testing_mode, raster_cache, grayscale, operation,
+                                                 workers)
+        except OperationCancelled:
+            logging.info(f"Loading {file_path} cancelled")
+            raise
         except Exception as e:
             logging.error(f"Failed to load PDF {file_path}: {e}")
             return None
 
     @staticmethod
-    def _load_pdf_page(file_path: str, dpi: int, testing_mode: bool) -> PDFDocument:
-        """Wewnętrzna metoda do ładowania strony PDF."""
+    def _open_document(file_path: str,
+                       dpi: int,
+                       testing_mode: bool,
+                       raster_cache: Optional[RasterCache],
+                       grayscale: bool,
+                       operation: Optional[Operation] = None,
+                       workers: int = MAX_WORKERS) -> PDFDocument:
+        """Wewnętrzna metoda zbierająca odciski i rozmiary stron (porcjami) oraz podgląd."""
+        page_count, preview = PDFService._run_parallel(PDFService._document_preview, [(file_path, grayscale)],
+                                                       workers, PDF_LOAD_TIMEOUT, operation, MSG_STAGE_RENDER)[0]
+        scanned = PDFService._run_parallel(
+            PDFService._scan_pages,
+            [(file_path, dpi, start, min(start + PAGE_SIGNATURE_BATCH, page_count))
+             for start in range(0, page_count, PAGE_SIGNATURE_BATCH)],
+            workers,
+            PDF_LOAD_TIMEOUT,
+            operation,
+            MSG_STAGE_FINGERPRINT
+        )
+        content_digests = [digest for digests, _ in scanned for digest in digests]
+        page_sizes = [size for _, sizes in scanned for size in sizes]
+
+        digest = raster_cache.file_digest(file_path) if raster_cache is not None else None
+        document = PDFDocument(file_path=file_path,
+                               preview_image=preview,
+                               content_digests=content_digests,
+                               page_sizes=page_sizes,
+                               page_loader=functools.partial(PDFService.load_page, file_path, dpi=dpi,
+                                                             grayscale=grayscale, raster_cache=raster_cache,
+                                                             digest=digest, isolated=workers > 1))
+        if testing_mode and preview is not None:
+            debug_sink.capture("preview.png", preview, label=os.path.basename(file_path))
+        return document
+
+    @staticmethod
+    def load_page(file_path: str,
+                  page_index: int,
+                  dpi: int = DEFAULT_DPI,
+                  grayscale: bool = False,
+                  raster_cache: Optional[RasterCache] = None,
+                  digest: Optional[str] = None,
+                  target_size: Optional[Tuple[int, int]] = None,
+                  isolated: bool = False) -> np.ndarray:
+        """Zwraca stronę z pamięci podręcznej rastrów lub ją renderuje (page_loader leniwego dokumentu).
+
+        Wywoływane także w procesach roboczych - pamięć podręczna rastrów jest współdzielona przez dysk.
+        Jeśli podano target_size (szerokość, wysokość strony bazowej w pikselach), strona renderowana
+        jest od razu na siatce strony bazowej (_render_on_grid), bez skalowania obrazu i bez zapisu
+        w pamięci podręcznej rastrów. Przy isolated strona wywołana poza procesem roboczym (np. do
+        wyświetlenia) renderowana jest w puli procesów z limitem czasu PDF_LOAD_TIMEOUT; strona
+        z pamięci podręcznej rastrów wczytywana jest bez pośrednictwa puli.
+        """
+        colorspace = "gray" if grayscale else "rgb"
+        if target_size is None and raster_cache is not None and digest is not None:
+            page = raster_cache.get(digest, page_index, dpi, colorspace)
+            if page is not None:
+                return page
+        if isolated and not in_worker_process():
+            loader = functools.partial(PDFService._render_and_cache, file_path, dpi=dpi, grayscale=grayscale,
+                                       raster_cache=raster_cache, digest=digest, target_size=target_size)
+            future = get_worker_pool().submit(Counted(loader), page_index, timeout=PDF_LOAD_TIMEOUT)
+            return Counted.unwrap(future.result())
+        return PDFService._render_and_cache(file_path, page_index, dpi, grayscale, raster_cache, digest, target_size)
+
+    @staticmethod
+    def _render_and_cache(file_path: str,
+                          page_index: int,
+                          dpi: int,
+                          grayscale: bool,
+                          raster_cache: Optional[RasterCache],
+                          digest: Optional[str],
+                          target_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """Renderuje stronę (na siatce target_size, jeśli podano) i zapisuje ją w pamięci podręcznej rastrów."""
+        if target_size is not None:
+            return PDFService._render_on_grid(file_path, page_index, dpi, target_size, grayscale)
+        colorspace = "gray" if grayscale else "rgb"
+        page = PDFService._render_page(file_path, page_index, dpi, grayscale)
+        if raster_cache is not None and digest is not None:
+            raster_cache.put(digest, page_index, dpi, colorspace, page)
+        return page
+
+    @staticmethod
+    def _document_preview(file_path: str, grayscale: bool) -> Tuple[int, Optional[np.ndarray]]:
+        """Liczba stron i podgląd pierwszej strony (wywoływane w procesie roboczym)."""
+        with fitz.open(file_path) as pdf:
+            if not pdf.page_count:
+                return 0, None
+            with profiling.span("preview"):
+                return pdf.page_count, PDFService._render_thumbnail(pdf.load_page(0), PREVIEW_MIN_SIZE, grayscale)
+
+    @staticmethod
+    def _scan_pages(file_path: str, dpi: int, start: int, stop: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """Odciski treści i rozmiary (w pikselach przy dpi) stron start..stop-1 (wywoływane w procesie roboczym)."""
+        zoom = dpi / 72
+        resource_cache = {}
+        content_digests, page_sizes = [], []
+        with fitz.open(file_path) as pdf:
+            for page_index in range(start, stop):
+                page = pdf.load_page(page_index)
+                with profiling.span("fingerprint", page=page_index):
+                    content_digests.append(page_fingerprint.content_digest(pdf, page, resource_cache))
+                page_sizes.append(PDFService.pixel_size(page.rect, zoom))
+        return content_digests, page_sizes
+
+    @staticmethod
+    def _render_thumbnail(page: "fitz.Page", max_size: Tuple[int, int], grayscale: bool = False) -> np.ndarray:
+        """Renderuje stronę bezpośrednio w skali miniatury mieszczącej się w max_size (bez strony pełnej rozdzielczości)."""
+        zoom = min(max_size[0] / page.rect.width, max_size[1] / page.rect.height)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY if grayscale else fitz.csRGB,
+                              alpha=False)
+        return PDFService.pixmap_to_array(pix)
+
+    @staticmethod
+    def _render_page(file_path: str, page_index: int, dpi: int, grayscale: bool = False) -> np.ndarray:
+        """Renderuje pojedynczą stronę PDF do tablicy uint8 (wywoływane w procesie roboczym).
+
+        Tablica jest widokiem na bufor próbek pixmapy (PageBuffer) - bez kopii i konwersji przez PIL.
+        """
         zoom = dpi / 72
         mat = fitz.Matrix(zoom, zoom)
 
-        document = PDFDocument(file_path=file_path)
+        with profiling.span("render", page=page_index, dpi=dpi), fitz.open(file_path) as pdf:
+            page = pdf.load_page(page_index)
+            pix = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY if grayscale else fitz.csRGB, alpha=False)
+            return PDFService.pixmap_to_array(pix)
 
-        with fitz.open(file_path) as pdf:
-            page = pdf.load_page(0)
-            pix = page.get_pixmap(matrix=mat)
-
-            # Konwersja na obraz PIL
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            document.page_image = img
-
-            # Tworzenie podglądu
-            document.preview_image = resize_image_to_fit(
-                img.copy(),
-                (350, 150),  # Rozmiar podglądu
-                testing_mode
-            )
+    @staticmethod
+    def _render_on_grid(file_path: str, page_index: int, dpi: int, target_size: Tuple[int, int],
+                        grayscale: bool = False) -> np.ndarray:
+        """Renderuje stronę bezpośrednio w rozmiarze target_size (siatka pikseli strony bazowej, grid_zoom)."""
+        width, height = target_size
+        with profiling.span("render", page=page_index, dpi=dpi, grid=True), fitz.open(file_path) as pdf:
+            page = pdf.load_page(page_index)
+            zoom_x, zoom_y = PDFService.grid_zoom(page.rect, width, height, dpi / 72)
+            return PDFService.render_region(page, zoom_x, 0, 0, width, height, grayscale, zoom_y=zoom_y)
 
-            if testing_mode:
-                img.save(f"{file_path}_page_test.png", "PNG")
-                document.preview_image.save(f"{file_path}_preview_test.png", "PNG")
+    @staticmethod
+    def pixel_size(page_rect: "fitz.Rect", zoom: float) -> Tuple[int, int]:
+        """Zwraca szerokość i wysokość strony w pikselach przy zadanym powiększeniu."""
+        irect = (page_rect * fitz.Matrix(zoom, zoom)).irect
+        return irect.width, irect.height
 
-        return document
+    @staticmethod
+    def grid_zoom(page_rect: "fitz.Rect", width: float, height: float, zoom: float) -> Tuple[float, float]:
+        """Powiększenie (poziome, pionowe) odwzorowujące stronę na siatkę pikseli strony bazowej width x height.
+
+        zoom to skala strony bazowej (piksele na punkt). page_rect to widoczny obszar strony (CropBox
+        po obrocie), więc różnice MediaBox poza nim nie mają znaczenia. Strona o proporcjach różniących
+        się o mniej niż PAGE_ASPECT_TOLERANCE (przeskalowany dokument, zaokrąglony rozmiar strony)
+        wypełnia całą siatkę. Strona o innych proporcjach (zmieniony MediaBox lub CropBox) renderowana
+        jest w skali strony bazowej od lewego górnego rogu - treść w tym samym miejscu strony pokrywa
+        się, obszar poza stroną jest biały, a wychodzący poza stronę bazową jest pomijany.
+        """
+        zoom_x, zoom_y = width / page_rect.width, height / page_rect.height
+        if abs(zoom_x / zoom_y - 1) < PAGE_ASPECT_TOLERANCE:
+            return zoom_x, zoom_y
+        return zoom, zoom
+
+    @staticmethod
+    def render_region(page: "fitz.Page",
+                      zoom: float,
+                      x0: int,
+                      y0: int,
+                      x1: int,
+                      y1: int,
+                      grayscale: bool = False,
+                      zoom_y: Optional[float] = None) -> np.ndarray:
+        """Renderuje prostokąt pikseli [x0, x1) x [y0, y1) strony (fitz clip).
+
+        Wynik ma dokładnie zadany rozmiar i leży na tej samej siatce pikseli co render całej strony;
+        piksele poza stroną uzupełniane są białym tłem. zoom_y (domyślnie równy zoom) pozwala
+        odwzorować stronę na siatkę pikseli innej strony (grid_zoom).
+        """
+        zoom_x, zoom_y = zoom, zoom if zoom_y is None else zoom_y
+        page_origin = page.rect.tl
+        clip = fitz.Rect(page_origin.x + x0 / zoom_x, page_origin.y + y0 / zoom_y,
+                         page_origin.x + x1 / zoom_x, page_origin.y + y1 / zoom_y)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom_x, zoom_y), clip=clip,
+                              colorspace=fitz.csGRAY if grayscale else fitz.csRGB, alpha=False)
+        rendered = PDFService.pixmap_to_array(pix)
+
+        # Pixmapa może być o piksel większa lub mniejsza (zaokrąglenia) - wycinamy dokładnie obszar.
+        region = np.full((y1 - y0, x1 - x0) + rendered.shape[2:], 255, dtype=np.uint8)
+        src_y = y0 - (pix.y - int(round(page_origin.y * zoom_y)))
+        src_x = x0 - (pix.x - int(round(page_origin.x * zoom_x)))
+        dst_y, dst_x = max(0, -src_y), max(0, -src_x)
+        src_y, src_x = max(0, src_y), max(0, src_x)
+        rows = min(region.shape[0] - dst_y, rendered.shape[0] - src_y)
+        cols = min(region.shape[1] - dst_x, rendered.shape[1] - src_x)
+        if rows > 0 and cols > 0:
+            region[dst_y:dst_y + rows, dst_x:dst_x + cols] = rendered[src_y:src_y + rows, src_x:src_x + cols]
+        return region
+
+    @staticmethod
+    def region_result(base_path: str,
+                      compare_path: str,
+                      page_index: int,
+                      regions: List[Tuple[int, int, int, int]],
+                      sensitivity: int,
+                      dpi: int,
+                      display_dpi: int = DEFAULT_DPI,
+                      grayscale: bool = False) -> ComparisonResult:
+        """Buduje wynik strony z obszarów znalezionych przy wysokim DPI.
+
+        Strona bazowa renderowana jest przy display_dpi, a obszary są na nią przeskalowywane.
+        """
+        scale = display_dpi / dpi
+        scaled = [(int(x * scale), int(y * scale), max(1, math.ceil(w * scale)), max(1, math.ceil(h * scale)))
+                  for x, y, w, h in sorted(regions, key=lambda rect: (rect[1], rect[0]))]
+        return ComparisonResult(
+            original_image=result_store.get_store().put(
+                PDFService._render_page(base_path, page_index, display_dpi, grayscale)),
+            base_document=PDFDocument(file_path=base_path),
+            compare_document=PDFDocument(file_path=compare_path),
+            sensitivity=sensitivity,
+            differences_count=len(regions),
+            page_index=page_index,
+            regions=[DifferenceRegion(*rect) for rect in scaled]
+        )
+
+    @staticmethod
+    def extra_page_results(base_path: str,
+                           compare_path: str,
+                           base_count: int,
+                           compare_count: int,
+                           sensitivity: int,
+                           display_dpi: int = DEFAULT_DPI,
+                           grayscale: bool = False) -> List[ComparisonResult]:
+        """Wyniki stron bez pary w trybach porównujących strony według pozycji (BandService, PyramidService).
+
+        Strony dłuższego dokumentu ponad liczbę stron krótszego są usunięte (dokument bazowy) lub
+        wstawione (porównywany) - jak w _unmatched_result, z jednym obszarem obejmującym całą stronę
+        renderowaną przy display_dpi.
+        """
+        inserted = compare_count > base_count
+        file_path = compare_path if inserted else base_path
+        kind = PAGE_INSERTED if inserted else PAGE_DELETED
+        results = []
+        for page_index in range(min(base_count, compare_count), max(base_count, compare_count)):
+            page = PDFService._render_page(file_path, page_index, display_dpi, grayscale)
+            height, width = page.shape[:2]
+            results.append(ComparisonResult(
+                original_image=result_store.get_store().put(page),
+                base_document=PDFDocument(file_path=base_path),
+                compare_document=PDFDocument(file_path=compare_path),
+                sensitivity=sensitivity,
+                differences_count=1,
+                page_index=page_index,
+                alignment=kind,
+                regions=[DifferenceRegion(0, 0, width, height, kind=REGION_INSERTED if inserted else REGION_DELETED,
+                                          label=kind)]
+            ))
+        return results
+
+    @staticmethod
+    def regions_from_stats(stats: np.ndarray) -> List[DifferenceRegion]:
+        """Zamienia statystyki obszarów (N x 5: x, y, w, h, piksele) na listę DifferenceRegion."""
+        return [DifferenceRegion(x, y, w, h, pixels=pixels) for x, y, w, h, pixels in stats.tolist()]
+
+    @staticmethod
+    def pixmap_to_array(pix: "fitz.Pixmap") -> np.ndarray:
+        """Zwraca tablicę (H x W x n lub H x W dla jednego kanału) współdzielącą pamięć z próbkami pixmapy."""
+        return PageBuffer.from_pixmap(pix)
 
     @staticmethod
     def compare_documents(base_doc: PDFDocument,
                           compare_doc: PDFDocument,
                           sensitivity: int,
-                          testing_mode: bool = False) -> Optional[ComparisonResult]:
-        """Porównuje dwa dokumenty PDF."""
+                          testing_mode: bool = False,
+                          workers: int = MAX_WORKERS,
+                          diff_cache: Optional[DiffCache] = None,
+                          operation: Optional[Operation] = None,
+                          store: Optional[ResultStore] = None) -> List[ComparisonResult]:
+        """Porównuje dwa dokumenty PDF strona po stronie i zwraca wynik dla każdej strony.
+
+        Jeśli podano diff_cache, mapy różnic obliczone wcześniej dla tej pary dokumentów
+        są używane ponownie i liczone jest jedynie progowanie. Mapy różnic trafiają do store
+        (domyślnie współdzielony magazyn sesji, result_store.get_store()). Anulowanie przez
+        operation zgłasza OperationCancelled.
+        """
         try:
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(
-                    PDFService._compare_images,
-                    base_doc,
-                    compare_doc,
-                    sensitivity,
-                    testing_mode
-                )
-                result = future.result(timeout=COMPARISON_TIMEOUT)
-                return result
+            with profiling.span("compare_documents"):
+                return PDFService._compare_pages(base_doc, compare_doc, sensitivity, testing_mode, workers,
+                                                 diff_cache, operation, store or result_store.get_store())
+        except OperationCancelled:
+            logging.info("Comparison cancelled")
+            raise
         except concurrent.futures.TimeoutError:
             logging.error("PDF comparison timed out")
             raise TimeoutError(f"Comparison timed out after {COMPARISON_TIMEOUT} seconds")
         except Exception as e:
             logging.error(f"Failed to compare documents: {e}")
-            return None
+            return []
 
     @staticmethod
-    def _compare_images(base_doc: PDFDocument,
-                        compare_doc: PDFDocument,
-                        sensitivity: int,
-                        testing_mode: bool) -> ComparisonResult:
-        """Wewnętrzna metoda do porównywania obrazów."""
+    def _compare_pages(base_doc: PDFDocument,
+                       compare_doc: PDFDocument,
+                       sensitivity: int,
+                       testing_mode: bool,
+                       workers: int,
+                       diff_cache: Optional[DiffCache],
+                       operation: Optional[Operation],
+                       store: ResultStore) -> List[ComparisonResult]:
+        """Wewnętrzna metoda dopasowująca strony i porównująca pary równolegle.
+
+        Strony leniwych dokumentów renderowane są w procesach roboczych (_compare_sources) - do
+        procesu głównego wracają tylko mapy różnic, a strony bazowe wczytywane są dopiero do wyświetlenia.
+        Strony wstawione i usunięte (align_pages) nie trafiają do porównania pikseli.
+        """
         if not (base_doc.is_loaded() and compare_doc.is_loaded()):
             raise ValueError("Both documents must be loaded")
 
-        diff_image, original_image = compare_images(
-            base_doc.page_image,
-            compare_doc.page_image,
-            sensitivity,
-            testing_mode
+        pairs = PDFService.align_pages(base_doc, compare_doc, workers, operation)
+        # Strony identyczne wg odcisków treści nie trafiają do kosztownego porównania pikseli.
+        to_compare = [(base_index, compare_index) for base_index, compare_index in pairs
+                      if base_index is not None and compare_index is not None
+                      and not PDFService.pages_identical(base_doc, compare_doc, base_index, compare_index)]
+        cached_maps = {pair: diff_cache.get(base_doc, compare_doc, *pair) if diff_cache else None for pair in to_compare}
+        in_process = workers <= 1
+        compared = PDFService._run_parallel(
+            PDFService._compare_sources,
+            [(PDFService._page_source(base_doc, base_index, in_process),
+              PDFService._page_source(compare_doc, compare_index, in_process,
+                                      target_size=base_doc.page_size(base_index)),
+              base_index, compare_index, sensitivity, cached_maps[(base_index, compare_index)])
+             for base_index, compare_index in to_compare],
+            workers,
+            COMPARISON_TIMEOUT,
+            operation,
+            MSG_STAGE_COMPARE
         )
+        compared = {pair: outcome for pair, outcome in zip(to_compare, compared) if outcome is not None}
+        matched = sum(1 for base_index, compare_index in pairs if base_index is not None and compare_index is not None)
+        if len(compared) < matched:
+            logging.info(f"Skipped {matched - len(compared)} identical page(s) of {matched}")
+        if matched < len(pairs):
+            logging.info(f"{len(pairs) - matched} page(s) inserted or deleted")
 
-        if diff_image is None or original_image is None:
-            raise ValueError("Image comparison failed")
+        # Strona przeniesiona to strona usunięta i wstawiona o tym samym odcisku treści.
+        deleted = {base_doc.content_digests[base_index]: base_index for base_index, compare_index in pairs
+                   if compare_index is None}
+        moved = {compare_index: deleted[compare_doc.content_digests[compare_index]]
+                 for base_index, compare_index in pairs
+                 if base_index is None and compare_doc.content_digests[compare_index] in deleted}
 
-        if testing_mode:
-            diff_image.save(f"{base_doc.file_path}_diff_test.png", "PNG")
-            original_image.save(f"{base_doc.file_path}_original_test.png", "PNG")
+        results = []
+        for base_index, compare_index in pairs:
+            if base_index is None or compare_index is None:
+                results.append(PDFService._unmatched_result(base_doc, compare_doc, base_index, compare_index,
+                                                            sensitivity, moved))
+                continue
+            if (base_index, compare_index) not in compared:
+                results.append(ComparisonResult(
+                    base_document=base_doc,
+                    compare_document=compare_doc,
+                    sensitivity=sensitivity,
+                    page_index=base_index,
+                    compare_page_index=compare_index,
+                    identical=True
+                ))
+                continue
+
+            difference_map, stats = compared[(base_index, compare_index)]
+            # Mapa trafia do pliku mapowanego w pamięć - kopia zwrócona przez proces roboczy jest zwalniana.
+            difference_map = store.put(difference_map)
+            if diff_cache is not None and cached_maps[(base_index, compare_index)] is None:
+                diff_cache.put(base_doc, compare_doc, base_index, difference_map, compare_index)
 
+            result = ComparisonResult(
+                difference_map=difference_map,
+                base_document=base_doc,
+                compare_document=compare_doc,
+                sensitivity=sensitivity,
+                differences_count=len(stats),
+                page_index=base_index,
+                compare_page_index=compare_index,
+                regions=PDFService.regions_from_stats(stats)
+            )
+            if testing_mode:
+                PDFService._capture_test_pages(result)
+                PDFService._capture_test_artifacts(result)
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _unmatched_result(base_doc: PDFDocument,
+                          compare_doc: PDFDocument,
+                          base_index: Optional[int],
+                          compare_index: Optional[int],
+                          sensitivity: int,
+                          moved: Optional[Dict[int, int]] = None) -> ComparisonResult:
+        """Wynik strony wstawionej lub usuniętej: jeden obszar obejmujący całą stronę (bez renderowania).
+
+        moved (strona porównywana -> strona bazowa) wskazuje strony przeniesione - ich obszar ma rodzaj
+        REGION_MOVED i opis miejsca, z którego lub do którego przeniesiono stronę.
+        """
+        inserted = base_index is None
+        page_index = compare_index if inserted else base_index
+        width, height = (compare_doc if inserted else base_doc).page_size(page_index)
+        kind = PAGE_INSERTED if inserted else PAGE_DELETED
+        region_kind, label = REGION_INSERTED if inserted else REGION_DELETED, kind
+        moved = moved or {}
+        if inserted and compare_index in moved:
+            region_kind, label = REGION_MOVED, f"moved from page {moved[compare_index] + 1}"
+        elif not inserted and base_index in moved.values():
+            target = next(target for target, source in moved.items() if source == base_index)
+            region_kind, label = REGION_MOVED, f"moved to page {target + 1}"
         return ComparisonResult(
-            diff_image=diff_image,
-            original_image=original_image,
             base_document=base_doc,
             compare_document=compare_doc,
-            sensitivity=sensitivity
+            sensitivity=sensitivity,
+            differences_count=1,
+            page_index=page_index,
+            alignment=kind,
+            regions=[DifferenceRegion(0, 0, width, height, kind=region_kind, label=label)]
+        )
+
+    @staticmethod
+    def align_pages(base_doc: PDFDocument,
+                    compare_doc: PDFDocument,
+                    workers: int = MAX_WORKERS,
+                    operation: Optional[Operation] = None) -> List[Tuple[Optional[int], Optional[int]]]:
+        """Dopasowuje strony obu dokumentów (utils.page_alignment).
+
+        Kotwicami są strony o unikalnych, równych odciskach treści; takie strony spoza kotwic są
+        przeniesione (usunięte i wstawione w innym miejscu). Sygnatury (perceptual hash i szingle
+        tekstu) obliczane są tylko dla pozostałych stron w lukach między kotwicami - i tylko wtedy,
+        gdy luka ma strony po obu stronach. Zwraca listę par (indeks bazowy, indeks porównywany),
+        w której None oznacza stronę wstawioną lub usuniętą.
+        """
+        base_digests, compare_digests = base_doc.content_digests, compare_doc.content_digests
+
+        def similarity(base_index: int, compare_index: int) -> float:
+            if base_digests[base_index] == compare_digests[compare_index]:
+                return 1.0
+            return page_fingerprint.signature_similarity(base_doc.page_signatures[base_index],
+                                                         compare_doc.page_signatures[compare_index])
+
+        with profiling.span("align_pages"):
+            anchors = page_alignment.match_anchors(base_digests, compare_digests)
+            moved = page_alignment.match_moved(base_digests, compare_digests, anchors)
+            excluded = ({base_index for base_index, _ in moved}, {compare_index for _, compare_index in moved})
+            gaps = [tuple([page_index for page_index in gap[side] if page_index not in excluded[side]]
+                          for side in (0, 1))
+                    for gap in page_alignment.find_gaps(base_doc.page_count, compare_doc.page_count, anchors)]
+            wanted = [(document, [page_index for gap in gaps if gap[0] and gap[1] for page_index in gap[side]])
+                      for side, document in enumerate((base_doc, compare_doc))]
+            PDFService._load_signatures(wanted, workers, operation)
+            return page_alignment.align(base_doc.page_count, compare_doc.page_count, anchors, similarity,
+                                        moved=moved)
+
+    @staticmethod
+    def _load_signatures(wanted: List[Tuple[PDFDocument, List[int]]], workers: int,
+                         operation: Optional[Operation] = None):
+        """Oblicza brakujące sygnatury stron (w procesach roboczych, porcjami) i zapamiętuje je w dokumentach."""
+        tasks = []
+        for document, page_indexes in wanted:
+            missing = [page_index for page_index in page_indexes if page_index not in document.page_signatures]
+            for start in range(0, len(missing), PAGE_SIGNATURE_BATCH):
+                tasks.append((document, missing[start:start + PAGE_SIGNATURE_BATCH]))
+        if not tasks:
+            return
+        signatures = PDFService._run_parallel(
+            PDFService._page_signatures,
+            [(document.file_path, page_indexes) for document, page_indexes in tasks],
+            workers,
+            COMPARISON_TIMEOUT,
+            operation,
+            MSG_STAGE_ALIGN
+        )
+        for (document, page_indexes), batch in zip(tasks, signatures):
+            document.page_signatures.update(zip(page_indexes, batch))
+
+    @staticmethod
+    def document_signatures(file_path: str) -> Tuple[List[str], list]:
+        """Odciski treści i sygnatury wszystkich stron pliku (np. dla indeksu wzorców; wywoływane w procesie roboczym)."""
+        with profiling.span("signature", file=os.path.basename(file_path)), fitz.open(file_path) as pdf:
+            resource_cache = {}
+            digests, signatures = [], []
+            for page in pdf:
+                digests.append(page_fingerprint.content_digest(pdf, page, resource_cache))
+                signatures.append(page_fingerprint.page_signature(page))
+            return digests, signatures
+
+    @staticmethod
+    def _page_signatures(file_path: str, page_indexes: List[int]) -> list:
+        """Sygnatury wybranych stron pliku (wywoływane w procesie roboczym)."""
+        with profiling.span("signature", pages=len(page_indexes)), fitz.open(file_path) as pdf:
+            return [page_fingerprint.page_signature(pdf.load_page(page_index)) for page_index in page_indexes]
+
+    @staticmethod
+    def pages_identical(base_doc: PDFDocument, compare_doc: PDFDocument, page_index: int,
+                        compare_index: Optional[int] = None) -> bool:
+        """Sprawdza odciski treści stron (skrót pikseli porównywany jest po wyrenderowaniu, w _compare_sources)."""
+        compare_index = page_index if compare_index is None else compare_index
+        base_digests, compare_digests = base_doc.content_digests, compare_doc.content_digests
+        return (page_index < len(base_digests) and compare_index < len(compare_digests)
+                and base_digests[page_index] == compare_digests[compare_index])
+
+    @staticmethod
+    def apply_sensitivity(result: ComparisonResult, sensitivity: int, testing_mode: bool = False) -> ComparisonResult:
+        """Ponownie progowuje zapamiętaną mapę różnic bez powtarzania porównania obrazów.
+
+        Zmienia się tylko lista obszarów - strona bazowa nie jest kopiowana ani przerysowywana.
+        """
+        if result.identical or result.alignment != PAGE_MATCHED:
+            result.sensitivity = sensitivity
+            return result
+        if result.difference_map is None or not result.is_valid():
+            raise ValueError("Comparison result has no difference map")
+
+        with profiling.span("rethreshold", page=result.page_index):
+            result.regions = PDFService.regions_from_stats(
+                diff_pipeline.threshold_regions(result.difference_map, sensitivity))
+        result.differences_count = len(result.regions)
+        result.sensitivity = sensitivity
+        if testing_mode:
+            PDFService._capture_test_artifacts(result)
+        return result
+
+    @staticmethod
+    def _page_source(document: PDFDocument, page_index: int, in_process: bool,
+                     target_size: Optional[Tuple[int, int]] = None):
+        """Źródło strony dla _compare_sources: funkcja wczytująca lub tablica.
+
+        W bieżącym procesie strona pobierana jest przez dokument (trafia do jego pamięci podręcznej),
+        a do procesu roboczego przekazywany jest page_loader zamiast wyrenderowanej strony. Strona
+        o innym rozmiarze niż bazowa (target_size) renderowana jest na siatce strony bazowej.
+        """
+        if (target_size is not None and document.page_loader is not None
+                and target_size != document.page_size(page_index)):
+            return functools.partial(document.page_loader, target_size=target_size)
+        if in_process:
+            return document.get_page
+        if document.page_loader is not None:
+            return document.page_loader
+        return document.get_page(page_index)
+
+    @staticmethod
+    def _compare_sources(base_source, compare_source, page_index: int, compare_index: int, sensitivity: int,
+                         difference_map: Optional[np.ndarray] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Wczytuje dopasowaną parę stron i porównuje je; zwraca None, gdy wyrenderowane strony są identyczne."""
+        base_page = base_source(page_index) if callable(base_source) else base_source
+        compare_page = compare_source(compare_index) if callable(compare_source) else compare_source
+        if difference_map is None and base_page.shape == compare_page.shape:
+            with profiling.span("raster_digest", page=page_index):
+                if page_fingerprint.raster_digest(base_page) == page_fingerprint.raster_digest(compare_page):
+                    return None
+        return PDFService._compare_images(base_page, compare_page, sensitivity, difference_map, page_index)
+
+    @staticmethod
+    def _compare_images(base_page: np.ndarray,
+                        compare_page: np.ndarray,
+                        sensitivity: int,
+                        difference_map: Optional[np.ndarray] = None,
+                        page_index: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """Wewnętrzna metoda do porównywania obrazów jednej pary stron.
+
+        Zwraca mapę różnic oraz statystyki obszarów (N x 5: x, y, w, h, piksele) w kolejności czytania.
+        Obrysy nie są nanoszone na stronę - rysuje je widok lub eksport.
+        """
+        try:
+            with profiling.span("compare_page", page=page_index):
+                if difference_map is None:
+                    difference_map = diff_pipeline.difference_map(base_page, compare_page)
+                stats = diff_pipeline.threshold_regions(difference_map, sensitivity)
+        except Exception as e:
+            raise ValueError(f"Image comparison failed: {e}")
+
+        return difference_map, stats
+
+    @staticmethod
+    def _capture_test_pages(result: ComparisonResult):
+        """Przekazuje do zapisu w tle porównane strony obu dokumentów (tryb testowy).
+
+        Wywoływane w procesie głównym - strony renderowane w procesach roboczych nie trafiają do
+        zapisu stamtąd, więc wszystkie artefakty uruchomienia lądują w jednym katalogu. Strony
+        pobierane są z dokumentów dopiero w wątku zapisującym.
+        """
+        compare_index = result.page_index if result.compare_page_index is None else result.compare_page_index
+        for document, page_index in ((result.base_document, result.page_index),
+                                     (result.compare_document, compare_index)):
+            debug_sink.capture("page.png", functools.partial(document.get_page, page_index), page=page_index,
+                               label=os.path.basename(document.file_path))
+
+    @staticmethod
+    def _capture_test_artifacts(result: ComparisonResult):
+        """Przekazuje pośrednie wyniki porównania strony do zapisu w tle (tryb testowy).
+
+        Maska progowania i obraz z obrysami wyliczane są dopiero w wątku zapisującym - na podstawie
+        mapy różnic i migawki obszarów z chwili wywołania (strona bazowa pobierana jest z dokumentu).
+        """
+        difference_map, sensitivity, page = result.difference_map, result.sensitivity, result.page_index
+        rects = [(region.x, region.y, region.width, region.height) for region in result.regions]
+        label = f"s{sensitivity}"
+        debug_sink.capture("difference_map.npz", difference_map, page=page, label=label)
+        debug_sink.capture("thresholded.png", lambda: diff_pipeline.threshold_mask(difference_map, sensitivity),
+                           page=page, label=label)
+        debug_sink.capture("result.png", lambda: diff_pipeline.draw_regions(result.base_page(), rects), page=page, label=label)
+
+    @staticmethod
+    def _run_parallel(func: Callable,
+                      args_list: Sequence[tuple],
+                      workers: int,
+                      timeout: float,
+                      operation: Optional[Operation] = None,
+                      stage: str = "") -> list:
+        """Wykonuje funkcję dla każdego zestawu argumentów we współdzielonej puli procesów, zachowując kolejność.
+
+        Najwyżej workers zadań wykonuje się naraz; przy workers <= 1 praca wykonywana jest w bieżącym
+        procesie (np. wewnątrz procesu roboczego trybu wsadowego). Każde zadanie ma twardy limit
+        czasu timeout - proces, który go przekroczy, jest zabijany (TimeoutError). Po anulowaniu
+        operation lub błędzie procesy wykonujące pozostałe zadania są zabijane i zastępowane.
+        """
+        total = len(args_list)
+        if operation:
+            operation.report(stage, 0, total)
+        if workers <= 1:
+            results = []
+            for args in args_list:
+                results.append(func(*args))
+                if operation:
+                    operation.report(stage, len(results), total)
+            return results
+
+        # Liczniki pamięci podręcznej rastrów (a przy włączonych pomiarach także spany zadań) zbierane
+        # są w procesach roboczych i wracają z wynikami.
+        traced = profiling.is_enabled()
+        func = Counted(func)
+        futures = get_worker_pool().map(
+            profiling.Traced(func) if traced else func,
+            list(args_list),
+            limit=workers,
+            timeout=timeout,
+            on_poll=(lambda done: operation.report(stage, done, total)) if operation else None
         )
+        if traced:
+            return [Counted.unwrap(profiling.Traced.unwrap(future.result())) for future in futures]
+        return [Counted.unwrap(future.result()) for future in futures]
 
     @staticmethod
     def cleanup_document(document: PDFDocument):
@@ -0,0 +1,159 @@
+import logging
+from typing import List, Tuple
+import cv2
+import fitz
+import numpy as np
+from models.pdf_document import ComparisonResult
+from services.pdf_service import PDFService
+from utils import diff_pipeline
+from config.settings import (DEFAULT_DPI, MAX_WORKERS, COMPARISON_TIMEOUT, RENDER_GRAYSCALE,
+                             PYRAMID_COARSE_DPI, PYRAMID_MARGIN)
+
+Rect = Tuple[int, int, int, int]
+
+
+class PyramidService:
+    """Porównanie dwuetapowe (od zgrubnego do dokładnego).
+
+    Etap zgrubny porównuje całe strony przy niskim DPI i wyznacza obszary kandydujące - każdą
+    niezerową różnicę, poszerzoną o margines. Etap dokładny renderuje ponownie (fitz clip) tylko te
+    obszary przy docelowym DPI i dopiero w nich wyznacza obszary różnic z zadaną czułością.
+    Koszt czasu i pamięci zależy więc od powierzchni zmian, a nie od powierzchni strony.
+    Strony porównywane są we wspólnym układzie współrzędnych (lewy górny róg), jak w BandService.
+    """
+
+    @staticmethod
+    def compare_page(base_path: str,
+                     compare_path: str,
+                     page_index: int,
+                     sensitivity: int,
+                     dpi: int,
+                     coarse_dpi: int = PYRAMID_COARSE_DPI,
+                     workers: int = MAX_WORKERS,
+                     grayscale: bool = RENDER_GRAYSCALE) -> List[Rect]:
+        """Zwraca prostokąty (x, y, w, h) różnic strony w pikselach przy zadanym DPI."""
+        candidates = PyramidService.find_candidates(base_path, compare_path, page_index, dpi,
+                                                    coarse_dpi, grayscale)
+        if not candidates:
+            return []
+
+        # Jedno zadanie na proces roboczy - dokumenty otwierane są raz na grupę obszarów.
+        chunks = [candidates[i::max(1, workers)] for i in range(min(max(1, workers), len(candidates)))]
+        chunk_results = PDFService._run_parallel(
+            PyramidService._diff_regions,
+            [(base_path, compare_path, page_index, dpi / 72, chunk, sensitivity, grayscale) for chunk in chunks],
+            workers,
+            COMPARISON_TIMEOUT
+        )
+        # Bliskie obszary z różnych obszarów kandydujących łączone są jak w porównaniu całych stron.
+        regions = diff_pipeline.merge_regions([region for chunk in chunk_results for region in chunk])
+        logging.debug(f"Page {page_index + 1}: {len(candidates)} candidate regions, {len(regions)} regions")
+        return regions
+
+    @staticmethod
+    def find_candidates(base_path: str,
+                        compare_path: str,
+                        page_index: int,
+                        dpi: int,
+                        coarse_dpi: int = PYRAMID_COARSE_DPI,
+                        grayscale: bool = RENDER_GRAYSCALE,
+                        margin: int = PYRAMID_MARGIN) -> List[Rect]:
+        """Etap zgrubny: zwraca rozłączne obszary kandydujące w pikselach przy docelowym DPI."""
+        coarse_zoom = coarse_dpi / 72
+        with fitz.open(base_path) as base_pdf, fitz.open(compare_path) as compare_pdf:
+            base_page = base_pdf.load_page(page_index)
+            width, height = PDFService.pixel_size(base_page.rect, coarse_zoom)
+            base_image = PDFService.render_region(base_page, coarse_zoom, 0, 0, width, height, grayscale)
+            compare_page = compare_pdf.load_page(page_index)
+            zoom_x, zoom_y = PDFService.grid_zoom(compare_page.rect, base_page.rect.width * coarse_zoom,
+                                                  base_page.rect.height * coarse_zoom, coarse_zoom)
+            compare_image = PDFService.render_region(compare_page, zoom_x, 0, 0, width, height, grayscale,
+                                                     zoom_y=zoom_y)
+            fine_width, fine_height = PDFService.pixel_size(base_page.rect, dpi / 72)
+
+        # Próg 0: po zmniejszeniu rozdzielczości drobna zmiana może dać tylko słabą różnicę.
+        mask = diff_pipeline.threshold_mask(diff_pipeline.difference_map(base_image, compare_image), 0)
+        if margin > 0:
+            mask = cv2.dilate(mask, np.ones((2 * margin + 1, 2 * margin + 1), dtype=np.uint8))
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+        scale = dpi / coarse_dpi
+        boxes = []
+        for x, y, w, h, _ in stats[1:count]:
+            boxes.append([max(0, int(x * scale)), max(0, int(y * scale)),
+                          min(fine_width, int(np.ceil((x + w) * scale))),
+                          min(fine_height, int(np.ceil((y + h) * scale)))])
+        return [(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in PyramidService._merge_overlapping(boxes)]
+
+    @staticmethod
+    def compare_documents(base_path: str,
+                          compare_path: str,
+                          sensitivity: int,
+                          dpi: int,
+                          coarse_dpi: int = PYRAMID_COARSE_DPI,
+                          workers: int = MAX_WORKERS,
+                          grayscale: bool = RENDER_GRAYSCALE,
+                          display_dpi: int = DEFAULT_DPI) -> List[ComparisonResult]:
+        """Porównuje dokumenty dwuetapowo przy wysokim DPI.
+
+        Obraz wynikowy każdej strony renderowany jest przy display_dpi, a znalezione obszary
+        są na niego przeskalowywane.
+        """
+        with fitz.open(base_path) as base_pdf, fitz.open(compare_path) as compare_pdf:
+            base_count, compare_count = base_pdf.page_count, compare_pdf.page_count
+        if base_count != compare_count:
+            logging.warning(f"Page count differs ({base_count} vs {compare_count}), "
+                            f"pages past {min(base_count, compare_count)} are reported as inserted or deleted")
+
+        results = []
+        for page_index in range(min(base_count, compare_count)):
+            regions = PyramidService.compare_page(base_path, compare_path, page_index, sensitivity,
+                                                  dpi, coarse_dpi, workers, grayscale)
+            results.append(PDFService.region_result(base_path, compare_path, page_index, regions,
+                                                    sensitivity, dpi, display_dpi, grayscale))
+        results.extend(PDFService.extra_page_results(base_path, compare_path, base_count, compare_count,
+                                                     sensitivity, display_dpi, grayscale))
+        return results
+
+    @staticmethod
+    def _diff_regions(base_path: str,
+                      compare_path: str,
+                      page_index: int,
+                      zoom: float,
+                      candidates: List[Rect],
+                      sensitivity: int,
+                      grayscale: bool) -> List[Rect]:
+        """Etap dokładny dla grupy obszarów (wywoływane w procesie roboczym)."""
+        regions = []
+        with fitz.open(base_path) as base_pdf, fitz.open(compare_path) as compare_pdf:
+            base_page = base_pdf.load_page(page_index)
+            compare_page = compare_pdf.load_page(page_index)
+            zoom_x, zoom_y = PDFService.grid_zoom(compare_page.rect, base_page.rect.width * zoom,
+                                                  base_page.rect.height * zoom, zoom)
+            for x, y, w, h in candidates:
+                base_region = PDFService.render_region(base_page, zoom, x, y, x + w, y + h, grayscale)
+                compare_region = PDFService.render_region(compare_page, zoom_x, x, y, x + w, y + h, grayscale,
+                                                          zoom_y=zoom_y)
+                mask = diff_pipeline.threshold_mask(
+                    diff_pipeline.difference_map(base_region, compare_region), sensitivity)
+                regions.extend((rx + x, ry + y, rw, rh) for rx, ry, rw, rh in diff_pipeline.find_regions(mask))
+        return regions
+
+    @staticmethod
+    def _merge_overlapping(boxes: List[List[int]]) -> List[List[int]]:
+        """Łączy nachodzące na siebie prostokąty (x0, y0, x1, y1), aby żaden piksel nie był renderowany dwa razy."""
+        merged = True
+        while merged:
+            merged = False
+            result = []
+            for box in boxes:
+                for other in result:
+                    if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                        other[0], other[1] = min(other[0], box[0]), min(other[1], box[1])
+                        other[2], other[3] = max(other[2], box[2]), max(other[3], box[3])
+                        merged = True
+                        break
+                else:
+                    result.append(box)
+            boxes = result
+        return boxes
@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+import weakref
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from config.settings import RASTER_CACHE_DIR, RASTER_CACHE_MAX_BYTES
+
+CACHE_FILE_SUFFIX = ".npy"
+
+# Pamięci podręczne procesu głównego (token -> obiekt) i zmiany liczników ich kopii w procesie
+# roboczym (token -> [trafienia, chybienia, zmiana rozmiaru]) - patrz Counted.
+_instances: "weakref.WeakValueDictionary[str, RasterCache]" = weakref.WeakValueDictionary()
+_worker_activity: Dict[str, List[int]] = {}
+
+
+class RasterCache:
+    """Trwała pamięć podręczna wyrenderowanych stron na dysku.
+
+    Kluczem jest skrót zawartości pliku, indeks strony, DPI i przestrzeń barw, więc ten sam plik
+    pod inną ścieżką trafia w ten sam wpis. Strony zapisywane są jako surowe pliki .npy,
+    które wczytywane są z powrotem przez mapowanie pamięci. Po przekroczeniu limitu rozmiaru
+    usuwane są najdawniej używane wpisy (czas modyfikacji pliku jest odświeżany przy trafieniu).
+
+    Obiekt przekazany do procesu roboczego (np. w page_loader dokumentu) jest kopią - jej liczniki
+    wracają do oryginału w procesie głównym razem z wynikiem zadania opakowanego w Counted.
+    """
+
+    def __init__(self, directory: str = RASTER_CACHE_DIR, max_bytes: int = RASTER_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._entries())
+        self._token = uuid.uuid4().hex
+        self._worker_copy = False
+        _instances[self._token] = self
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._worker_copy = True
+
+    def _count(self, hits: int = 0, misses: int = 0, size: int = 0):
+        self.hits += hits
+        self.misses += misses
+        self._size += size
+        if self._worker_copy:
+            activity = _worker_activity.setdefault(self._token, [0, 0, 0])
+            activity[0] += hits
+            activity[1] += misses
+            activity[2] += size
+
+    @staticmethod
+    def file_digest(file_path: str) -> str:
+        """Zwraca skrót SHA-256 zawartości pliku."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _path(self, digest: str, page_index: int, dpi: int, colorspace: str) -> str:
+        return os.path.join(self.directory, f"{digest}_{page_index}_{dpi}_{colorspace}{CACHE_FILE_SUFFIX}")
+
+    def _entries(self) -> list:
+        return [entry.path for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(CACHE_FILE_SUFFIX)]
+
+    def get(self, digest: str, page_index: int, dpi: int, colorspace: str = "rgb") -> Optional[np.ndarray]:
+        """Zwraca zmapowaną w pamięci tablicę strony (tylko do odczytu) lub None."""
+        path = self._path(digest, page_index, dpi, colorspace)
+        try:
+            array = np.load(path, mmap_mode="r")
+            os.utime(path)
+        except (OSError, ValueError):
+            # Brak wpisu, wpis usunięty równolegle przez inny proces lub uszkodzony plik.
+            self._count(misses=1)
+            return None
+        self._count(hits=1)
+        return array
+
+    def put(self, digest: str, page_index: int, dpi: int, colorspace: str, array: np.ndarray):
+        """Zapisuje stronę w pamięci podręcznej i w razie potrzeby usuwa najstarsze wpisy."""
+        path = self._path(digest, page_index, dpi, colorspace)
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(array), allow_pickle=False)
+            # Zapis atomowy - równoległe procesy nigdy nie zobaczą niepełnego pliku.
+            os.replace(tmp_path, path)
+            self._count(size=os.path.getsize(path))
+        except OSError as e:
+            logging.warning(f"Failed to store page in raster cache: {e}")
+            # Niepełny plik tymczasowy (np. przy braku miejsca) nie podlega limitowi rozmiaru - usuwany od razu.
+            if tmp_path is not None and os.path.exists(tmp_path):
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            return
+
+        if self._size > self.max_bytes:
+            # _evict() przelicza rozmiar z dysku - zmiana trafia też do liczników kopii w procesie roboczym.
+            size = self._size
+            self._evict()
+            size, self._size = self._size - size, size
+            self._count(size=size)
+
+    def _evict(self):
+        """Usuwa najdawniej używane wpisy, aż rozmiar spadnie poniżej limitu."""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+
+    def clear(self):
+        """Usuwa wszystkie wpisy i zeruje liczniki."""
+        for path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        """Zwraca liczniki trafień i chybień oraz bieżący rozmiar."""
+        return {"hits": self.hits, "misses": self.misses, "size_bytes": self._size, "max_bytes": self.max_bytes}
+
+
+class Counted:
+    """Opakowanie zadania dla procesu roboczego: zwraca (wynik, zmiany liczników kopii RasterCache)."""
+
+    def __init__(self, func: Callable):
+        self.func = func
+
+    def __call__(self, *args):
+        _worker_activity.clear()
+        try:
+            result = self.func(*args)
+            return result, dict(_worker_activity)
+        finally:
+            _worker_activity.clear()
+
+    @staticmethod
+    def unwrap(outcome) -> object:
+        """Dodaje zmiany liczników do pamięci podręcznych procesu głównego i zwraca właściwy wynik zadania."""
+        result, activity = outcome
+        for token, (hits, misses, size) in activity.items():
+            cache = _instances.get(token)
+            if cache is not None:
+                cache._count(hits, misses, size)
+        return result
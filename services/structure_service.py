@@ -0,0 +1,168 @@
+import difflib
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import fitz
+from models.pdf_document import (PDFDocument, ComparisonResult, DifferenceRegion,
+                                 REGION_INSERTED, REGION_DELETED, REGION_MOVED)
+from services.pdf_service import PDFService
+from utils import result_store
+from config.settings import DEFAULT_DPI, STRUCTURE_MOVE_TOLERANCE
+
+# Element strony: (klucz porównania, prostokąt w punktach, opis)
+Item = Tuple[tuple, "fitz.Rect", str]
+
+PATH_LABELS = {"s": "stroke", "f": "fill", "fs": "fill+stroke"}
+
+
+class StructureService:
+    """Porównanie strukturalne stron: słowa tekstu i ścieżki wektorowe, bez rasteryzacji.
+
+    Słowa (page.get_text("words")) dopasowywane są w kolejności czytania algorytmem difflib,
+    a ścieżki (page.get_drawings()) po kształcie i stylu. Elementy bez odpowiednika są raportowane
+    jako wstawione lub usunięte, a elementy o tej samej treści w innym miejscu - jako przesunięte.
+    """
+
+    @staticmethod
+    def compare_documents(base_path: str,
+                          compare_path: str,
+                          dpi: int = DEFAULT_DPI,
+                          render: bool = True,
+                          tolerance: float = STRUCTURE_MOVE_TOLERANCE) -> List[ComparisonResult]:
+        """Porównuje dokumenty strona po stronie.
+
+        Obszary zwracane są w pikselach przy zadanym DPI. Jeśli render=False, strony nie są
+        rasteryzowane wcale (wynik zawiera tylko listę obszarów, bez obrazów).
+        """
+        base_document = PDFDocument(file_path=base_path)
+        compare_document = PDFDocument(file_path=compare_path)
+        zoom = dpi / 72
+        results = []
+
+        with fitz.open(base_path) as base_pdf, fitz.open(compare_path) as compare_pdf:
+            for page_index in range(max(base_pdf.page_count, compare_pdf.page_count)):
+                base_page = base_pdf.load_page(page_index) if page_index < base_pdf.page_count else None
+                compare_page = compare_pdf.load_page(page_index) if page_index < compare_pdf.page_count else None
+
+                regions = StructureService.compare_pages(base_page, compare_page, tolerance)
+                for region in regions:
+                    region.x, region.y = int(region.x * zoom), int(region.y * zoom)
+                    region.width, region.height = max(1, round(region.width * zoom)), max(1, round(region.height * zoom))
+
+                result = ComparisonResult(
+                    base_document=base_document,
+                    compare_document=compare_document,
+                    differences_count=len(regions),
+                    page_index=page_index,
+                    regions=regions
+                )
+                if render:
+                    StructureService._render_result(result, base_page or compare_page, zoom)
+                results.append(result)
+
+        logging.debug(f"Structural comparison: {sum(r.differences_count for r in results)} regions "
+                      f"on {len(results)} pages")
+        return results
+
+    @staticmethod
+    def compare_pages(base_page: Optional["fitz.Page"],
+                      compare_page: Optional["fitz.Page"],
+                      tolerance: float = STRUCTURE_MOVE_TOLERANCE) -> List[DifferenceRegion]:
+        """Zwraca obszary różnic pary stron (w punktach PDF)."""
+        base_words = StructureService.extract_words(base_page) if base_page else []
+        compare_words = StructureService.extract_words(compare_page) if compare_page else []
+        base_paths = StructureService.extract_paths(base_page) if base_page else []
+        compare_paths = StructureService.extract_paths(compare_page) if compare_page else []
+
+        return (StructureService._diff_sequences(base_words, compare_words, tolerance)
+                + StructureService._diff_sets(base_paths, compare_paths, tolerance))
+
+    @staticmethod
+    def extract_words(page: "fitz.Page") -> List[Item]:
+        """Słowa strony w kolejności czytania; kluczem jest sam tekst."""
+        words = page.get_text("words", sort=True)
+        return [((word[4],), fitz.Rect(word[:4]), word[4]) for word in words]
+
+    @staticmethod
+    def extract_paths(page: "fitz.Page") -> List[Item]:
+        """Ścieżki wektorowe strony; kluczem jest kształt (względem własnego prostokąta) i styl."""
+        items = []
+        for drawing in page.get_drawings():
+            rect = fitz.Rect(drawing["rect"])
+            shape = []
+            for operation in drawing["items"]:
+                points = []
+                for value in operation[1:]:
+                    if isinstance(value, fitz.Point):
+                        points.append((round(value.x - rect.x0, 1), round(value.y - rect.y0, 1)))
+                    elif isinstance(value, (fitz.Rect, fitz.Quad)):
+                        value = fitz.Rect(value.rect if isinstance(value, fitz.Quad) else value)
+                        points.append((round(value.x0 - rect.x0, 1), round(value.y0 - rect.y0, 1),
+                                       round(value.width, 1), round(value.height, 1)))
+                shape.append((operation[0], tuple(points)))
+            key = (tuple(shape), drawing.get("color"), drawing.get("fill"), drawing.get("width"))
+            items.append((key, rect, PATH_LABELS.get(drawing.get("type"), "path")))
+        return items
+
+    @staticmethod
+    def _diff_sequences(base_items: List[Item], compare_items: List[Item], tolerance: float) -> List[DifferenceRegion]:
+        """Dopasowuje elementy w kolejności (tekst) i klasyfikuje niedopasowane."""
+        matcher = difflib.SequenceMatcher(None,
+                                          [item[0] for item in base_items],
+                                          [item[0] for item in compare_items],
+                                          autojunk=False)
+        regions = []
+        deleted, inserted = [], []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                for base_item, compare_item in zip(base_items[i1:i2], compare_items[j1:j2]):
+                    # Przesunięcie w poziomie w tej samej linii to zwykle przepływ tekstu po edycji
+                    # sąsiedniego słowa (zgłoszonej osobno), a nie przeniesienie.
+                    same_line = abs(base_item[1].y0 - compare_item[1].y0) <= tolerance
+                    if not same_line:
+                        regions.append(StructureService._region(compare_item, REGION_MOVED))
+            else:
+                deleted.extend(base_items[i1:i2])
+                inserted.extend(compare_items[j1:j2])
+
+        # Słowa usunięte w jednym miejscu i wstawione w innym traktujemy jako przesunięte.
+        return regions + StructureService._diff_sets(deleted, inserted, tolerance)
+
+    @staticmethod
+    def _diff_sets(base_items: List[Item], compare_items: List[Item], tolerance: float) -> List[DifferenceRegion]:
+        """Dopasowuje elementy o tym samym kluczu niezależnie od kolejności, preferując najbliższe położenie."""
+        remaining: Dict[tuple, List[Item]] = defaultdict(list)
+        for item in compare_items:
+            remaining[item[0]].append(item)
+
+        regions = []
+        for base_item in base_items:
+            candidates = remaining.get(base_item[0])
+            if not candidates:
+                regions.append(StructureService._region(base_item, REGION_DELETED))
+                continue
+            nearest = min(range(len(candidates)),
+                          key=lambda i: abs(candidates[i][1].x0 - base_item[1].x0)
+                          + abs(candidates[i][1].y0 - base_item[1].y0))
+            compare_item = candidates.pop(nearest)
+            if not StructureService._same_position(base_item[1], compare_item[1], tolerance):
+                regions.append(StructureService._region(compare_item, REGION_MOVED))
+
+        for candidates in remaining.values():
+            regions.extend(StructureService._region(item, REGION_INSERTED) for item in candidates)
+        return regions
+
+    @staticmethod
+    def _same_position(first: "fitz.Rect", second: "fitz.Rect", tolerance: float) -> bool:
+        return abs(first.x0 - second.x0) <= tolerance and abs(first.y0 - second.y0) <= tolerance
+
+    @staticmethod
+    def _region(item: Item, kind: str) -> DifferenceRegion:
+        rect = item[1]
+        return DifferenceRegion(rect.x0, rect.y0, rect.width, rect.height, kind=kind, label=item[2])
+
+    @staticmethod
+    def _render_result(result: ComparisonResult, page: "fitz.Page", zoom: float):
+        """Renderuje stronę bazową; obszary rysowane są nad nią w kolorach zależnych od rodzaju zmiany."""
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        result.original_image = result_store.get_store().put(PDFService.pixmap_to_array(pix))
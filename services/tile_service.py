@@ -0,0 +1,63 @@
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Tuple
+import fitz
+import numpy as np
+from services.pdf_service import PDFService
+from config.settings import DEFAULT_DPI, TILE_SIZE
+
+# Dokumenty otwarte w procesie roboczym (klucz: ścieżka i czas modyfikacji pliku)
+_MAX_OPEN_DOCUMENTS = 4
+_documents: "OrderedDict[tuple, fitz.Document]" = OrderedDict()
+
+
+@dataclass(frozen=True)
+class TileSource:
+    """Źródło kafelków: strona PDF renderowana z wektorów.
+
+    dpi to rozdzielczość obrazu bazowego wyświetlanego w widoku - jeden piksel sceny. Obszary
+    różnic nie są częścią kafelków (rysuje je warstwa nakładki widoku), więc kafelki strony
+    pozostają ważne po zmianie czułości.
+    """
+    file_path: str
+    page_index: int
+    dpi: int = DEFAULT_DPI
+    grayscale: bool = False
+
+
+class TileService:
+    """Renderowanie kafelków strony przy powiększeniu będącym wielokrotnością obrazu bazowego.
+
+    Poziom (level) 2 oznacza kafelki renderowane przy dwukrotności DPI obrazu bazowego itd.
+    Kafelki leżą na siatce TILE_SIZE x TILE_SIZE pikseli danego poziomu.
+    """
+
+    @staticmethod
+    def grid_size(width: float, height: float, level: int, tile_size: int = TILE_SIZE) -> Tuple[int, int]:
+        """Liczba kolumn i wierszy kafelków dla obrazu bazowego width x height."""
+        return (max(1, int(np.ceil(width * level / tile_size))),
+                max(1, int(np.ceil(height * level / tile_size))))
+
+    @staticmethod
+    def render_tile(source: TileSource, level: int, column: int, row: int, tile_size: int = TILE_SIZE) -> np.ndarray:
+        """Renderuje jeden kafelek z wektorów strony (wywoływane w procesie roboczym)."""
+        page = TileService._open(source.file_path).load_page(source.page_index)
+        zoom = source.dpi * level / 72
+        width, height = PDFService.pixel_size(page.rect, zoom)
+        x0, y0 = column * tile_size, row * tile_size
+        x1, y1 = min(x0 + tile_size, width), min(y0 + tile_size, height)
+        return PDFService.render_region(page, zoom, x0, y0, max(x1, x0 + 1), max(y1, y0 + 1), source.grayscale)
+
+    @staticmethod
+    def _open(file_path: str) -> "fitz.Document":
+        """Zwraca otwarty dokument, ponownie używając go dla kolejnych kafelków tej samej strony."""
+        key = (file_path, os.path.getmtime(file_path))
+        document = _documents.get(key)
+        if document is None:
+            document = fitz.open(file_path)
+            _documents[key] = document
+            while len(_documents) > _MAX_OPEN_DOCUMENTS:
+                _documents.popitem(last=False)[1].close()
+        _documents.move_to_end(key)
+        return document
@@ -0,0 +1,325 @@
+"""Trwała pula procesów roboczych z twardym limitem czasu i pamięci dla pojedynczego zadania.
+
+W odróżnieniu od concurrent.futures.ProcessPoolExecutor procesy są uruchamiane raz i używane
+ponownie przez kolejne wywołania (ładowanie, porównanie, kafelki widoku), a nadzorca może zabić
+konkretny proces: gdy zadanie przekroczy swój limit czasu, gdy proces przekroczy limit pamięci RSS
+lub gdy zadanie zostanie anulowane. Zabity proces jest od razu zastępowany nowym, a pozostałe
+zadania wykonują się dalej.
+"""
+import atexit
+import concurrent.futures
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import wait as wait_connections
+from typing import Callable, Dict, Iterable, List, Optional
+from config.settings import MAX_WORKERS, WORKER_MAX_RSS, OPERATION_POLL_INTERVAL
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_task_ids = itertools.count()
+_in_worker = False
+
+
+class WorkerLimitExceeded(MemoryError):
+    """Proces roboczy przekroczył limit pamięci RSS i został zatrzymany."""
+
+
+class WorkerCrashed(RuntimeError):
+    """Proces roboczy zakończył się nieoczekiwanie podczas wykonywania zadania (np. błąd MuPDF)."""
+
+
+def _worker_main(connection):
+    """Pętla procesu roboczego: odbiera zadania (id, funkcja, argumenty) i odsyła wyniki."""
+    global _in_worker
+    _in_worker = True
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        task_id, func, args = message
+        try:
+            result = (task_id, True, func(*args))
+        except BaseException as e:
+            result = (task_id, False, e)
+        try:
+            connection.send(result)
+        except Exception as e:
+            # Wyjątek lub wynik, którego nie da się zserializować.
+            connection.send((task_id, False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class _Task:
+    def __init__(self, func: Callable, args: tuple, timeout: Optional[float]):
+        self.id = next(_task_ids)
+        self.func = func
+        self.args = args
+        self.timeout = timeout
+        self.future = concurrent.futures.Future()
+        self.started = 0.0
+
+
+class _Worker:
+    def __init__(self, context):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_connection,), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.task: Optional[_Task] = None
+
+    def rss(self) -> Optional[int]:
+        """Zajętość pamięci RSS procesu w bajtach (Linux, /proc) lub None, gdy niedostępna."""
+        try:
+            with open(f"/proc/{self.process.pid}/statm") as statm:
+                return int(statm.read().split()[1]) * _PAGE_SIZE
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(1)
+        finally:
+            self.connection.close()
+
+
+class WorkerPool:
+    """Pula stale działających procesów roboczych nadzorowana przez wątek w procesie głównym.
+
+    Zadania zgłaszane są przez submit() i zwracają concurrent.futures.Future. Dla każdego zadania
+    można podać limit czasu (liczony od rozpoczęcia wykonywania); po jego przekroczeniu Future
+    kończy się TimeoutError, a proces jest zabijany i zastępowany. Tak samo traktowany jest proces,
+    którego RSS przekroczy max_rss (WorkerLimitExceeded), oraz proces zakończony nieoczekiwanie
+    (WorkerCrashed).
+    """
+
+    def __init__(self, workers: int = MAX_WORKERS, max_rss: Optional[int] = WORKER_MAX_RSS):
+        self.workers = max(1, workers)
+        self.max_rss = max_rss
+        # spawn: proces główny ma działające wątki (Qt, nadzorca), których fork nie skopiowałby poprawnie.
+        self._context = multiprocessing.get_context("spawn")
+        self._queue: "queue.Queue[_Task]" = queue.Queue()
+        self._cancelled: "queue.Queue[concurrent.futures.Future]" = queue.Queue()
+        self._wakeup_reader, self._wakeup_writer = multiprocessing.Pipe(duplex=False)
+        self._pool: List[_Worker] = [_Worker(self._context) for _ in range(self.workers)]
+        self._closed = False
+        self._supervisor = threading.Thread(target=self._supervise, name="WorkerPool", daemon=True)
+        self._supervisor.start()
+
+    def submit(self, func: Callable, *args, timeout: Optional[float] = None) -> concurrent.futures.Future:
+        """Zleca wykonanie func(*args) w procesie roboczym."""
+        if self._closed:
+            raise RuntimeError("Worker pool is shut down")
+        task = _Task(func, args, timeout)
+        self._queue.put(task)
+        self._wake()
+        return task.future
+
+    def cancel(self, futures: Iterable[concurrent.futures.Future]):
+        """Anuluje zadania: oczekujące nie zostaną uruchomione, a procesy wykonujące pozostałe są zabijane."""
+        for future in futures:
+            if not future.cancel() and not future.done():
+                self._cancelled.put(future)
+        self._wake()
+
+    def map(self,
+            func: Callable,
+            args_list: List[tuple],
+            limit: Optional[int] = None,
+            timeout: Optional[float] = None,
+            fail_fast: bool = True,
+            on_done: Optional[Callable[[int, concurrent.futures.Future], None]] = None,
+            on_poll: Optional[Callable[[int], None]] = None) -> List[concurrent.futures.Future]:
+        """Wykonuje func dla każdego zestawu argumentów, najwyżej limit zadań naraz; zwraca zakończone Future.
+
+        on_done(indeks, future) wywoływane jest po zakończeniu każdego zadania, a on_poll(liczba
+        zakończonych) - cyklicznie, także gdy nic się nie zakończyło (np. do sprawdzania anulowania).
+        Jeśli fail_fast, pierwszy błąd zadania jest zgłaszany od razu. Wyjątek zgłoszony przez
+        callback lub błąd anuluje pozostałe zadania.
+        """
+        limit = max(1, limit or self.workers)
+        futures: List[Optional[concurrent.futures.Future]] = [None] * len(args_list)
+        indexes: Dict[concurrent.futures.Future, int] = {}
+        pending = set()
+        submitted = completed = 0
+        finished = False
+        try:
+            while submitted < len(args_list) or pending:
+                while submitted < len(args_list) and len(pending) < limit:
+                    future = self.submit(func, *args_list[submitted], timeout=timeout)
+                    futures[submitted] = future
+                    indexes[future] = submitted
+                    pending.add(future)
+                    submitted += 1
+                done, pending = concurrent.futures.wait(pending, timeout=OPERATION_POLL_INTERVAL,
+                                                        return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    completed += 1
+                    if fail_fast:
+                        future.result()
+                    if on_done:
+                        on_done(indexes[future], future)
+                if on_poll:
+                    on_poll(completed)
+            finished = True
+            return futures
+        finally:
+            if not finished:
+                self.cancel(future for future in futures if future is not None)
+
+    def shutdown(self):
+        """Kończy pracę nadzorcy i procesów roboczych."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake()
+        self._supervisor.join(5)
+
+    def _wake(self):
+        try:
+            self._wakeup_writer.send_bytes(b"")
+        except OSError:
+            pass
+
+    def _supervise(self):
+        backlog: List[_Task] = []
+        while not self._closed:
+            try:
+                self._drain_wakeups()
+                self._collect_new_tasks(backlog)
+                self._kill_cancelled()
+                self._dispatch(backlog)
+                busy = [worker for worker in self._pool if worker.task is not None]
+                ready = wait_connections([worker.connection for worker in busy] + [self._wakeup_reader],
+                                         timeout=OPERATION_POLL_INTERVAL)
+                for worker in busy:
+                    if worker.connection in ready:
+                        self._receive(worker)
+                self._enforce_limits()
+            except Exception as e:
+                logging.error(f"Worker pool supervisor error: {e}")
+
+        for task in backlog:
+            task.future.cancel()
+        for worker in self._pool:
+            if worker.task is not None:
+                worker.task.future.set_exception(RuntimeError("Worker pool is shut down"))
+            try:
+                worker.connection.send(None)
+            except OSError:
+                pass
+        for worker in self._pool:
+            worker.process.join(1)
+            if worker.process.is_alive():
+                worker.kill()
+
+    def _drain_wakeups(self):
+        while self._wakeup_reader.poll():
+            self._wakeup_reader.recv_bytes()
+
+    def _collect_new_tasks(self, backlog: List[_Task]):
+        while True:
+            try:
+                backlog.append(self._queue.get_nowait())
+            except queue.Empty:
+                return
+
+    def _dispatch(self, backlog: List[_Task]):
+        for worker in self._pool:
+            if worker.task is not None:
+                continue
+            while backlog:
+                task = backlog.pop(0)
+                # Zadanie anulowane przed uruchomieniem jest pomijane.
+                if task.future.set_running_or_notify_cancel():
+                    break
+            else:
+                return
+            task.started = time.monotonic()
+            worker.task = task
+            try:
+                worker.connection.send((task.id, task.func, task.args))
+            except Exception as e:
+                worker.task = None
+                task.future.set_exception(e)
+
+    def _receive(self, worker: _Worker):
+        try:
+            task_id, ok, value = worker.connection.recv()
+        except (EOFError, OSError):
+            self._replace(worker, WorkerCrashed("Worker process exited unexpectedly"))
+            return
+        task, worker.task = worker.task, None
+        if task is None or task.id != task_id:
+            return
+        if ok:
+            task.future.set_result(value)
+        else:
+            task.future.set_exception(value)
+
+    def _kill_cancelled(self):
+        cancelled = set()
+        while True:
+            try:
+                cancelled.add(self._cancelled.get_nowait())
+            except queue.Empty:
+                break
+        for worker in self._pool:
+            if worker.task is not None and worker.task.future in cancelled:
+                logging.debug(f"Killing worker {worker.process.pid} running a cancelled task")
+                self._replace(worker, concurrent.futures.CancelledError())
+
+    def _enforce_limits(self):
+        now = time.monotonic()
+        for worker in self._pool:
+            task = worker.task
+            if task is None:
+                if not worker.process.is_alive():
+                    self._replace(worker, None)
+                continue
+            if not worker.process.is_alive():
+                self._replace(worker, WorkerCrashed(f"Worker process exited with code {worker.process.exitcode}"))
+            elif task.timeout is not None and now - task.started > task.timeout:
+                logging.error(f"Task {task.func.__qualname__} exceeded {task.timeout} s, killing worker")
+                self._replace(worker, concurrent.futures.TimeoutError(f"Task exceeded {task.timeout} seconds"))
+            elif self.max_rss:
+                rss = worker.rss()
+                if rss is not None and rss > self.max_rss:
+                    logging.error(f"Worker {worker.process.pid} exceeded RSS limit "
+                                  f"({rss // 2 ** 20} MB > {self.max_rss // 2 ** 20} MB), killing worker")
+                    self._replace(worker, WorkerLimitExceeded(f"Worker exceeded the memory limit of "
+                                                              f"{self.max_rss // 2 ** 20} MB"))
+
+    def _replace(self, worker: _Worker, error: Optional[BaseException]):
+        """Zabija proces roboczy, kończy jego zadanie błędem i uruchamia w jego miejsce nowy."""
+        task, worker.task = worker.task, None
+        worker.kill()
+        if task is not None and not task.future.done():
+            # Future w stanie RUNNING nie może przejść w CANCELLED - anulowane kończy się CancelledError.
+            task.future.set_exception(error)
+        self._pool[self._pool.index(worker)] = _Worker(self._context)
+
+
+_shared_pool: Optional[WorkerPool] = None
+_shared_lock = threading.Lock()
+
+
+def in_worker_process() -> bool:
+    """Sprawdza, czy kod wykonuje się w procesie roboczym puli (zadanie nie powinno zlecać kolejnych)."""
+    return _in_worker
+
+
+def get_worker_pool() -> WorkerPool:
+    """Zwraca współdzieloną pulę procesów (tworzoną przy pierwszym użyciu i zamykaną przy wyjściu)."""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = WorkerPool()
+            atexit.register(_shared_pool.shutdown)
+        return _shared_pool
@@ -0,0 +1,69 @@
+"""Testy interfejsu wiersza poleceń (comparepdf.py) na małych dokumentach tworzonych w teście.
+
+Uruchomienie z katalogu głównego repozytorium:
+    python -m pytest tests
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import fitz
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _write_pdf(path: str, page_count: int):
+    with fitz.open() as pdf:
+        for number in range(1, page_count + 1):
+            page = pdf.new_page(width=595, height=842)
+            page.insert_text((72, 100), f"Page {number}", fontsize=24)
+        pdf.save(path)
+
+
+class UnequalPageCountTest(unittest.TestCase):
+    """Strony ponad liczbę stron krótszego dokumentu są wstawione lub usunięte we wszystkich trybach."""
+
+    MODES = {"default": [], "band": ["--band-height", "256"], "pyramid": ["--coarse-dpi", "36"]}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.short_pdf = os.path.join(cls.directory.name, "short.pdf")
+        cls.long_pdf = os.path.join(cls.directory.name, "long.pdf")
+        _write_pdf(cls.short_pdf, 3)
+        _write_pdf(cls.long_pdf, 4)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def _run(self, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run([sys.executable, os.path.join(REPOSITORY, "comparepdf.py"), *args, "-j", "1",
+                               "--dpi", "72"],
+                              cwd=self.directory.name, capture_output=True, text=True, timeout=120)
+
+    def test_appended_page_is_inserted(self):
+        for mode, options in self.MODES.items():
+            with self.subTest(mode=mode):
+                result = self._run(self.short_pdf, self.long_pdf, *options)
+                self.assertEqual(result.returncode, 1, result.stderr)
+                self.assertIn("page 4 inserted", result.stdout)
+
+    def test_removed_page_is_deleted(self):
+        for mode, options in self.MODES.items():
+            with self.subTest(mode=mode):
+                result = self._run(self.long_pdf, self.short_pdf, *options)
+                self.assertEqual(result.returncode, 1, result.stderr)
+                self.assertIn("page 4 deleted", result.stdout)
+
+    def test_identical_documents(self):
+        for mode, options in self.MODES.items():
+            with self.subTest(mode=mode):
+                result = self._run(self.short_pdf, self.short_pdf, *options)
+                self.assertEqual(result.returncode, 0, result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Testy dopasowania stron (utils.page_alignment).
+
+Uruchomienie z katalogu głównego repozytorium:
+    python -m pytest tests
+"""
+import itertools
+import random
+import unittest
+
+from utils import page_alignment
+
+
+def _check_alignment(pairs, n, m):
+    """Każda strona obu luk występuje dokładnie raz, a pary zachowują kolejność dokumentów."""
+    assert sorted(i for i, _ in pairs if i is not None) == list(range(n))
+    assert sorted(j for _, j in pairs if j is not None) == list(range(m))
+    matched = [(i, j) for i, j in pairs if i is not None and j is not None]
+    assert matched == sorted(matched) and [j for _, j in matched] == sorted(j for _, j in matched)
+
+
+class AlignGapTest(unittest.TestCase):
+
+    def test_band_zero_with_unmatched_page(self):
+        # Regresja: przy band=0 i równych długościach luk strona bez pary wychodziła poza pas (IndexError).
+        for size in range(1, 7):
+            for unmatched in range(size):
+                with self.subTest(size=size, unmatched=unmatched):
+                    def similarity(i, j):
+                        return 1.0 if i == j and i != unmatched else 0.0
+                    pairs = page_alignment.align_gap(range(size), range(size), similarity, threshold=0.5, band=0)
+                    _check_alignment(pairs, size, size)
+                    self.assertIn((unmatched, None), pairs)
+                    self.assertIn((None, unmatched), pairs)
+
+    def test_random_gaps_for_small_bands(self):
+        generator = random.Random(0)
+        for n, m, band in itertools.product(range(7), range(7), range(3)):
+            table = {(i, j): generator.random() for i in range(n) for j in range(m)}
+            with self.subTest(n=n, m=m, band=band):
+                pairs = page_alignment.align_gap(range(n), range(m), lambda i, j: table[(i, j)],
+                                                 threshold=0.5, band=band)
+                _check_alignment(pairs, n, m)
+
+
+class MovedPagesTest(unittest.TestCase):
+
+    def test_swapped_look_alike_pages_are_moved(self):
+        # Strony 3 i 8 zamienione miejscami; pozostałe strony z tego samego szablonu są do nich podobne.
+        base = [f"page{n}" for n in range(10)]
+        compare = base[:]
+        compare[2], compare[7] = compare[7], compare[2]
+        anchors = page_alignment.match_anchors(base, compare)
+        moved = page_alignment.match_moved(base, compare, anchors)
+        self.assertEqual(sorted(moved), [(2, 7), (7, 2)])
+
+        pairs = page_alignment.align(len(base), len(compare), anchors, lambda i, j: 0.9, moved=moved)
+        _check_alignment(pairs, len(base), len(compare))
+        for base_index, compare_index in moved:
+            self.assertIn((base_index, None), pairs)
+            self.assertIn((None, compare_index), pairs)
+
+    def test_repeated_pages_are_not_moved(self):
+        base = ["blank", "a", "blank", "b"]
+        compare = ["blank", "b", "blank", "a"]
+        anchors = page_alignment.match_anchors(base, compare)
+        moved = page_alignment.match_moved(base, compare, anchors)
+        # Jedna z par a/b jest kotwicą, druga - przeniesiona; powtarzające się strony nie są przenoszone.
+        self.assertEqual(len(anchors) + len(moved), 2)
+        self.assertFalse({0, 2} & {base_index for base_index, _ in moved})
+
+
+if __name__ == "__main__":
+    unittest.main()
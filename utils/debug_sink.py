@@ -0,0 +1,181 @@
+"""Zapis artefaktów diagnostycznych (tryb testowy) w tle, poza ścieżką porównania.
+
+Użycie:
+    debug_sink.capture("difference_map.npz", difference_map, page=page_index)
+    debug_sink.capture("result.png", lambda: draw_regions(page, rects), page=page_index)
+
+capture() tylko kolejkuje artefakt - kodowanie i zapis wykonuje wątek zapisujący. Zamiast tablicy
+można przekazać funkcję bez argumentów; wtedy także samo wyliczenie obrazu (np. rysowanie obrysów)
+odbywa się w tle. Przekazana tablica nie jest kopiowana, więc nie może być później modyfikowana.
+Format wynika z rozszerzenia nazwy: .png (obraz, szybka kompresja) lub .npz (tablica NumPy,
+np.savez_compressed). Pliki trafiają do osobnego katalogu dla każdego uruchomienia.
+
+Dla każdego rodzaju artefaktu zapisywany jest co sample_every-ty. Artefakt jest pomijany (nigdy nie
+blokuje porównania), gdy kolejka zajmuje więcej niż queue_max_bytes lub gdy zapisane pliki
+przekroczyły max_bytes.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from utils import profiling
+from config.settings import (DEBUG_ARTIFACT_DIR, DEBUG_SAMPLE_EVERY, DEBUG_MAX_BYTES, DEBUG_QUEUE_MAX_BYTES,
+                             DEBUG_PNG_COMPRESSION, DEBUG_FLUSH_TIMEOUT)
+
+Artifact = Union[np.ndarray, Image.Image, Callable[[], Union[np.ndarray, Image.Image]]]
+
+
+class DebugSink:
+    """Kolejka artefaktów diagnostycznych z wątkiem zapisującym je do katalogu directory."""
+
+    def __init__(self,
+                 directory: str,
+                 sample_every: int = DEBUG_SAMPLE_EVERY,
+                 max_bytes: int = DEBUG_MAX_BYTES,
+                 queue_max_bytes: int = DEBUG_QUEUE_MAX_BYTES):
+        self.directory = directory
+        self.sample_every = max(1, sample_every)
+        self.max_bytes = max_bytes
+        self.queue_max_bytes = queue_max_bytes
+        self.written_bytes = 0
+        self.written = 0
+        self.dropped = 0
+        self._sequence = 0
+        self._counters: Dict[str, int] = {}
+        self._queued_bytes = 0
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._full_logged = False
+        self._writer = threading.Thread(target=self._write_loop, name="DebugSink", daemon=True)
+        self._writer.start()
+
+    def capture(self, kind: str, data: Artifact, page: Optional[int] = None, label: str = "") -> bool:
+        """Kolejkuje artefakt rodzaju kind (nazwa z rozszerzeniem); zwraca False, gdy został pominięty."""
+        with self._lock:
+            if self._closed:
+                return False
+            count = self._counters.get(kind, 0)
+            self._counters[kind] = count + 1
+            if count % self.sample_every:
+                return False
+            # Rozmiar funkcji nie jest znany przed jej wywołaniem - liczy się dopiero zapisany plik.
+            size = data.nbytes if isinstance(data, np.ndarray) else 0
+            if (self.written_bytes >= self.max_bytes
+                    or (self._queued_bytes and self._queued_bytes + size > self.queue_max_bytes)):
+                self.dropped += 1
+                return False
+            self._queued_bytes += size
+            self._sequence += 1
+            name = self._file_name(self._sequence, kind, page, label)
+        self._queue.put((name, data, size))
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Czeka na zapisanie zakolejkowanych artefaktów; zwraca False po przekroczeniu timeout."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = DEBUG_FLUSH_TIMEOUT):
+        """Zapisuje pozostałe artefakty i kończy wątek zapisujący."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout)
+        if self.written or self.dropped:
+            logging.info(f"Debug artifacts: {self.written} written ({self.written_bytes // 1024} KB), "
+                         f"{self.dropped} dropped, in {self.directory}")
+
+    @staticmethod
+    def _file_name(sequence: int, kind: str, page: Optional[int], label: str) -> str:
+        stem, ext = os.path.splitext(kind)
+        parts = [f"{sequence:06d}"]
+        if label:
+            parts.append(label)
+        if page is not None:
+            parts.append(f"page{page + 1}")
+        parts.append(stem)
+        return "_".join(parts) + ext
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            name, data, size = item
+            try:
+                self._write(name, data)
+            except Exception as e:
+                logging.error(f"Failed to write debug artifact {name}: {e}")
+            finally:
+                with self._lock:
+                    self._queued_bytes -= size
+
+    def _write(self, name: str, data: Artifact):
+        if self.written_bytes >= self.max_bytes:
+            with self._lock:
+                self.dropped += 1
+            if not self._full_logged:
+                self._full_logged = True
+                logging.info(f"Debug artifact limit of {self.max_bytes // 2 ** 20} MB reached, "
+                             f"further artifacts are dropped")
+            return
+
+        with profiling.span("debug_write", artifact=name):
+            if callable(data):
+                data = data()
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, name)
+            if name.endswith(".npz"):
+                np.savez_compressed(path, data=np.asarray(data))
+            else:
+                image = data if isinstance(data, Image.Image) else Image.fromarray(data)
+                image.save(path, "PNG", compress_level=DEBUG_PNG_COMPRESSION)
+        with self._lock:
+            self.written += 1
+            self.written_bytes += os.path.getsize(path)
+
+
+_sink: Optional[DebugSink] = None
+_sink_lock = threading.Lock()
+
+
+def run_directory(root: str = DEBUG_ARTIFACT_DIR) -> str:
+    """Katalog bieżącego uruchomienia: data, godzina i PID procesu."""
+    return os.path.join(root, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+
+
+def get_sink() -> DebugSink:
+    """Zwraca współdzielony zapis artefaktów (tworzony przy pierwszym użyciu i zamykany przy wyjściu)."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = DebugSink(run_directory())
+            atexit.register(_sink.close)
+        return _sink
+
+
+def set_sink(sink: Optional[DebugSink]) -> Optional[DebugSink]:
+    """Podmienia współdzielony zapis artefaktów (np. na inny katalog); zwraca poprzedni."""
+    global _sink
+    with _sink_lock:
+        previous, _sink = _sink, sink
+        return previous
+
+
+def capture(kind: str, data: Artifact, page: Optional[int] = None, label: str = "") -> bool:
+    """Kolejkuje artefakt we współdzielonym zapisie (patrz DebugSink.capture)."""
+    return get_sink().capture(kind, data, page, label)
@@ -0,0 +1,234 @@
+"""Wektorowy potok porównania oparty o NumPy/OpenCV.
+
+Strony przechowywane są jako tablice uint8 (H x W x 3 dla RGB lub H x W dla skali szarości)
+utworzone bezpośrednio z bufora pixmapy fitz. Wszystkie etapy zapisują wyniki do gotowych
+buforów (parametr dst funkcji OpenCV), a bufory pośrednie są wielokrotnie używane w obrębie wątku,
+więc porównanie strony nie tworzy kolejnych pełnych kopii obrazu jak ścieżka PIL w image_utils.
+"""
+import threading
+from typing import List, Optional, Tuple
+import cv2
+import numpy as np
+from utils import profiling
+from config.settings import DIFFERENCE_COLOR, DIFFERENCE_OUTLINE_WIDTH, REGION_MERGE_GAP, PAGE_ASPECT_TOLERANCE
+
+Rect = Tuple[int, int, int, int]
+
+# Margines wokół obrysowywanego obszaru (tak jak w ścieżce PIL)
+OUTLINE_MARGIN = 5
+
+
+class _Workspace(threading.local):
+    """Bufory pośrednie przydzielane raz na wątek i wielokrotnie używane dla stron o tym samym rozmiarze."""
+
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name: str, shape: tuple) -> np.ndarray:
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+            self._buffers[name] = buffer
+        return buffer
+
+
+_workspace = _Workspace()
+
+
+def to_gray(page: np.ndarray) -> np.ndarray:
+    """Zwraca stronę w skali szarości (bez kopii, jeśli już jest szara)."""
+    if page.ndim == 2:
+        return page
+    return cv2.cvtColor(page, cv2.COLOR_RGB2GRAY)
+
+
+def to_rgb(page: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Zwraca stronę RGB; dla stron RGB kopiuje dane do out (jeśli podano)."""
+    if page.ndim == 2:
+        return cv2.cvtColor(page, cv2.COLOR_GRAY2RGB, dst=out)
+    if out is None:
+        return page.copy()
+    np.copyto(out, page)
+    return out
+
+
+def align_to(page: np.ndarray, shape: tuple) -> np.ndarray:
+    """Dopasowuje stronę do rozmiaru strony bazowej (tak jak PDFService.grid_zoom przy renderowaniu).
+
+    Strony dokumentów wczytanych z pliku renderowane są od razu na siatce strony bazowej - ta funkcja
+    obsługuje pozostałe (np. strony przekazane jako tablice). Strona o tych samych proporcjach jest
+    skalowana do rozmiaru bazowej; strona o innych proporcjach umieszczana jest bez skalowania od
+    lewego górnego rogu - brakujący obszar uzupełniany jest białym tłem, a nadmiarowy pomijany.
+    """
+    if page.shape[:2] == shape[:2]:
+        return page
+    height, width = shape[:2]
+    zoom_x, zoom_y = width / page.shape[1], height / page.shape[0]
+    if abs(zoom_x / zoom_y - 1) < PAGE_ASPECT_TOLERANCE:
+        interpolation = cv2.INTER_AREA if zoom_x < 1 else cv2.INTER_LINEAR
+        return cv2.resize(page, (width, height), interpolation=interpolation)
+    aligned = np.full(shape[:2] + page.shape[2:], 255, dtype=np.uint8)
+    rows, cols = min(height, page.shape[0]), min(width, page.shape[1])
+    aligned[:rows, :cols] = page[:rows, :cols]
+    return aligned
+
+
+def resize_to_fit(page: np.ndarray, max_size: Tuple[int, int]) -> np.ndarray:
+    """Zmniejsza stronę (np. do podglądu) z zachowaniem proporcji, tak aby mieściła się w max_size."""
+    ratio = min(max_size[0] / page.shape[1], max_size[1] / page.shape[0])
+    new_size = (max(1, int(page.shape[1] * ratio)), max(1, int(page.shape[0] * ratio)))
+    interpolation = cv2.INTER_AREA if ratio < 1 else cv2.INTER_LANCZOS4
+    return cv2.resize(page, new_size, interpolation=interpolation)
+
+
+def difference_map(base_page: np.ndarray,
+                   compare_page: np.ndarray,
+                   out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Oblicza mapę bezwzględnych różnic (H x W, uint8) niezależną od czułości.
+
+    Dla stron RGB różnica kanałów trafia do bufora roboczego wątku, a następnie jest
+    zamieniana na luminancję bezpośrednio w buforze wyjściowym.
+    """
+    with profiling.span("difference"):
+        if base_page.ndim != compare_page.ndim:
+            # Jeden dokument renderowany w skali szarości - porównujemy w skali szarości.
+            base_page, compare_page = to_gray(base_page), to_gray(compare_page)
+        compare_page = align_to(compare_page, base_page.shape)
+
+        if out is None:
+            out = np.empty(base_page.shape[:2], dtype=np.uint8)
+
+        if base_page.ndim == 2:
+            return cv2.absdiff(base_page, compare_page, dst=out)
+
+        scratch = _workspace.get("absdiff", base_page.shape)
+        cv2.absdiff(base_page, compare_page, dst=scratch)
+        return cv2.cvtColor(scratch, cv2.COLOR_RGB2GRAY, dst=out)
+
+
+def threshold_mask(diff_map: np.ndarray, sensitivity: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Maska binarna: 255 tam, gdzie różnica przekracza czułość, 0 w pozostałych miejscach."""
+    if out is None:
+        out = _workspace.get("mask", diff_map.shape)
+    cv2.threshold(diff_map, sensitivity, 255, cv2.THRESH_BINARY, dst=out)
+    return out
+
+
+def region_stats(mask: np.ndarray, gap: int = 0) -> np.ndarray:
+    """Wyznacza obszary maski jednym przebiegiem connectedComponentsWithStats.
+
+    Zwraca tablicę N x 5 (x, y, w, h, liczba pikseli maski). Piksele odległe o nie więcej niż
+    gap pikseli tła należą do tego samego obszaru: maska jest do grupowania poszerzana (dilate),
+    ale prostokąty i liczby pikseli liczone są z pikseli oryginalnej maski.
+    """
+    if gap <= 0:
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        return stats[1:].astype(np.int64)
+
+    # Jądro (gap+1) zakotwiczone w rogu poszerza każdy piksel o gap w jedną stronę, więc piksele
+    # rozdzielone co najwyżej gap pikselami tła stają się sąsiednie.
+    grouped = cv2.dilate(mask, np.ones((gap + 1, gap + 1), dtype=np.uint8), anchor=(0, 0))
+    count, labels, _, _ = cv2.connectedComponentsWithStats(grouped, connectivity=8)
+    ys, xs = np.nonzero(mask)
+    if count <= 1 or not len(xs):
+        return np.empty((0, 5), dtype=np.int64)
+    label_of_pixel = labels[ys, xs]
+
+    x0 = np.full(count, np.iinfo(np.int64).max, dtype=np.int64)
+    y0 = np.full(count, np.iinfo(np.int64).max, dtype=np.int64)
+    x1 = np.full(count, -1, dtype=np.int64)
+    y1 = np.full(count, -1, dtype=np.int64)
+    np.minimum.at(x0, label_of_pixel, xs)
+    np.minimum.at(y0, label_of_pixel, ys)
+    np.maximum.at(x1, label_of_pixel, xs)
+    np.maximum.at(y1, label_of_pixel, ys)
+    pixels = np.bincount(label_of_pixel, minlength=count)
+
+    present = pixels[1:] > 0
+    stats = np.stack([x0, y0, x1 - x0 + 1, y1 - y0 + 1, pixels], axis=1)[1:]
+    return stats[present]
+
+
+def find_regions(mask: np.ndarray, gap: int = 0) -> List[Rect]:
+    """Zwraca prostokąty (x, y, w, h) otaczające spójne obszary maski (w kolejności czytania)."""
+    stats = region_stats(mask, gap)
+    order = np.lexsort((stats[:, 0], stats[:, 1]))
+    return [tuple(int(value) for value in stats[index, :4]) for index in order]
+
+
+def merge_regions(regions: List[Rect], gap: int = REGION_MERGE_GAP) -> List[Rect]:
+    """Łączy prostokąty oddalone o nie więcej niż gap pikseli tła (w obu osiach), jak region_stats.
+
+    Dla trybów, które znajdują obszary fragmentami strony (pasy, obszary kandydujące) i nie mają
+    maski całej strony; odległość liczona jest między prostokątami, a nie pikselami maski.
+    Zwraca prostokąty w kolejności czytania.
+    """
+    boxes = [[x, y, x + w, y + h] for x, y, w, h in regions]
+    merged = gap > 0
+    while merged:
+        merged = False
+        result = []
+        for box in boxes:
+            for other in result:
+                if (box[0] - other[2] <= gap and other[0] - box[2] <= gap and
+                        box[1] - other[3] <= gap and other[1] - box[3] <= gap):
+                    other[0], other[1] = min(other[0], box[0]), min(other[1], box[1])
+                    other[2], other[3] = max(other[2], box[2]), max(other[3], box[3])
+                    merged = True
+                    break
+            else:
+                result.append(box)
+        boxes = result
+    return sorted(((x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in boxes), key=lambda rect: (rect[1], rect[0]))
+
+
+def draw_regions(base_page: np.ndarray,
+                 regions: List[Rect],
+                 out: Optional[np.ndarray] = None,
+                 colors: Optional[List[Tuple[int, int, int]]] = None,
+                 scale: float = 1.0) -> np.ndarray:
+    """Rysuje obrysy obszarów na kopii strony bazowej (zawsze RGB).
+
+    Opcjonalna lista colors podaje kolor dla każdego obszaru; domyślnie DIFFERENCE_COLOR.
+    scale powiększa margines i grubość obrysu (np. dla kafelków renderowanych przy wyższym DPI).
+    """
+    with profiling.span("draw"):
+        if out is None:
+            out = np.empty(base_page.shape[:2] + (3,), dtype=np.uint8)
+        to_rgb(base_page, out)
+        margin = int(round(OUTLINE_MARGIN * scale))
+        thickness = max(1, int(round(DIFFERENCE_OUTLINE_WIDTH * scale)))
+        for index, (x, y, w, h) in enumerate(regions):
+            cv2.rectangle(out,
+                          (x - margin, y - margin),
+                          (x + w + margin, y + h + margin),
+                          colors[index] if colors else DIFFERENCE_COLOR,
+                          thickness)
+        return out
+
+
+def threshold_regions(diff_map: np.ndarray, sensitivity: int, gap: int = REGION_MERGE_GAP) -> np.ndarray:
+    """Progowanie mapy różnic; zwraca statystyki obszarów (N x 5, jak region_stats) w kolejności czytania."""
+    with profiling.span("threshold"):
+        mask = threshold_mask(diff_map, sensitivity)
+    with profiling.span("regions"):
+        stats = region_stats(mask, gap)
+        return stats[np.lexsort((stats[:, 0], stats[:, 1]))]
+
+
+def outline_differences(base_page: np.ndarray,
+                        diff_map: np.ndarray,
+                        sensitivity: int,
+                        gap: int = REGION_MERGE_GAP) -> Tuple[np.ndarray, np.ndarray]:
+    """Progowanie mapy różnic i obrysowanie obszarów; zwraca obraz wynikowy i statystyki obszarów."""
+    stats = threshold_regions(diff_map, sensitivity, gap)
+    return draw_regions(base_page, [tuple(row[:4]) for row in stats.tolist()]), stats
+
+
+def compare_pages(base_page: np.ndarray,
+                  compare_page: np.ndarray,
+                  sensitivity: int = 15) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pełne porównanie pary stron: zwraca obraz wynikowy, mapę różnic i statystyki obszarów (N x 5)."""
+    diff_map = difference_map(base_page, compare_page)
+    result, stats = outline_differences(base_page, diff_map, sensitivity)
+    return result, diff_map, stats
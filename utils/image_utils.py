@@ -1,72 +1,80 @@
-from PyQt5.QtGui import QImage, QPixmap
 from PIL import Image, ImageChops, ImageDraw
 from typing import Tuple, Optional
 import numpy as np
 import cv2
 import logging
+from utils import debug_sink, profiling
 from config.settings import DIFFERENCE_COLOR, DIFFERENCE_OUTLINE_WIDTH
 
-def pil2qimage(pil_image):
-    """Konwertuje obraz PIL na QImage bez zmiany kolejności kanałów."""
-    try:
-        if pil_image.mode == "RGB":
-            # Bez zamiany kanałów
-            arr = pil_image.tobytes()
-            return QImage(arr, pil_image.width, pil_image.height,
-                          pil_image.width * 3, QImage.Format_RGB888)
-        elif pil_image.mode == "RGBA":
-            # Dla RGBA również bez zamiany kanałów
-            arr = pil_image.tobytes()
-            return QImage(arr, pil_image.width, pil_image.height,
-                          pil_image.width * 4, QImage.Format_RGBA8888)
-        else:
-            # Konwersja do RGBA w razie innego trybu i ponowna próba
-            pil_image = pil_image.convert("RGBA")
-            return pil2qimage(pil_image)
-    except Exception as e:
-        logging.error(f"Failed to convert PIL image to QImage: {e}")
-        return None
-
 def compare_images(base_image: Image.Image,
                    compare_image: Image.Image,
                    sensitivity: int = 15,
                    testing_mode: bool = False) -> Tuple[Optional[Image.Image], Optional[Image.Image]]:
     """Porównuje dwa obrazy i zwraca obraz z zaznaczonymi różnicami."""
     try:
-        # Konwersja do RGB jeśli potrzebna
         if base_image.mode != 'RGB':
             base_image = base_image.convert('RGB')
-        if compare_image.mode != 'RGB':
-            compare_image = compare_image.convert('RGB')
+        difference_map = compute_difference_map(base_image, compare_image, testing_mode)
+        result_image, _ = outline_differences(base_image, difference_map, sensitivity, testing_mode)
+        return result_image, base_image.copy()
 
-        # Wyrównanie rozmiarów obrazów
-        if base_image.size != compare_image.size:
-            compare_image = resize_image_to_fit(compare_image, base_image.size, testing_mode)
+    except Exception as e:
+        logging.error(f"Failed to compare images: {e}")
+        return None, None
+
+def compute_difference_map(base_image: Image.Image,
+                           compare_image: Image.Image,
+                           testing_mode: bool = False) -> Image.Image:
+    """Zwraca mapę bezwzględnych różnic (skala szarości) niezależną od czułości.
+
+    Dla obrazów o tym samym rozmiarze mapa jest symetryczna względem zamiany obrazu bazowego.
+    """
+    # Konwersja do RGB jeśli potrzebna
+    if base_image.mode != 'RGB':
+        base_image = base_image.convert('RGB')
+    if compare_image.mode != 'RGB':
+        compare_image = compare_image.convert('RGB')
 
-        # Obliczanie różnicy
+    # Wyrównanie rozmiarów obrazów
+    if base_image.size != compare_image.size:
+        compare_image = resize_image_to_fit(compare_image, base_image.size, testing_mode)
+
+    # Obliczanie różnicy
+    with profiling.span("difference"):
         diff = ImageChops.difference(base_image, compare_image)
-        if testing_mode:
-            diff.save("image_difference_grayscale_test.png", "PNG")
+        difference_map = diff.convert('L')
+    if testing_mode:
+        debug_sink.capture("difference.png", diff)
 
-        diff = diff.convert('L')
-        diff = diff.point(lambda x: 255 if x > sensitivity else 0)
+    return difference_map
 
-        if testing_mode:
-            diff.save("image_difference_thresholded_test.png", "PNG")
+def outline_differences(base_image: Image.Image,
+                        difference_map: Image.Image,
+                        sensitivity: int = 15,
+                        testing_mode: bool = False) -> Tuple[Image.Image, int]:
+    """Progowanie mapy różnic i obrysowanie znalezionych obszarów na kopii obrazu bazowego.
 
-        # Znajdowanie konturów
-        diff_array = np.array(diff).astype(np.uint8)
+    Zwraca obraz wynikowy oraz liczbę znalezionych obszarów.
+    """
+    with profiling.span("threshold"):
+        diff = difference_map.point(threshold_table(sensitivity))
 
-        # Zapis pliku tekstowego z różnicami
-        if testing_mode:
-            np.savetxt("difference_matrix_test.txt", diff_array, fmt='%d')
-            logging.info("Plik difference_matrix_test.txt został pomyślnie zapisany.")
+    # Znajdowanie konturów
+    diff_array = np.array(diff).astype(np.uint8)
+
+    # Maska zapisywana binarnie (skompresowany .npz) zamiast tekstowej macierzy
+    if testing_mode:
+        debug_sink.capture("thresholded.npz", diff_array)
 
+    with profiling.span("regions"):
         contours, _ = cv2.findContours(diff_array,
                                        cv2.RETR_EXTERNAL,
                                        cv2.CHAIN_APPROX_SIMPLE)
 
-        # Rysowanie prostokątów
+    # Rysowanie prostokątów
+    with profiling.span("draw"):
+        if base_image.mode != 'RGB':
+            base_image = base_image.convert('RGB')
         result_image = base_image.copy()
         draw = ImageDraw.Draw(result_image)
         for contour in contours:
@@ -77,15 +85,15 @@ def compare_images(base_image: Image.Image,
                 width=DIFFERENCE_OUTLINE_WIDTH
             )
 
-        if testing_mode:
-            result_image.save("result_image_test.png", "PNG")
-            base_image.save("original_image_test.png", "PNG")
+    if testing_mode:
+        debug_sink.capture("result.png", result_image)
+        debug_sink.capture("original.png", base_image)
 
-        return result_image, base_image.copy()
+    return result_image, len(contours)
 
-    except Exception as e:
-        logging.error(f"Failed to compare images: {e}")
-        return None, None
+def threshold_table(sensitivity: int) -> list:
+    """Tablica LUT dla Image.point: 255 dla wartości powyżej czułości, 0 w pozostałych przypadkach."""
+    return [255 if x > sensitivity else 0 for x in range(256)]
 
 def resize_image_to_fit(image: Image.Image, max_size: Tuple[int, int], testing_mode: bool = False) -> Image.Image:
     """Zmienia rozmiar obrazu zachowując proporcje."""
@@ -94,7 +102,7 @@ def resize_image_to_fit(image: Image.Image, max_size: Tuple[int, int], testing_m
         new_size = tuple(int(dim * ratio) for dim in image.size)
         resized_image = image.resize(new_size, Image.LANCZOS)
         if testing_mode:
-            resized_image.save("resized_image_test.png", "PNG")
+            debug_sink.capture("resized.png", resized_image)
         return resized_image
     except Exception as e:
         logging.error(f"Failed to resize image: {e}")
@@ -0,0 +1,178 @@
+"""Dopasowanie stron dwóch dokumentów: pary stron, strony wstawione i usunięte.
+
+Dwa etapy, razem w czasie bliskim liniowemu:
+1. Kotwice - strony o skrócie treści występującym dokładnie raz w każdym dokumencie. Spośród
+   takich par wybierany jest najdłuższy rosnący podciąg (jak w patience diff, O(n log n)),
+   więc przestawione fragmenty nie psują dopasowania reszty dokumentu.
+2. Luki między kotwicami - programowanie dynamiczne maksymalizujące łączne podobieństwo par
+   (similarity, np. sygnatur stron), ograniczone do pasa przesunięć: różnica długości luki plus
+   band stron (co najmniej 1) w każdą stronę. Koszt to O(n * (d + band)), gdzie d to liczba
+   wstawionych lub usuniętych stron. Para wymaga podobieństwa co najmniej threshold.
+
+Strony o unikalnym kluczu, których nie wybrano na kotwice (match_moved), zmieniły miejsce w dokumencie.
+Nie biorą udziału w dopasowaniu luk - w wyniku są stroną usuniętą i wstawioną o równym kluczu, więc
+nie zostaną połączone w parę z podobną stroną (np. z tego samego szablonu) na swoim dawnym miejscu.
+
+Wynik to lista par (indeks bazowy, indeks porównywany) w kolejności dokumentów; None po jednej
+stronie oznacza stronę usuniętą (brak w dokumencie porównywanym) lub wstawioną (brak w bazowym).
+"""
+import bisect
+from collections import Counter
+from typing import Callable, Hashable, List, Optional, Sequence, Tuple
+from config.settings import PAGE_MATCH_THRESHOLD, PAGE_ALIGN_BAND
+
+Pair = Tuple[Optional[int], Optional[int]]
+Gap = Tuple[range, range]
+
+
+def match_anchors(base_keys: Sequence[Hashable], compare_keys: Sequence[Hashable]) -> List[Tuple[int, int]]:
+    """Pary stron o unikalnych, równych kluczach (skrótach treści), zachowujące kolejność w obu dokumentach."""
+    base_counts, compare_counts = Counter(base_keys), Counter(compare_keys)
+    compare_position = {key: index for index, key in enumerate(compare_keys) if compare_counts[key] == 1}
+    candidates = [(index, compare_position[key]) for index, key in enumerate(base_keys)
+                  if base_counts[key] == 1 and key in compare_position]
+
+    # Najdłuższy rosnący podciąg względem indeksu porównywanego (kandydaci są posortowani po bazowym).
+    tails: List[int] = []
+    tail_items: List[int] = []
+    previous: List[Optional[int]] = [None] * len(candidates)
+    for item, (_, compare_index) in enumerate(candidates):
+        position = bisect.bisect_left(tails, compare_index)
+        if position == len(tails):
+            tails.append(compare_index)
+            tail_items.append(item)
+        else:
+            tails[position] = compare_index
+            tail_items[position] = item
+        previous[item] = tail_items[position - 1] if position else None
+
+    anchors = []
+    item = tail_items[-1] if tail_items else None
+    while item is not None:
+        anchors.append(candidates[item])
+        item = previous[item]
+    return anchors[::-1]
+
+
+def match_moved(base_keys: Sequence[Hashable],
+                compare_keys: Sequence[Hashable],
+                anchors: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Pary stron przeniesionych: równe klucze występujące poza kotwicami dokładnie raz w każdym dokumencie.
+
+    Kotwice to najdłuższy rosnący podciąg takich par, więc para spoza kotwic krzyżuje się z inną -
+    strona zmieniła kolejność względem reszty dokumentu.
+    """
+    anchored_base = {base_index for base_index, _ in anchors}
+    anchored_compare = {compare_index for _, compare_index in anchors}
+    base_free = [(index, key) for index, key in enumerate(base_keys) if index not in anchored_base]
+    compare_free = [(index, key) for index, key in enumerate(compare_keys) if index not in anchored_compare]
+    base_counts = Counter(key for _, key in base_free)
+    compare_counts = Counter(key for _, key in compare_free)
+    compare_position = {key: index for index, key in compare_free if compare_counts[key] == 1}
+    return [(index, compare_position[key]) for index, key in base_free
+            if base_counts[key] == 1 and key in compare_position]
+
+
+def find_gaps(base_count: int, compare_count: int, anchors: List[Tuple[int, int]]) -> List[Gap]:
+    """Fragmenty obu dokumentów przed, między i za kotwicami (także puste)."""
+    gaps = []
+    base_start = compare_start = 0
+    for base_index, compare_index in anchors + [(base_count, compare_count)]:
+        gaps.append((range(base_start, base_index), range(compare_start, compare_index)))
+        base_start, compare_start = base_index + 1, compare_index + 1
+    return gaps
+
+
+def align(base_count: int,
+          compare_count: int,
+          anchors: List[Tuple[int, int]],
+          similarity: Callable[[int, int], float],
+          threshold: float = PAGE_MATCH_THRESHOLD,
+          band: int = PAGE_ALIGN_BAND,
+          moved: Sequence[Tuple[int, int]] = ()) -> List[Pair]:
+    """Łączy kotwice z dopasowaniem luk; similarity(i, j) wywoływane jest tylko dla stron w lukach.
+
+    Strony przeniesione (moved, z match_moved) pomijane są w dopasowaniu luk i zwracane jako
+    strona usunięta i wstawiona.
+    """
+    moved_base = {base_index for base_index, _ in moved}
+    moved_compare = {compare_index for _, compare_index in moved}
+    pairs: List[Pair] = []
+    gaps = find_gaps(base_count, compare_count, anchors)
+    for gap_index, (base_range, compare_range) in enumerate(gaps):
+        gap_pairs = align_gap([i for i in base_range if i not in moved_base],
+                              [j for j in compare_range if j not in moved_compare],
+                              similarity, threshold, band)
+        pairs.extend(_insert_unmatched(gap_pairs,
+                                       [i for i in base_range if i in moved_base],
+                                       [j for j in compare_range if j in moved_compare]))
+        if gap_index < len(anchors):
+            pairs.append(anchors[gap_index])
+    return pairs
+
+
+def _insert_unmatched(pairs: List[Pair], base_pages: List[int], compare_pages: List[int]) -> List[Pair]:
+    """Wstawia strony bez pary (rosnące indeksy) w listę par luki, zachowując kolejność obu dokumentów."""
+    result: List[Pair] = []
+    base_pages, compare_pages = base_pages[::-1], compare_pages[::-1]
+    for base_index, compare_index in pairs:
+        while base_pages and base_index is not None and base_pages[-1] < base_index:
+            result.append((base_pages.pop(), None))
+        while compare_pages and compare_index is not None and compare_pages[-1] < compare_index:
+            result.append((None, compare_pages.pop()))
+        result.append((base_index, compare_index))
+    result.extend((base_index, None) for base_index in base_pages[::-1])
+    result.extend((None, compare_index) for compare_index in compare_pages[::-1])
+    return result
+
+
+def align_gap(base_range: Sequence[int],
+              compare_range: Sequence[int],
+              similarity: Callable[[int, int], float],
+              threshold: float = PAGE_MATCH_THRESHOLD,
+              band: int = PAGE_ALIGN_BAND) -> List[Pair]:
+    """Dopasowanie stron jednej luki: programowanie dynamiczne w pasie przesunięć j - i."""
+    n, m = len(base_range), len(compare_range)
+    if not n or not m:
+        return [(i, None) for i in base_range] + [(None, j) for j in compare_range]
+
+    # Strona niedopasowana wymaga zejścia z przekątnej - pas musi mieć co najmniej jedną stronę zapasu.
+    band = max(1, band)
+    low, high = min(0, m - n) - band, max(0, m - n) + band
+    # score[i][j - i - low]: najlepsza suma podobieństw dla pierwszych i stron bazowych i j porównywanych.
+    width = high - low + 1
+    minus_infinity = float("-inf")
+    score = [[minus_infinity] * width for _ in range(n + 1)]
+    move = [[0] * width for _ in range(n + 1)]  # 1 - strona bazowa usunięta, 2 - wstawiona, 3 - para
+
+    for i in range(n + 1):
+        for j in range(max(0, i + low), min(m, i + high) + 1):
+            cell = j - i - low
+            if i == 0 and j == 0:
+                score[0][cell] = 0.0
+                continue
+            best, choice = minus_infinity, 0
+            if i > 0 and j - (i - 1) <= high:
+                best, choice = score[i - 1][j - i + 1 - low], 1
+            if j > 0 and j - 1 - i >= low and score[i][cell - 1] > best:
+                best, choice = score[i][cell - 1], 2
+            if i > 0 and j > 0:
+                value = similarity(base_range[i - 1], compare_range[j - 1])
+                if value >= threshold and score[i - 1][cell] + value > best:
+                    best, choice = score[i - 1][cell] + value, 3
+            score[i][cell], move[i][cell] = best, choice
+
+    pairs: List[Pair] = []
+    i, j = n, m
+    while i or j:
+        choice = move[i][j - i - low]
+        if choice == 3:
+            pairs.append((base_range[i - 1], compare_range[j - 1]))
+            i, j = i - 1, j - 1
+        elif choice == 1:
+            pairs.append((base_range[i - 1], None))
+            i -= 1
+        else:
+            pairs.append((None, compare_range[j - 1]))
+            j -= 1
+    return pairs[::-1]
@@ -0,0 +1,39 @@
+"""Tablica strony współdzieląca pamięć z obiektem, który jest właścicielem bufora.
+
+Strona renderowana przez fitz trafia do bufora próbek pixmapy. PageBuffer jest widokiem NumPy na
+ten bufor (pix.samples_mv), a sama pixmapa jest przechowywana w atrybucie owner, dzięki czemu
+pamięć żyje dokładnie tak długo, jak tablica lub jej widoki - bez kopiowania próbek.
+Kolejne etapy (mapa różnic, QImage widoku) korzystają z tej samej pamięci.
+"""
+from typing import Any
+import numpy as np
+
+
+class PageBuffer(np.ndarray):
+    """Tablica uint8 (H x W x n lub H x W) będąca widokiem na cudzy bufor, który utrzymuje przy życiu."""
+
+    def __new__(cls, array: np.ndarray, owner: Any = None):
+        buffer = np.asarray(array).view(cls)
+        buffer.owner = owner
+        return buffer
+
+    def __array_finalize__(self, obj):
+        # Widoki (wycinki, reshape) dziedziczą właściciela; nowe tablice (np.full_like) nie.
+        owner = getattr(obj, "owner", None)
+        self.owner = owner if owner is not None and np.may_share_memory(self, obj) else None
+
+    def __reduce__(self):
+        # Przekazanie do innego procesu (pickle) tworzy zwykłą tablicę z kopią danych.
+        return np.array, (np.asarray(self),)
+
+    @classmethod
+    def from_pixmap(cls, pix: "fitz.Pixmap") -> "PageBuffer":
+        """Opakowuje próbki pixmapy fitz bez kopiowania (wiersze z wyrównaniem są pomijane widokiem)."""
+        array = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+        if pix.stride != pix.width * pix.n:
+            array = array.reshape(pix.height, pix.stride)[:, :pix.width * pix.n]
+        if pix.n == 1:
+            array = array.reshape(pix.height, pix.width)
+        else:
+            array = array.reshape(pix.height, pix.width, pix.n)
+        return cls(array, owner=pix)
@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+import numpy as np
+from config.settings import PAGE_CACHE_MAX_BYTES
+
+
+class PageCache:
+    """Pamięć podręczna LRU stron (tablic) ograniczona łącznym rozmiarem w bajtach.
+
+    Bezpieczna wątkowo - strony pobiera wątek GUI, wątek operacji i wątek zapisu artefaktów.
+    Najnowszy wpis nie jest usuwany, nawet gdy sam przekracza limit. Przy serializacji
+    (przekazaniu dokumentu do innego procesu) zawartość jest pomijana.
+    """
+
+    def __init__(self, max_bytes: int = PAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._pages: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+            return page
+
+    def put(self, key: Hashable, page: np.ndarray):
+        with self._lock:
+            if key in self._pages:
+                self._size -= self._pages.pop(key).nbytes
+            self._pages[key] = page
+            self._size += page.nbytes
+            while self._size > self.max_bytes and len(self._pages) > 1:
+                _, evicted = self._pages.popitem(last=False)
+                self._size -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._size = 0
+
+    @property
+    def size(self) -> int:
+        """Łączny rozmiar przechowywanych stron w bajtach."""
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def __getstate__(self):
+        return {"max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_bytes"])
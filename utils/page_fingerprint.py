@@ -0,0 +1,146 @@
+"""Tanie odciski stron pozwalające pominąć pełne porównanie stron identycznych.
+
+Dwa poziomy:
+- content_digest - skrót znormalizowanego strumienia treści strony oraz zawartości zasobów
+  (czcionki, obrazy, formularze XObject), niezależny od numerów xref w pliku. Równe skróty
+  oznaczają, że strony rysowane są tymi samymi poleceniami z tymi samymi danymi.
+- raster_digest - skrót wyrenderowanej strony (w rozdzielczości porównania). Równe skróty
+  oznaczają identyczne piksele, więc mapa różnic byłaby zerowa.
+
+Do dopasowania stron dokumentów (utils.page_alignment) służy przybliżona sygnatura strony
+(page_signature): perceptual hash miniatury i próbka szingli tekstu - strony podobne, choć nie
+identyczne, mają sygnatury o wysokim podobieństwie (signature_similarity).
+"""
+import hashlib
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import cv2
+import fitz
+import numpy as np
+from config.settings import PAGE_SIGNATURE_THUMBNAIL, PAGE_SHINGLE_SIZE, PAGE_SHINGLE_SAMPLE
+
+_WHITESPACE = re.compile(rb"\s+")
+_REFERENCE = re.compile(rb"\d+ \d+ R")
+_REFERENCE_NUMBER = re.compile(r"(\d+) \d+ R")
+# Odwołania wsteczne (adnotacja -> strona, węzeł -> rodzic) prowadziłyby do całego drzewa stron.
+_BACK_REFERENCE = re.compile(r"/(?:P|Parent)\s*\d+ \d+ R")
+
+
+def content_digest(pdf: "fitz.Document", page: "fitz.Page", resource_cache: Optional[Dict[int, bytes]] = None) -> str:
+    """Zwraca skrót znormalizowanej treści strony wraz z zasobami.
+
+    Obejmuje strumień treści (ze znormalizowanymi białymi znakami), geometrię strony oraz cały
+    graf obiektów osiągalnych ze słownika /Resources i /Annots - słowniki z odwołaniami
+    zastąpionymi przez "R" i surowe dane strumieni. resource_cache (xref -> skrót) pozwala nie
+    haszować ponownie zasobów współdzielonych przez wiele stron dokumentu.
+    """
+    if resource_cache is None:
+        resource_cache = {}
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr((tuple(page.rect), tuple(page.cropbox), page.rotation)).encode())
+    digest.update(_WHITESPACE.sub(b" ", page.read_contents()).strip())
+    for key in ("Resources", "Annots"):
+        value = _inherited_key(pdf, page.xref, key)
+        digest.update(_REFERENCE.sub(b"R", value.encode()))
+        for xref in _references(value):
+            digest.update(_object_digest(pdf, xref, resource_cache, set()))
+    return digest.hexdigest()
+
+
+def _inherited_key(pdf: "fitz.Document", xref: int, key: str) -> str:
+    """Zwraca wartość klucza obiektu strony, uwzględniając dziedziczenie z węzłów /Pages."""
+    while xref:
+        value_type, value = pdf.xref_get_key(xref, key)
+        if value_type != "null":
+            return value
+        value_type, parent = pdf.xref_get_key(xref, "Parent")
+        if value_type != "xref":
+            break
+        xref = int(parent.split()[0])
+    return ""
+
+
+def _references(text: str) -> list:
+    return [int(match) for match in _REFERENCE_NUMBER.findall(text)]
+
+
+def _object_digest(pdf: "fitz.Document", xref: int, cache: Dict[int, bytes], visiting: set) -> bytes:
+    """Skrót obiektu i (rekurencyjnie) obiektów, do których się odwołuje, niezależny od numerów xref."""
+    if xref in cache:
+        return cache[xref]
+    if xref in visiting or not 0 < xref < pdf.xref_length():
+        return b"cycle"
+    visiting.add(xref)
+
+    digest = hashlib.blake2b(digest_size=20)
+    definition = _BACK_REFERENCE.sub("", pdf.xref_object(xref, compressed=True))
+    digest.update(_REFERENCE.sub(b"R", definition.encode()))
+    if pdf.xref_is_stream(xref):
+        digest.update(pdf.xref_stream_raw(xref) or b"")
+    for reference in _references(definition):
+        if reference != xref:
+            digest.update(_object_digest(pdf, reference, cache, visiting))
+
+    visiting.discard(xref)
+    cache[xref] = digest.digest()
+    return cache[xref]
+
+
+def raster_digest(page: np.ndarray) -> str:
+    """Zwraca skrót pikseli wyrenderowanej strony (z uwzględnieniem jej wymiarów)."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr(page.shape).encode())
+    digest.update(np.ascontiguousarray(page).data)
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class PageSignature:
+    """Zwarta sygnatura strony: 64-bitowy perceptual hash i najmniejsze skróty szingli tekstu (bottom-k)."""
+    phash: int
+    shingles: Tuple[int, ...] = ()
+
+
+def page_signature(page: "fitz.Page") -> PageSignature:
+    """Oblicza sygnaturę strony z miniatury renderowanej w skali szarości i słów strony."""
+    zoom = PAGE_SIGNATURE_THUMBNAIL / max(page.rect.width, page.rect.height, 1)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    thumbnail = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    words = [word[4].lower() for word in page.get_text("words")]
+    return PageSignature(phash=_phash(thumbnail), shingles=_shingle_sample(words))
+
+
+def _phash(thumbnail: np.ndarray) -> int:
+    """Perceptual hash (DCT): bity niskich częstotliwości 8 x 8 powyżej ich mediany."""
+    small = cv2.resize(thumbnail, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _shingle_sample(words: list) -> Tuple[int, ...]:
+    size = min(PAGE_SHINGLE_SIZE, len(words))
+    if not size:
+        return ()
+    hashes = {zlib.crc32(" ".join(words[i:i + size]).encode()) for i in range(len(words) - size + 1)}
+    return tuple(sorted(hashes)[:PAGE_SHINGLE_SAMPLE])
+
+
+def signature_similarity(first: PageSignature, second: PageSignature) -> float:
+    """Podobieństwo sygnatur w zakresie 0-1.
+
+    Obraz: odległość Hamminga hashy przeskalowana tak, że przypadkowa zgodność połowy bitów daje 0.
+    Tekst: podobieństwo Jaccarda szingli szacowane z próbek bottom-k. Gdy żadna strona nie ma
+    tekstu (np. skany), liczy się tylko obraz; w przeciwnym razie obie miary z równą wagą.
+    """
+    distance = bin(first.phash ^ second.phash).count("1")
+    image = max(0.0, 1 - 2 * distance / 64)
+    if not first.shingles and not second.shingles:
+        return image
+    union = sorted(set(first.shingles) | set(second.shingles))[:PAGE_SHINGLE_SAMPLE]
+    common = set(first.shingles) & set(second.shingles)
+    text = sum(1 for value in union if value in common) / len(union)
+    return (image + text) / 2
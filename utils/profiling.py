@@ -0,0 +1,196 @@
+"""Lekkie pomiary etapów przetwarzania (spany): czas rzeczywisty, czas CPU i szczytowa alokacja.
+
+Użycie:
+    with profiling.span("threshold", page=page_index):
+        ...
+
+Gdy pomiary są wyłączone (domyślnie), span() zwraca współdzielony pusty kontekst - koszt to jedno
+sprawdzenie flagi. Po włączeniu (enable) każdy span zapisuje rekord: nazwę etapu, stronę (także
+odziedziczoną po zewnętrznym spanie), czas rzeczywisty, czas CPU wątku i - jeśli śledzenie pamięci
+jest włączone - szczytowy przyrost pamięci zaalokowanej przez Pythona i NumPy (tracemalloc; alokacje
+wewnątrz OpenCV i MuPDF nie są widoczne). Szczyt pamięci jest przybliżony, gdy spany trwają
+równocześnie w kilku wątkach.
+
+Rekordy można zapisać jako JSON lines (write_jsonl) lub zagregować per etap (summary).
+Zadania wykonywane w procesach roboczych opakowuje się w Traced - rekordy wracają z wynikiem.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from config.settings import PROFILING_ENABLED, PROFILING_MEMORY, PROFILING_MAX_RECORDS
+
+_NULL_SPAN = contextlib.nullcontext()
+_enabled = False
+_memory = False
+_records: List[dict] = []
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(memory: bool = PROFILING_MEMORY):
+    """Włącza zapisywanie spanów (memory - także szczytowej alokacji przez tracemalloc)."""
+    global _enabled, _memory
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+
+
+def disable():
+    """Wyłącza pomiary; zapisane rekordy pozostają dostępne."""
+    global _enabled, _memory
+    _enabled = False
+    if _memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _memory = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(stage: str, **fields):
+    """Kontekst mierzący etap stage; dodatkowe pola (np. page) trafiają do rekordu."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(stage, fields)
+
+
+class _Span:
+    __slots__ = ("stage", "fields", "wall", "cpu", "memory_start", "peak")
+
+    def __init__(self, stage: str, fields: dict):
+        self.stage = stage
+        self.fields = fields
+
+    def __enter__(self):
+        stack = _stack()
+        if stack and "page" not in self.fields and "page" in stack[-1].fields:
+            self.fields["page"] = stack[-1].fields["page"]
+        stack.append(self)
+        self.peak = 0
+        self.memory_start = None
+        if _memory and tracemalloc.is_tracing():
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+            # reset_peak zeruje szczyt także dla zewnętrznych spanów - przekazują go sobie przez self.peak.
+            for outer in stack[:-1]:
+                outer.peak = max(outer.peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self.cpu = time.thread_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        stack = _stack()
+        stack.pop()
+        record = {"stage": self.stage, "wall_ms": wall * 1000, "cpu_ms": cpu * 1000}
+        record.update(self.fields)
+        if self.memory_start is not None and tracemalloc.is_tracing():
+            peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            record["peak_kb"] = max(0, peak - self.memory_start) / 1024
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+        if stack:
+            record["parent"] = stack[-1].stage
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record["pid"] = os.getpid()
+        record["time"] = time.time()
+        _add([record])
+        return False
+
+
+def _stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _add(records: List[dict]):
+    with _lock:
+        _records.extend(records)
+        # Przy długiej sesji najstarsze rekordy są usuwane.
+        if len(_records) > PROFILING_MAX_RECORDS:
+            del _records[:len(_records) - PROFILING_MAX_RECORDS]
+
+
+def merge(records: List[dict]):
+    """Dołącza rekordy zebrane w innym procesie."""
+    if records:
+        _add(records)
+
+
+def records() -> List[dict]:
+    with _lock:
+        return list(_records)
+
+
+def reset():
+    with _lock:
+        _records.clear()
+
+
+def write_jsonl(path: str, append: bool = False):
+    """Zapisuje rekordy jako JSON lines (jeden span na wiersz)."""
+    with open(path, "a" if append else "w", encoding="utf-8") as f:
+        for record in records():
+            f.write(json.dumps(record) + "\n")
+
+
+def summary(items: Optional[List[dict]] = None) -> List[dict]:
+    """Agreguje rekordy per etap: liczba, suma i maksimum czasu, suma CPU, największy szczyt pamięci."""
+    stages: Dict[str, dict] = {}
+    for record in records() if items is None else items:
+        stage = stages.setdefault(record["stage"], {"stage": record["stage"], "count": 0, "wall_ms": 0.0,
+                                                    "max_wall_ms": 0.0, "cpu_ms": 0.0, "peak_kb": None})
+        stage["count"] += 1
+        stage["wall_ms"] += record["wall_ms"]
+        stage["max_wall_ms"] = max(stage["max_wall_ms"], record["wall_ms"])
+        stage["cpu_ms"] += record["cpu_ms"]
+        if record.get("peak_kb") is not None:
+            stage["peak_kb"] = max(stage["peak_kb"] or 0, record["peak_kb"])
+    return sorted(stages.values(), key=lambda stage: -stage["wall_ms"])
+
+
+class Traced:
+    """Opakowanie zadania dla procesu roboczego: włącza tam pomiary i zwraca (wynik, rekordy).
+
+    Śledzenie pamięci w procesie roboczym odpowiada stanowi z chwili utworzenia opakowania.
+    """
+
+    def __init__(self, func: Callable):
+        self.func = func
+        self.memory = _memory
+
+    def __call__(self, *args):
+        was_enabled = _enabled
+        enable(self.memory)
+        start = len(_records)
+        try:
+            result = self.func(*args)
+            with _lock:
+                collected = _records[start:]
+                del _records[start:]
+            return result, collected
+        finally:
+            if not was_enabled:
+                disable()
+
+    @staticmethod
+    def unwrap(outcome) -> object:
+        """Dołącza rekordy z procesu roboczego i zwraca właściwy wynik zadania."""
+        result, collected = outcome
+        merge(collected)
+        return result
+
+
+if PROFILING_ENABLED:
+    enable()
@@ -0,0 +1,42 @@
+from PyQt5.QtGui import QImage
+import logging
+import numpy as np
+from utils import profiling
+
+def pil2qimage(pil_image):
+    """Konwertuje obraz PIL na QImage bez zmiany kolejności kanałów.
+
+    Dane są kopiowane do QImage - bufor tobytes() byłby tymczasowy i QImage wskazywałby na zwolnioną pamięć.
+    """
+    try:
+        if pil_image.mode not in ("L", "RGB", "RGBA"):
+            # Konwersja do RGBA w razie innego trybu
+            pil_image = pil_image.convert("RGBA")
+        return array2qimage(np.asarray(pil_image))
+    except Exception as e:
+        logging.error(f"Failed to convert PIL image to QImage: {e}")
+        return None
+
+def array2qimage(array: np.ndarray, copy: bool = True):
+    """Konwertuje tablicę uint8 (H x W x 3, H x W x 4 lub H x W) na QImage.
+
+    Przy copy=False QImage jest utworzony bezpośrednio na buforze tablicy (bez kopii, także dla wierszy
+    z wyrównaniem) - wywołujący musi utrzymać tablicę przy życiu tak długo jak QImage. Przy copy=True
+    wynik ma własną kopię danych.
+    """
+    try:
+        with profiling.span("qimage", copy=copy):
+            if array.strides[-1] != 1 or (array.ndim == 3 and array.strides[1] != array.shape[2]):
+                array = np.ascontiguousarray(array)
+            height, width = array.shape[:2]
+            if array.ndim == 2:
+                image_format = QImage.Format_Grayscale8
+            elif array.shape[2] == 4:
+                image_format = QImage.Format_RGBA8888
+            else:
+                image_format = QImage.Format_RGB888
+            image = QImage(array.data, width, height, array.strides[0], image_format)
+            return image.copy() if copy else image
+    except Exception as e:
+        logging.error(f"Failed to convert array to QImage: {e}")
+        return None
@@ -0,0 +1,95 @@
+"""Przechowywanie dużych tablic wyników porównania (mapy różnic, strony) w pliku mapowanym w pamięć.
+
+Użycie:
+    difference_map = result_store.get_store().put(difference_map)
+
+put() dopisuje tablicę na koniec pliku tymczasowego sesji i zwraca tylko do odczytu widok
+np.memmap na zapisane dane - kopia w pamięci procesu może zostać zwolniona. Strony takiego
+widoku należą do pamięci podręcznej systemu plików: system wczytuje je przy dostępie (np. przy
+ponownym progowaniu po zmianie czułości) i może je zwolnić bez zapisu do pliku wymiany, więc
+wyniki wielu stron nie zajmują pamięci rezydentnej procesu.
+
+Plik jest usuwany przy zamknięciu (na Linuksie zaraz po utworzeniu). reset() - oraz przekroczenie
+max_file_bytes - zaczyna nowy plik: wcześniej zwrócone widoki pozostają ważne, dopóki istnieją,
+a miejsce na dysku zwalniane jest po usunięciu ostatniego z nich. Plik nigdy nie jest skracany
+ani nadpisywany.
+"""
+import atexit
+import logging
+import tempfile
+import threading
+from typing import Optional
+
+import numpy as np
+
+from utils import profiling
+from config.settings import RESULT_STORE_DIR, RESULT_STORE_MIN_BYTES, RESULT_STORE_FILE_MAX_BYTES
+
+
+class ResultStore:
+    """Plik tymczasowy, do którego dopisywane są tablice zwracane jako widoki np.memmap."""
+
+    def __init__(self,
+                 directory: Optional[str] = RESULT_STORE_DIR,
+                 min_bytes: int = RESULT_STORE_MIN_BYTES,
+                 max_file_bytes: int = RESULT_STORE_FILE_MAX_BYTES):
+        self.directory = directory
+        self.min_bytes = min_bytes
+        self.max_file_bytes = max_file_bytes
+        self.stored_bytes = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def put(self, array: np.ndarray) -> np.ndarray:
+        """Zapisuje tablicę i zwraca widok tylko do odczytu (małe tablice i widoki memmap bez zmian)."""
+        if isinstance(array, np.memmap) or array.nbytes < self.min_bytes:
+            return array
+        array = np.ascontiguousarray(array)
+        with self._lock, profiling.span("result_store", bytes=array.nbytes):
+            try:
+                if self._file is not None and self.stored_bytes + array.nbytes > self.max_file_bytes:
+                    self._close_file()
+                    self.stored_bytes = 0
+                if self._file is None:
+                    self._file = tempfile.TemporaryFile(prefix="comparepdf-", suffix=".results",
+                                                        dir=self.directory)
+                offset = self._file.seek(0, 2)
+                array.tofile(self._file)
+                self._file.flush()
+                stored = np.memmap(self._file, dtype=array.dtype, mode="r", offset=offset, shape=array.shape)
+            except OSError as e:
+                # Brak miejsca na dysku nie przerywa porównania - tablica zostaje w pamięci.
+                logging.error(f"Failed to store comparison result on disk: {e}")
+                return array
+            self.stored_bytes += array.nbytes
+            return stored
+
+    def reset(self):
+        """Zaczyna nowy plik (np. po wczytaniu innych dokumentów)."""
+        with self._lock:
+            self._close_file()
+            self.stored_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+    def _close_file(self):
+        # Otwarte widoki memmap trzymają własne odwzorowanie pliku - zamknięcie go nie unieważnia.
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_store: Optional[ResultStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ResultStore:
+    """Zwraca współdzielony magazyn wyników (tworzony przy pierwszym użyciu i zamykany przy wyjściu)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore()
+            atexit.register(_store.close)
+        return _store
@@ -2,14 +2,21 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLa
                              QSlider)
 from PyQt5.QtCore import Qt, pyqtSignal
 import logging
-from config.settings import (DEFAULT_SENSITIVITY, SLIDER_MIN, SLIDER_MAX)
+from typing import Optional
+from config.settings import (DEFAULT_SENSITIVITY, SLIDER_MIN, SLIDER_MAX, MSG_PAGE, MSG_PAGE_DETAIL, MSG_NO_PAGES,
+                             MSG_DIFFERENCE, MSG_NO_DIFFERENCE)
 
 class ControlPanel(QWidget):
     compare_clicked = pyqtSignal()
     reset_clicked = pyqtSignal()
     clear_clicked = pyqtSignal()
     print_clicked = pyqtSignal()
+    sensitivity_changed = pyqtSignal(int)
     sensitivity_released = pyqtSignal(int)
+    previous_page_clicked = pyqtSignal()
+    next_page_clicked = pyqtSignal()
+    previous_difference_clicked = pyqtSignal()
+    next_difference_clicked = pyqtSignal()
 
     def __init__(self):
         super().__init__()
@@ -70,6 +77,41 @@ class ControlPanel(QWidget):
 
         main_layout.addLayout(sensitivity_layout)
 
+        # Nawigacja po stronach:
+        # 2 odstępy po 5 px =10 px
+        # 425 -10=415 px na elementy
+        # 2 przyciski po 102 px =204 px, etykieta 211 px
+        pages_layout = QHBoxLayout()
+        pages_layout.setSpacing(5)
+        self.previous_page_btn = self._create_button("< Prev", self.previous_page_clicked, 102)
+        self.page_label = QLabel(MSG_NO_PAGES)
+        self.page_label.setAlignment(Qt.AlignCenter)
+        self.page_label.setFixedWidth(211)
+        self.next_page_btn = self._create_button("Next >", self.next_page_clicked, 102)
+
+        pages_layout.addWidget(self.previous_page_btn)
+        pages_layout.addWidget(self.page_label)
+        pages_layout.addWidget(self.next_page_btn)
+
+        main_layout.addLayout(pages_layout)
+        self.set_page_info(0, 0)
+
+        # Nawigacja po obszarach różnic - te same wymiary co nawigacja po stronach.
+        differences_layout = QHBoxLayout()
+        differences_layout.setSpacing(5)
+        self.previous_difference_btn = self._create_button("< Diff", self.previous_difference_clicked, 102)
+        self.difference_label = QLabel(MSG_NO_DIFFERENCE.format(0))
+        self.difference_label.setAlignment(Qt.AlignCenter)
+        self.difference_label.setFixedWidth(211)
+        self.next_difference_btn = self._create_button("Diff >", self.next_difference_clicked, 102)
+
+        differences_layout.addWidget(self.previous_difference_btn)
+        differences_layout.addWidget(self.difference_label)
+        differences_layout.addWidget(self.next_difference_btn)
+
+        main_layout.addLayout(differences_layout)
+        self.set_difference_info(None, 0, False)
+
     def _create_button(self, text: str, slot, width: int) -> QPushButton:
         btn = QPushButton(text)
         btn.clicked.connect(slot)
@@ -78,6 +120,7 @@ class ControlPanel(QWidget):
 
     def _on_sensitivity_changed(self, value: int):
         self.sensitivity_value.setText(f"{value:03d}")
+        self.sensitivity_changed.emit(value)
 
     def _on_sensitivity_released(self):
         self.sensitivity_released.emit(self.get_sensitivity())
@@ -87,3 +130,21 @@ class ControlPanel(QWidget):
 
     def set_sensitivity(self, value: int):
         self.sensitivity_slider.setValue(value)
+
+    def set_page_info(self, page_index: int, page_count: int, detail: str = ""):
+        if page_count:
+            text = MSG_PAGE.format(page_index + 1, page_count)
+            self.page_label.setText(MSG_PAGE_DETAIL.format(text, detail) if detail else text)
+        else:
+            self.page_label.setText(MSG_NO_PAGES)
+        self.previous_page_btn.setEnabled(page_index > 0)
+        self.next_page_btn.setEnabled(page_index < page_count - 1)
+
+    def set_difference_info(self, position: Optional[int], count: int, enabled: bool):
+        """Pokazuje numer wybranego obszaru różnicy na stronie (position None - brak wyboru)."""
+        if position is None:
+            self.difference_label.setText(MSG_NO_DIFFERENCE.format(count))
+        else:
+            self.difference_label.setText(MSG_DIFFERENCE.format(position + 1, count))
+        self.previous_difference_btn.setEnabled(enabled)
+        self.next_difference_btn.setEnabled(enabled)
@@ -1,14 +1,58 @@
-from PyQt5.QtWidgets import QGraphicsView, QGraphicsPixmapItem, QGraphicsScene
-from PyQt5.QtGui import QPainter, QWheelEvent, QMouseEvent, QPixmap
-from PyQt5.QtCore import QRectF, Qt, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QGraphicsView, QGraphicsItem, QGraphicsRectItem, QGraphicsScene
+from PyQt5.QtGui import QPainter, QWheelEvent, QMouseEvent, QPen, QColor
+from PyQt5.QtCore import QRectF, Qt, QTimer, pyqtSignal
 import logging
-from config.settings import ZOOM_FACTOR_IN, ZOOM_FACTOR_OUT
+import numpy as np
+from typing import Optional, Sequence, Tuple
+from models.pdf_document import DifferenceRegion
+from services.tile_service import TileSource
+from utils.qt_utils import array2qimage
+from views.region_overlay import RegionOverlay
+from views.tile_layer import TileLayer
+from config.settings import (ZOOM_FACTOR_IN, ZOOM_FACTOR_OUT, TILE_UPDATE_DELAY_MS, SELECTED_REGION_COLOR,
+                             DIFFERENCE_OUTLINE_WIDTH)
+
+class ImageItem(QGraphicsItem):
+    """Element sceny rysujący tablicę strony bez kopiowania.
+
+    QImage jest utworzony na buforze tablicy (array2qimage z copy=False) i rysowany bezpośrednio
+    (drawImage), więc nie powstaje ani kopia w QImage, ani QPixmap. Element przechowuje tablicę,
+    dopóki QImage jest w użyciu.
+    """
+
+    def __init__(self, image: np.ndarray):
+        super().__init__()
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        self._array = None
+        self._image = None
+        self.setImage(image)
+
+    def setImage(self, image: np.ndarray):
+        self.prepareGeometryChange()
+        self._array = image
+        self._image = array2qimage(image, copy=False)
+
+    def array(self) -> np.ndarray:
+        return self._array
+
+    def boundingRect(self) -> QRectF:
+        if self._image is None:
+            return QRectF()
+        return QRectF(0, 0, self._image.width(), self._image.height())
+
+    def paint(self, painter: QPainter, option, widget=None):
+        if self._image is not None:
+            # Rysujemy tylko odsłonięty fragment obrazu.
+            rect = option.exposedRect
+            painter.drawImage(rect, self._image, rect)
+
 
 class GraphicsView(QGraphicsView):
     """Widok do wyświetlania i manipulacji obrazami."""
 
     # Sygnały
     zoom_changed = pyqtSignal(int)
+    scene_clicked = pyqtSignal(float, float)  # Kliknięcie bez przeciągania - współrzędne sceny
 
     def __init__(self, scene: QGraphicsScene = None):
         super().__init__(scene or QGraphicsScene())
@@ -22,7 +66,8 @@ class GraphicsView(QGraphicsView):
         self.setDragMode(QGraphicsView.ScrollHandDrag)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        # Przewijanie przesuwa zawartość viewportu zamiast rysować go w całości od nowa.
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
 
     def _init_variables(self):
         """Inicjalizacja zmiennych instancji."""
@@ -30,7 +75,15 @@ class GraphicsView(QGraphicsView):
         self._empty = True
         self._scene = self.scene()
         self._photo = None
-        self._pixmap = None
+        self._highlight: Optional[QGraphicsRectItem] = None
+        self._press_pos = None
+        self._overlay = RegionOverlay(self._scene)
+        self._tiles = TileLayer(self._scene, self)
+        # Kafelki odświeżamy po krótkiej przerwie, a nie przy każdym kroku przewijania.
+        self._tile_timer = QTimer(self)
+        self._tile_timer.setSingleShot(True)
+        self._tile_timer.setInterval(TILE_UPDATE_DELAY_MS)
+        self._tile_timer.timeout.connect(self._update_tiles)
 
     def fitImageInView(self, scale=True):
         """Dopasowuje obraz do widoku."""
@@ -53,33 +106,44 @@ class GraphicsView(QGraphicsView):
             self.scale(factor, factor)
             self._zoom = 0
             self.zoom_changed.emit(self._zoom)
+            self._schedule_tiles()
 
         except Exception as e:
             logging.error(f"Error in fitImageInView: {e}")
         finally:
             self.setUpdatesEnabled(True)
 
-    def setPhoto(self, pixmap: QPixmap = None):
-        """Ustawia obraz do wyświetlenia."""
+    def setImage(self, image: np.ndarray = None, tile_source: TileSource = None):
+        """Ustawia obraz (tablicę uint8 strony) do wyświetlenia - bez kopiowania danych.
+
+        Jeśli podano tile_source, po powiększeniu obraz jest uzupełniany kafelkami renderowanymi
+        z wektorów PDF przy rozdzielczości odpowiadającej powiększeniu.
+        """
         try:
             self._zoom = 0
-            if pixmap and not pixmap.isNull():
+            if image is not None and image.size:
                 self._empty = False
                 if not self._photo:
-                    self._photo = QGraphicsPixmapItem()
+                    self._photo = ImageItem(image)
                     self._scene.addItem(self._photo)
-                self._pixmap = pixmap
-                self._photo.setPixmap(self._pixmap)
+                else:
+                    self._photo.setImage(image)
+                self._photo.update()
+                self.highlightRegion(None)
+                self._tiles.set_source(tile_source, image.shape[1], image.shape[0])
                 self.fitImageInView()
             else:
                 self._empty = True
+                self.highlightRegion(None)
+                self._overlay.clear()
+                self._tiles.set_source(None)
                 if self._photo:
                     self._scene.removeItem(self._photo)
                     self._photo = None
                 self._scene.clear()
 
         except Exception as e:
-            logging.error(f"Error in setPhoto: {e}")
+            logging.error(f"Error in setImage: {e}")
 
     def wheelEvent(self, event: QWheelEvent):
         """Obsługa zoomu kółkiem myszy."""
@@ -100,6 +164,7 @@ class GraphicsView(QGraphicsView):
                     self._zoom = 0
 
                 self.zoom_changed.emit(self._zoom)
+                self._schedule_tiles()
 
         except Exception as e:
             logging.error(f"Error in wheelEvent: {e}")
@@ -108,6 +173,7 @@ class GraphicsView(QGraphicsView):
         """Obsługa kliknięć myszy."""
         try:
             if self._photo:
+                self._press_pos = event.pos() if event.button() == Qt.LeftButton else None
                 if event.button() == Qt.LeftButton:
                     self.setDragMode(QGraphicsView.ScrollHandDrag)
                 elif event.button() == Qt.RightButton:
@@ -121,9 +187,70 @@ class GraphicsView(QGraphicsView):
         try:
             super().mouseReleaseEvent(event)
             self.setDragMode(QGraphicsView.NoDrag)
+            # Kliknięcie (bez przesunięcia) wybiera obszar różnicy pod kursorem.
+            if (self._press_pos is not None and event.button() == Qt.LeftButton
+                    and (event.pos() - self._press_pos).manhattanLength() < QApplication.startDragDistance()):
+                point = self.mapToScene(event.pos())
+                self.scene_clicked.emit(point.x(), point.y())
+            self._press_pos = None
         except Exception as e:
             logging.error(f"Error in mouseReleaseEvent: {e}")
 
+    def image(self) -> Optional[np.ndarray]:
+        """Tablica aktualnie wyświetlanej strony (None, gdy brak obrazu)."""
+        return self._photo.array() if self._photo else None
+
+    def setRegions(self, regions: Sequence[DifferenceRegion]):
+        """Wyświetla obrysy obszarów różnic jako warstwę nad obrazem (obraz nie jest przerysowywany)."""
+        self._overlay.set_regions(regions)
+
+    def setRegionsVisible(self, visible: bool):
+        """Pokazuje lub ukrywa warstwę obrysów różnic."""
+        self._overlay.set_visible(visible)
+
+    def highlightRegion(self, rect: Optional[Tuple[float, float, float, float]]):
+        """Wyróżnia obszar (x, y, w, h) w pikselach obrazu i przewija do niego widok; None usuwa wyróżnienie."""
+        if self._highlight is not None:
+            self._scene.removeItem(self._highlight)
+            self._highlight = None
+        if rect is None or not self.hasPhoto():
+            return
+        x, y, w, h = rect
+        self._highlight = QGraphicsRectItem(QRectF(x, y, w, h))
+        pen = QPen(QColor(*SELECTED_REGION_COLOR), DIFFERENCE_OUTLINE_WIDTH)
+        pen.setCosmetic(True)  # Stała grubość linii niezależnie od powiększenia
+        self._highlight.setPen(pen)
+        self._highlight.setZValue(2)
+        self._scene.addItem(self._highlight)
+        if not self.mapToScene(self.viewport().rect()).boundingRect().contains(self._highlight.sceneBoundingRect()):
+            self.centerOn(self._highlight)
+
+    def scrollContentsBy(self, dx: int, dy: int):
+        """Przewijanie widoku (w tym przeciąganie) - odświeża widoczne kafelki."""
+        super().scrollContentsBy(dx, dy)
+        self._schedule_tiles()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._schedule_tiles()
+
+    def _schedule_tiles(self):
+        self._tile_timer.start()
+
+    def _update_tiles(self):
+        """Zleca kafelki dla widocznego obszaru sceny przy bieżącym powiększeniu."""
+        try:
+            if self.hasPhoto():
+                visible = self.mapToScene(self.viewport().rect()).boundingRect()
+                self._tiles.update_view(visible, self.transform().m11())
+        except Exception as e:
+            logging.error(f"Error updating tiles: {e}")
+
+    def shutdown(self):
+        """Zatrzymuje renderowanie kafelków (przy zamykaniu okna)."""
+        self._tile_timer.stop()
+        self._tiles.shutdown()
+
     def hasPhoto(self):
         """Sprawdza czy jest wyświetlany obraz."""
         return not self._empty
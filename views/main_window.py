@@ -1,12 +1,13 @@
 from PyQt5.QtWidgets import (QMainWindow, QHBoxLayout, QWidget, QMessageBox,
-                             QProgressDialog)
+                             QProgressDialog, QShortcut)
 from PyQt5.QtPrintSupport import QPrintDialog, QPrinter
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPainter
+from PyQt5.QtGui import QPainter, QKeySequence
 import logging
 from views.preview_panel import PreviewPanel
 from views.control_panel import ControlPanel
 from views.graphics_view import GraphicsView
+from views.stats_panel import StatsPanel
 from config.settings import WINDOW_TITLE
 
 class MainWindow(QMainWindow):
@@ -16,6 +17,7 @@ class MainWindow(QMainWindow):
         self._setup_ui()
         self._connect_signals()
         self.progress_dialog = None
+        self.stats_panel = None
 
     def _setup_ui(self):
         self.setWindowTitle(WINDOW_TITLE)
@@ -49,23 +51,52 @@ class MainWindow(QMainWindow):
             self.control_panel.reset_clicked.connect(self.controller.reset)
             self.control_panel.clear_clicked.connect(self.controller.clear)
             self.control_panel.print_clicked.connect(self.print_result)
+            self.control_panel.sensitivity_changed.connect(self.controller.set_sensitivity)
             self.control_panel.sensitivity_released.connect(self.controller.update_diff_after_sensitivity_release)
+            self.control_panel.previous_page_clicked.connect(self.controller.previous_page)
+            self.control_panel.next_page_clicked.connect(self.controller.next_page)
+            self.control_panel.previous_difference_clicked.connect(self.controller.previous_difference)
+            self.control_panel.next_difference_clicked.connect(self.controller.next_difference)
+            self.graphics_view.scene_clicked.connect(self.controller.select_region_at)
+            QShortcut(QKeySequence(Qt.Key_F12), self).activated.connect(self.show_stats)
         except Exception as e:
             logging.error(f"Error connecting signals: {e}")
             raise
 
+    def closeEvent(self, event):
+        self.controller.shutdown()
+        self.graphics_view.shutdown()
+        super().closeEvent(event)
+
     def show_progress(self, message: str):
+        self.hide_progress()
         self.progress_dialog = QProgressDialog(message, "Cancel", 0, 0, self)
-        self.progress_dialog.setWindowModality(Qt.WindowModal)
+        # Okno niemodalne - zmiana czułości lub dokumentu bazowego w trakcie porównania zastępuje je nowym.
+        self.progress_dialog.setWindowModality(Qt.NonModal)
         self.progress_dialog.setMinimumDuration(500)
         self.progress_dialog.canceled.connect(self.controller.cancel_operation)
         self.progress_dialog.show()
 
+    def update_progress(self, stage: str, done: int, total: int):
+        if self.progress_dialog:
+            self.progress_dialog.setLabelText(f"{stage} ({done} / {total})...")
+            self.progress_dialog.setMaximum(total)
+            self.progress_dialog.setValue(done)
+
     def hide_progress(self):
         if self.progress_dialog:
+            # close() emituje canceled - odłączamy, aby zamknięcie nie anulowało kolejnej operacji.
+            self.progress_dialog.canceled.disconnect()
             self.progress_dialog.close()
             self.progress_dialog = None
 
+    def show_stats(self):
+        # Panel statystyk etapów (F12) - tworzony przy pierwszym otwarciu.
+        if self.stats_panel is None:
+            self.stats_panel = StatsPanel(self)
+        self.stats_panel.show()
+        self.stats_panel.raise_()
+
     def show_error(self, message: str):
         QMessageBox.critical(self, "Error", message)
 
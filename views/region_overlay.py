@@ -0,0 +1,66 @@
+from typing import List, Sequence
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QColor, QPen
+from PyQt5.QtWidgets import QGraphicsRectItem, QGraphicsScene
+from models.pdf_document import DifferenceRegion
+from utils.diff_pipeline import OUTLINE_MARGIN
+from config.settings import DIFFERENCE_COLOR, DIFFERENCE_OUTLINE_WIDTH, REGION_COLORS
+
+
+class RegionOverlay:
+    """Warstwa obrysów obszarów różnic nad obrazem strony.
+
+    Każdy obszar to lekki element sceny (QGraphicsRectItem) - obraz strony pozostaje nietknięty,
+    więc ukrycie, zmiana koloru lub ponowne progowanie zmienia tylko elementy warstwy. Obrysy są
+    wektorowe, dlatego pozostają ostre także nad kafelkami przy dużym powiększeniu. Elementy są
+    ponownie używane przy kolejnych wywołaniach set_regions.
+    """
+
+    def __init__(self, scene: QGraphicsScene):
+        self._scene = scene
+        self._items: List[QGraphicsRectItem] = []
+        self._count = 0
+        self._visible = True
+        self._pens = {}
+
+    def set_regions(self, regions: Sequence[DifferenceRegion]):
+        """Wyświetla obrysy podanych obszarów (w pikselach obrazu strony) i włącza warstwę."""
+        while len(self._items) < len(regions):
+            item = QGraphicsRectItem()
+            item.setZValue(1.5)  # Nad kafelkami, pod wyróżnieniem wybranego obszaru
+            self._scene.addItem(item)
+            self._items.append(item)
+
+        for item, region in zip(self._items, regions):
+            item.setRect(QRectF(region.x - OUTLINE_MARGIN, region.y - OUTLINE_MARGIN,
+                                region.width + 2 * OUTLINE_MARGIN, region.height + 2 * OUTLINE_MARGIN))
+            item.setPen(self._pen(region.kind))
+        self._count = len(regions)
+        self._visible = True
+        self._update_visibility()
+
+    def set_visible(self, visible: bool):
+        self._visible = visible
+        self._update_visibility()
+
+    def is_visible(self) -> bool:
+        return self._visible
+
+    def clear(self):
+        """Usuwa elementy warstwy ze sceny."""
+        for item in self._items:
+            self._scene.removeItem(item)
+        self._items = []
+        self._count = 0
+
+    def _update_visibility(self):
+        for index, item in enumerate(self._items):
+            item.setVisible(self._visible and index < self._count)
+
+    def _pen(self, kind: str) -> QPen:
+        pen = self._pens.get(kind)
+        if pen is None:
+            # Grubość w pikselach strony - obrys skaluje się z powiększeniem jak dotąd na obrazie.
+            pen = QPen(QColor(*REGION_COLORS.get(kind, DIFFERENCE_COLOR)), DIFFERENCE_OUTLINE_WIDTH)
+            self._pens[kind] = pen
+        return pen
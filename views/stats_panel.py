@@ -0,0 +1,92 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox, QTableWidget,
+                             QTableWidgetItem, QHeaderView, QFileDialog)
+from PyQt5.QtCore import Qt, QTimer
+import logging
+from utils import profiling
+
+COLUMNS = ("Stage", "Count", "Total [ms]", "Max [ms]", "CPU [ms]", "Peak [MB]")
+REFRESH_INTERVAL_MS = 1000
+
+
+class StatsPanel(QDialog):
+    """Panel statystyk etapów (utils.profiling): łączny i maksymalny czas, CPU i szczyt pamięci.
+
+    Pozwala włączyć lub wyłączyć pomiary, wyczyścić zebrane rekordy i zapisać je jako JSON lines.
+    Tabela odświeża się co sekundę, gdy panel jest widoczny.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Stage statistics")
+        self.resize(640, 360)
+        self._setup_ui()
+        self._timer = QTimer(self)
+        self._timer.setInterval(REFRESH_INTERVAL_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def _setup_ui(self):
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+        self.enabled_check = QCheckBox("Record")
+        self.enabled_check.setChecked(profiling.is_enabled())
+        self.enabled_check.toggled.connect(self._on_enabled_toggled)
+        self.reset_btn = QPushButton("Reset")
+        self.reset_btn.clicked.connect(self._on_reset)
+        self.export_btn = QPushButton("Export...")
+        self.export_btn.clicked.connect(self._on_export)
+        buttons_layout.addWidget(self.enabled_check)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(self.reset_btn)
+        buttons_layout.addWidget(self.export_btn)
+        layout.addLayout(buttons_layout)
+
+    def refresh(self):
+        stages = profiling.summary()
+        self.table.setRowCount(len(stages))
+        for row, stage in enumerate(stages):
+            peak = "" if stage["peak_kb"] is None else f"{stage['peak_kb'] / 1024:.1f}"
+            values = (stage["stage"], str(stage["count"]), f"{stage['wall_ms']:.1f}",
+                      f"{stage['max_wall_ms']:.1f}", f"{stage['cpu_ms']:.1f}", peak)
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def showEvent(self, event):
+        self.enabled_check.setChecked(profiling.is_enabled())
+        self.refresh()
+        self._timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def _on_enabled_toggled(self, checked: bool):
+        if checked:
+            profiling.enable()
+        else:
+            profiling.disable()
+
+    def _on_reset(self):
+        profiling.reset()
+        self.refresh()
+
+    def _on_export(self):
+        try:
+            file_path, _ = QFileDialog.getSaveFileName(self, "Export stage records", "comparepdf_profile.jsonl",
+                                                       "JSON lines (*.jsonl)")
+            if file_path:
+                profiling.write_jsonl(file_path)
+        except Exception as e:
+            logging.error(f"Error exporting stage records: {e}")
@@ -0,0 +1,170 @@
+import concurrent.futures
+import logging
+import math
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from PyQt5.QtCore import QObject, QRectF, Qt, pyqtSignal
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtWidgets import QGraphicsPixmapItem, QGraphicsScene
+from services.tile_service import TileService, TileSource
+from services.worker_pool import get_worker_pool
+from utils.qt_utils import array2qimage
+from config.settings import TILE_SIZE, TILE_MAX_LEVEL, TILE_CACHE_MAX_BYTES, PDF_LOAD_TIMEOUT
+
+# Klucz kafelka: (źródło, poziom, kolumna, wiersz)
+TileKey = Tuple[TileSource, int, int, int]
+
+
+class TileCache:
+    """Pamięć podręczna LRU kafelków (QPixmap) ograniczona łącznym rozmiarem w bajtach."""
+
+    def __init__(self, max_bytes: int = TILE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._tiles: "OrderedDict[TileKey, QPixmap]" = OrderedDict()
+        self._size = 0
+
+    def get(self, key: TileKey) -> Optional[QPixmap]:
+        pixmap = self._tiles.get(key)
+        if pixmap is not None:
+            self._tiles.move_to_end(key)
+        return pixmap
+
+    def put(self, key: TileKey, pixmap: QPixmap):
+        if key in self._tiles:
+            self._size -= self._cost(self._tiles.pop(key))
+        self._tiles[key] = pixmap
+        self._size += self._cost(pixmap)
+        while self._size > self.max_bytes and len(self._tiles) > 1:
+            _, evicted = self._tiles.popitem(last=False)
+            self._size -= self._cost(evicted)
+
+    def clear(self):
+        self._tiles.clear()
+        self._size = 0
+
+    @staticmethod
+    def _cost(pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * 4
+
+
+class TileLayer(QObject):
+    """Warstwa kafelków nad obrazem bazowym widoku.
+
+    Obraz bazowy (przy DPI porównania) wystarcza, dopóki jeden piksel sceny nie zajmuje więcej niż
+    jednego piksela ekranu. Przy większym powiększeniu widoczne kafelki renderowane są z wektorów
+    PDF na poziomie 2^n (najbliższym powiększeniu widoku) we współdzielonej puli procesów, a gotowe kafelki
+    przechowywane są w pamięci podręcznej LRU. Do czasu ich wyrenderowania widoczny jest obraz bazowy.
+    """
+
+    # Sygnał emitowany z wątku puli procesów - dostarczany do wątku GUI przez kolejkę zdarzeń.
+    _tile_rendered = pyqtSignal(object, object)
+
+    def __init__(self, scene: QGraphicsScene, parent: QObject = None):
+        super().__init__(parent)
+        self._scene = scene
+        self._cache = TileCache()
+        self._active = True
+        self._source: Optional[TileSource] = None
+        self._scene_size = (0.0, 0.0)
+        self._items: Dict[TileKey, QGraphicsPixmapItem] = {}
+        self._pending: Dict[TileKey, concurrent.futures.Future] = {}
+        self._wanted = set()
+        self._tile_rendered.connect(self._on_tile_rendered, Qt.QueuedConnection)
+
+    @staticmethod
+    def level_for_scale(scale: float) -> int:
+        """Poziom kafelków dla powiększenia widoku; 0 oznacza, że wystarczy obraz bazowy."""
+        if scale <= 1.0:
+            return 0
+        return min(TILE_MAX_LEVEL, 2 ** math.ceil(math.log2(scale)))
+
+    def set_source(self, source: Optional[TileSource], width: float = 0, height: float = 0):
+        """Ustawia stronę wyświetlaną w widoku (None wyłącza kafelki) i usuwa kafelki poprzedniej."""
+        if source == self._source and (width, height) == self._scene_size:
+            return
+        self._source = source
+        self._scene_size = (width, height)
+        self._set_wanted(set())
+
+    def update_view(self, visible: QRectF, scale: float):
+        """Wyświetla lub zleca renderowanie kafelków pokrywających widoczny obszar sceny."""
+        level = self.level_for_scale(scale)
+        if self._source is None or level == 0:
+            self._set_wanted(set())
+            return
+
+        columns, rows = TileService.grid_size(*self._scene_size, level)
+        step = TILE_SIZE / level
+        first_column, last_column = max(0, int(visible.left() // step)), min(columns - 1, int(visible.right() // step))
+        first_row, last_row = max(0, int(visible.top() // step)), min(rows - 1, int(visible.bottom() // step))
+        self._set_wanted({(self._source, level, column, row)
+                          for row in range(first_row, last_row + 1)
+                          for column in range(first_column, last_column + 1)})
+
+    def _set_wanted(self, wanted: set):
+        self._wanted = wanted
+        for key in [key for key in self._items if key not in wanted]:
+            self._scene.removeItem(self._items.pop(key))
+        for key in [key for key in self._pending if key not in wanted]:
+            # Zadania, które jeszcze nie wystartowały, są anulowane; pozostałe trafią do pamięci podręcznej.
+            if self._pending[key].cancel():
+                del self._pending[key]
+
+        for key in sorted(wanted, key=lambda k: (k[3], k[2])):
+            if key in self._items or key in self._pending:
+                continue
+            pixmap = self._cache.get(key)
+            if pixmap is not None:
+                self._show_tile(key, pixmap)
+            else:
+                self._request_tile(key)
+
+    def _request_tile(self, key: TileKey):
+        try:
+            future = get_worker_pool().submit(TileService.render_tile, *key, timeout=PDF_LOAD_TIMEOUT)
+            self._pending[key] = future
+            future.add_done_callback(lambda done, key=key: self._on_future_done(key, done))
+        except Exception as e:
+            logging.error(f"Error requesting tile: {e}")
+
+    def _on_future_done(self, key: TileKey, future: concurrent.futures.Future):
+        if future.cancelled() or not self._active:
+            return
+        try:
+            tile = future.result()
+        except Exception as e:
+            logging.error(f"Error rendering tile: {e}")
+            tile = None
+        self._tile_rendered.emit(key, tile)
+
+    def _on_tile_rendered(self, key: TileKey, tile):
+        self._pending.pop(key, None)
+        if tile is None:
+            return
+        # QPixmap.fromImage kopiuje dane, więc QImage może wskazywać bezpośrednio na tablicę kafelka.
+        qimage = array2qimage(tile, copy=False)
+        if qimage is None:
+            return
+        pixmap = QPixmap.fromImage(qimage)
+        self._cache.put(key, pixmap)
+        if key in self._wanted and key not in self._items:
+            self._show_tile(key, pixmap)
+
+    def _show_tile(self, key: TileKey, pixmap: QPixmap):
+        _, level, column, row = key
+        item = QGraphicsPixmapItem(pixmap)
+        item.setTransformationMode(Qt.SmoothTransformation)
+        item.setPos(column * TILE_SIZE / level, row * TILE_SIZE / level)
+        item.setScale(1 / level)
+        item.setZValue(1)
+        self._scene.addItem(item)
+        self._items[key] = item
+
+    def shutdown(self):
+        """Usuwa kafelki i anuluje zlecone renderowanie."""
+        self._active = False
+        self._source = None
+        if self._pending:
+            get_worker_pool().cancel(self._pending.values())
+            self._pending.clear()
+        self._set_wanted(set())